@@ -51,6 +51,37 @@ async def get_usage_stats(admin: Dict = Depends(get_current_admin)):
             "provider_status": "google"
         }
 
+@router.get("/api/admin/places-metrics")
+async def get_places_metrics(admin: Dict = Depends(get_current_admin)):
+    """Métricas en memoria del cliente de Google Places (pool HTTP, cache de búsquedas)"""
+    try:
+        from backend.google_places_client import google_client
+        return {
+            "success": True,
+            "transport": google_client.get_transport_stats(),
+            "cache": google_client.get_cache_stats(),
+            "tiles": google_client.get_tile_stats(),
+            "budget": google_client.get_budget_stats(),
+            "telemetry": google_client.get_telemetry_stats(),
+            "rate_limiter": google_client.get_rate_limiter_stats()
+        }
+    except Exception as e:
+        logger.error(f"Error en /admin/places-metrics: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/api/admin/enrichment-queue")
+async def get_enrichment_queue_status(admin: Dict = Depends(get_current_admin)):
+    """Estado de la cola de enriquecimiento diferido (jobs por estado y prioridad, reintentos, workers)"""
+    try:
+        from backend.enrichment_queue import enrichment_queue
+        return {
+            "success": True,
+            "queue": await asyncio.to_thread(enrichment_queue.stats)
+        }
+    except Exception as e:
+        logger.error(f"Error en /admin/enrichment-queue: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/api/admin/api-logs")
 async def get_api_logs_endpoint(
     limit: int = 100, 
@@ -1,7 +1,9 @@
 import os
 import json
+import math
 import logging
 import asyncio
+import contextlib
 from typing import Dict, Any, Optional, List
 from datetime import datetime
 from fastapi import APIRouter, HTTPException, Depends, Request
@@ -113,12 +115,17 @@ except ImportError:
         logger.error("No se pudo cargar google_client")
 
 try:
-    from backend.scraper_parallel import enriquecer_empresas_paralelo, ScraperSession
+    from backend.scraper_async import enriquecer_empresas_async, enriquecer_empresas_async_lista
 except ImportError:
     try:
-        from scraper_parallel import enriquecer_empresas_paralelo, ScraperSession
+        from scraper_async import enriquecer_empresas_async, enriquecer_empresas_async_lista
     except ImportError:
-        logger.error("No se pudo cargar lead_enricher (scraper_parallel)")
+        logger.error("No se pudo cargar lead_enricher (scraper_async)")
+
+try:
+    from backend.enrichment_queue import enrichment_queue, PRIORIDAD_BACKFILL
+except ImportError:
+    from enrichment_queue import enrichment_queue, PRIORIDAD_BACKFILL
 
 try:
     from backend.geocoding import calcular_distancia_km
@@ -142,6 +149,30 @@ from backend.db_supabase import exportar_a_csv, exportar_a_json
 logger = logging.getLogger(__name__)
 router = APIRouter(tags=["Leads"])
 
+# En dos fases los candidatos fuera del tope no traen website (máscara Basic): antes de encolarlos
+# se completan con Place Details (facturado), a lo sumo esta cantidad por búsqueda
+BACKFILL_DETAILS_MAX = max(0, int(os.getenv('GOOGLE_PLACES_BACKFILL_DETAILS_MAX', '20')))
+_backfill_tasks = set()  # Referencias a las tareas de backfill en curso (si no, el GC puede cortarlas)
+
+
+def puntaje_basico(lead: Dict[str, Any]) -> float:
+    """Puntaje con campos de la máscara Basic: rating y cantidad de reseñas (negocio activo y conocido)"""
+    return (lead.get('rating') or 0) * 2 + 10 * math.log10(1 + (lead.get('user_ratings_total') or 0))
+
+
+async def encolar_backfill(candidatos: List[Dict[str, Any]], user_id: Optional[str] = None) -> int:
+    """Encola para enriquecimiento diferido los candidatos que quedaron fuera del tope de la búsqueda"""
+    try:
+        if google_client.two_phase_enabled:
+            candidatos = candidatos[:BACKFILL_DETAILS_MAX]
+            if not candidatos:
+                return 0
+            candidatos = await google_client.fetch_contact_details(candidatos, user_id=user_id)
+        return await asyncio.to_thread(enrichment_queue.encolar, candidatos, PRIORIDAD_BACKFILL)
+    except Exception as e:
+        logger.error(f"Error encolando backfill de {len(candidatos)} candidatos: {e}")
+        return 0
+
 # --- Variables de estado locales para leads ---
 _memoria_empresas = []
 _empresa_counter = 0
@@ -284,7 +315,10 @@ async def buscar_por_rubro_stream(request: BusquedaRubroRequest, user_data: dict
                 lng=c_lng,
                 radius=radius_m,
                 bbox=google_bbox,
-                max_total_results=40 # Aumentamos un poco por query ya que corremos menos queries
+                max_total_results=40, # Aumentamos un poco por query ya que corremos menos queries
+                # Dos fases: descubrimiento Basic y website/teléfono sólo para los leads que sobreviven
+                use_advanced=not google_client.two_phase_enabled,
+                user_id=request.user_id
             ))
         
         try:
@@ -309,11 +343,12 @@ async def buscar_por_rubro_stream(request: BusquedaRubroRequest, user_data: dict
             
             # --- PRIORIZACIÓN Y FILTRADO DE LEADS ---
             def lead_score(lead):
-                score = 0
+                score = puntaje_basico(lead)
+                if google_client.two_phase_enabled:
+                    return score  # Máscara Basic: email, teléfono y website todavía no están
                 if lead.get('email'): score += 500  # Prioridad máxima para emails
                 if lead.get('telefono'): score += 50
                 if lead.get('website'): score += 20
-                if lead.get('rating'): score += (lead.get('rating') * 2)
                 # Penalizar un poco los que solo tienen redes pero no email
                 if not lead.get('email') and (lead.get('instagram') or lead.get('facebook')):
                     score += 5
@@ -335,6 +370,14 @@ async def buscar_por_rubro_stream(request: BusquedaRubroRequest, user_data: dict
             if all_candidates:
                 # Limitamos a los mejores candidatos para no tardar demasiado
                 leads_to_process = all_candidates[:MAX_LEADS]
+                # Los que quedan fuera del tope se enriquecen en background con prioridad baja,
+                # así la próxima búsqueda de la zona los encuentra en la cache
+                if len(all_candidates) > MAX_LEADS:
+                    tarea = asyncio.create_task(encolar_backfill(all_candidates[MAX_LEADS:], request.user_id))
+                    _backfill_tasks.add(tarea)
+                    tarea.add_done_callback(_backfill_tasks.discard)
+                if google_client.two_phase_enabled:
+                    leads_to_process = await google_client.fetch_contact_details(leads_to_process, user_id=request.user_id)
                 enriched_count = 0
                 batch_size = 10
                 
@@ -345,61 +388,50 @@ async def buscar_por_rubro_stream(request: BusquedaRubroRequest, user_data: dict
                 if not request.smart_filter_text:
                     pass # Solo mantenemos la estructura por si acaso
                 
-                # Crear sesión persistente para todo el proceso
-                session = ScraperSession()
-                
-                # Procesar en batches para fluidez en el stream
-                accumulated_enriched = []
-                
-                for i in range(0, len(leads_to_process), batch_size):
-                    batch = leads_to_process[i:i+batch_size]
-                    
-                    try:
-                        # Enriquecer batch en paralelo
-                        enriched_batch = await asyncio.to_thread(
-                            enriquecer_empresas_paralelo,
-                            empresas=batch,
-                            session=session
-                        )
-                        
-                        if isinstance(enriched_batch, list):
-                            # Si hay Smart Filter, lo aplicamos INMEDIATAMENTE al batch para no hacer esperar al usuario
+                # Enriquecimiento asíncrono: cada lead se emite apenas termina su sitio,
+                # sin esperar al resto del batch. El Smart Filter se aplica por grupos de batch_size.
+                pending_filter = []
+                processed_ids = set()
+
+                async def emit_filtered(group):
+                    nonlocal emitted_count, enriched_count
+                    yield f"data: {json.dumps({'type': 'status', 'message': f'Analizando calidad con IA ({enriched_count + len(group)}/{len(leads_to_process)})...'})}\n\n"
+                    filtered_batch_leads = await apply_smart_filter(group, request.smart_filter_text)
+                    for r in filtered_batch_leads:
+                        if r.get('email') or r.get('telefono'):
+                            yield f"data: {json.dumps({'type': 'lead', 'data': r})}\n\n"
+                            emitted_count += 1
+                            enriched_count += 1
+                        await asyncio.sleep(0.02)
+
+                try:
+                    async with contextlib.aclosing(enriquecer_empresas_async(leads_to_process)) as enriquecidas:
+                        async for r in enriquecidas:
+                            processed_ids.add(id(r))
                             if request.smart_filter_text:
-                                yield f"data: {json.dumps({'type': 'status', 'message': f'Analizando calidad con IA ({enriched_count + len(enriched_batch)}/{len(leads_to_process)})...'})}\n\n"
-                                
-                                # Aplicar filtro AI al batch actual
-                                filtered_batch_leads = await apply_smart_filter(enriched_batch, request.smart_filter_text)
-                                
-                                for r in filtered_batch_leads:
-                                    has_email = bool(r.get('email'))
-                                    has_phone = bool(r.get('telefono'))
-                                    if has_email or has_phone:
-                                        yield f"data: {json.dumps({'type': 'lead', 'data': r})}\n\n"
-                                        emitted_count += 1
-                                        enriched_count += 1
-                                    await asyncio.sleep(0.02)
-                                    
-                            else:
+                                pending_filter.append(r)
+                                if len(pending_filter) >= batch_size:
+                                    group, pending_filter = pending_filter, []
+                                    async for chunk in emit_filtered(group):
+                                        yield chunk
+                            elif r.get('email') or r.get('telefono'):
                                 # Comportamiento standard: emitir después de enriquecer si tienen contacto
-                                for r in enriched_batch:
-                                    has_email = bool(r.get('email'))
-                                    has_phone = bool(r.get('telefono'))
-                                    if has_email or has_phone:
-                                        yield f"data: {json.dumps({'type': 'lead', 'data': r})}\n\n"
-                                        emitted_count += 1
-                                        enriched_count += 1
-                                        
-
-                                        await asyncio.sleep(0.02) 
-                                
-                    except Exception as e:
-                        logger.error(f"Error en enriquecimiento batch: {e}")
-                        # Si falla, emitimos originales pero solo si tienen telefono
-                        for r in batch:
-                            if r.get('telefono'):
                                 yield f"data: {json.dumps({'type': 'lead', 'data': r})}\n\n"
                                 emitted_count += 1
                                 enriched_count += 1
+                                await asyncio.sleep(0.02)
+
+                    if pending_filter:
+                        async for chunk in emit_filtered(pending_filter):
+                            yield chunk
+                except Exception as e:
+                    logger.error(f"Error en enriquecimiento: {e}")
+                    # Si falla, emitimos los que faltaban pero solo si tienen telefono
+                    for r in leads_to_process:
+                        if id(r) not in processed_ids and r.get('telefono'):
+                            yield f"data: {json.dumps({'type': 'lead', 'data': r})}\n\n"
+                            emitted_count += 1
+                            enriched_count += 1
 
                 # (Bloque acumulado eliminado - ya se procesó en tiempo real)
                 # Finalización normal
@@ -525,7 +557,8 @@ async def buscar_por_rubro(request: BusquedaRubroRequest, user_data: dict = Depe
                     bbox=google_bbox,
                     lat=request.busqueda_centro_lat,
                     lng=request.busqueda_centro_lng,
-                    radius=(request.busqueda_radio_km * 1000) if request.busqueda_radio_km else None
+                    radius=(request.busqueda_radio_km * 1000) if request.busqueda_radio_km else None,
+                    user_id=request.user_id
                 ))
             
             # Reunir todos los resultados de las diferentes queries exhaustivamente
@@ -585,10 +618,9 @@ async def buscar_por_rubro(request: BusquedaRubroRequest, user_data: dict = Depe
         if request.scrapear_websites:
             logger.info(" Iniciando enriquecimiento paralelo de empresas...")
             try:
-                # Ejecutar scraping en un thread separado para no bloquear el event loop
-                empresas_enriquecidas = await asyncio.to_thread(
-                    enriquecer_empresas_paralelo,
-                    empresas=empresas,
+                # Scraping asíncrono en el mismo event loop (sin un thread por sitio)
+                empresas_enriquecidas = await enriquecer_empresas_async_lista(
+                    empresas,
                     timeout_por_empresa=20,
                     progress_callback=lambda current, total: update_search_progress(request.task_id, current, total, phase="scraping")
                 )
@@ -597,7 +629,7 @@ async def buscar_por_rubro(request: BusquedaRubroRequest, user_data: dict = Depe
                 if isinstance(empresas_enriquecidas, list):
                     empresas = empresas_enriquecidas
                 else:
-                    logger.warning("enriquecer_empresas_paralelo no retornó una lista válida, usando empresas originales")
+                    logger.warning("enriquecer_empresas_async_lista no retornó una lista válida, usando empresas originales")
             except Exception as e:
                 logger.error(f"Error en enriquecimiento paralelo: {e}, usando empresas originales")
                 # Continuar con empresas sin enriquecer
@@ -0,0 +1,119 @@
+"""
+Libro mayor en memoria del gasto mensual de APIs pagas.
+
+Se siembra desde api_usage_stats al iniciar, se actualiza localmente en cada llamada
+cobrada y se reconcilia con la base cada cierto intervalo. Las llamadas reservan su
+costo antes de salir, de modo que búsquedas concurrentes no puedan superar el límite.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from threading import Lock
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+RECONCILE_INTERVAL_SECONDS = float(os.getenv('BUDGET_RECONCILE_SECONDS', '300'))
+
+
+def _mes_actual() -> str:
+    return datetime.now().replace(day=1).date().isoformat()
+
+
+class BudgetLedger:
+    """
+    Gasto del mes = confirmado (spent) + reservado (reserved, llamadas en vuelo).
+    reserve() sólo concede si spent + reserved + costo <= límite.
+    """
+
+    def __init__(self, usage_loader: Callable[[], float], reconcile_interval: float = RECONCILE_INTERVAL_SECONDS):
+        self._usage_loader = usage_loader
+        self.reconcile_interval = reconcile_interval
+        self._lock = Lock()
+        self._month = _mes_actual()
+        self.spent = 0.0
+        self.reserved = 0.0
+        self.db_total: Optional[float] = None
+        self.last_reconcile: Optional[float] = None
+        self._reconcile_task: Optional[asyncio.Future] = None
+
+    def _rollover(self):
+        """Reinicia el gasto al cambiar de mes (con lock tomado)"""
+        mes = _mes_actual()
+        if mes != self._month:
+            logger.info(f"Nuevo mes de facturación ({mes}). Reiniciando ledger de presupuesto.")
+            self._month = mes
+            self.spent = 0.0
+            self.db_total = None
+            self.last_reconcile = None
+
+    async def reconcile(self):
+        """Consulta el gasto real en la DB y lo combina con el gasto local"""
+        try:
+            db_total = float(await asyncio.to_thread(self._usage_loader))
+        except Exception as e:
+            logger.error(f"Error reconciliando presupuesto con la DB: {e}")
+            with self._lock:
+                self.last_reconcile = time.time() # Reintentar recién en el próximo intervalo
+            return
+
+        with self._lock:
+            self._rollover()
+            self.db_total = db_total
+            # La DB incluye el gasto de otros procesos; lo local puede tener escrituras aún no persistidas
+            self.spent = max(self.spent, db_total)
+            self.last_reconcile = time.time()
+
+    async def ensure_fresh(self):
+        """Siembra o reconcilia si venció el intervalo. Llamadas concurrentes comparten una sola consulta."""
+        with self._lock:
+            self._rollover()
+            vigente = self.last_reconcile is not None and time.time() - self.last_reconcile < self.reconcile_interval
+        if vigente:
+            return
+
+        if self._reconcile_task is None or self._reconcile_task.done():
+            self._reconcile_task = asyncio.ensure_future(self.reconcile())
+        await asyncio.shield(self._reconcile_task)
+
+    def reserve(self, amount: float, limit: float) -> Optional[float]:
+        """Reserva el costo de una llamada. Retorna el monto reservado o None si excede el límite."""
+        with self._lock:
+            self._rollover()
+            if self.spent + self.reserved + amount > limit:
+                return None
+            self.reserved += amount
+            return amount
+
+    def commit(self, reservation: float, actual_cost: Optional[float] = None):
+        """Confirma una reserva como gasto (actual_cost permite ajustar el monto final)"""
+        with self._lock:
+            self.reserved = max(0.0, self.reserved - reservation)
+            self.spent += reservation if actual_cost is None else actual_cost
+
+    def release(self, reservation: float):
+        """Libera una reserva de una llamada que no se cobró"""
+        with self._lock:
+            self.reserved = max(0.0, self.reserved - reservation)
+
+    def available(self, limit: float) -> float:
+        with self._lock:
+            self._rollover()
+            return limit - self.spent - self.reserved
+
+    def stats(self, limit: Optional[float] = None) -> Dict[str, Any]:
+        with self._lock:
+            data = {
+                "month": self._month,
+                "spent_usd": round(self.spent, 4),
+                "reserved_usd": round(self.reserved, 4),
+                "db_total_usd": round(self.db_total, 4) if self.db_total is not None else None,
+                "last_reconcile": datetime.fromtimestamp(self.last_reconcile).isoformat() if self.last_reconcile else None
+            }
+        if limit is not None:
+            data["limit_usd"] = limit
+            data["available_usd"] = round(limit - data["spent_usd"] - data["reserved_usd"], 4)
+        return data
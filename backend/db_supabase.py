@@ -874,25 +874,52 @@ def delete_search_history(user_id: str, search_id: str) -> bool:
     except Exception as e:
         logger.error(f"Error eliminando historial {search_id} para {user_id}: {e}")
         return False
-def increment_api_usage(provider: str, sku: str, cost_usd: float) -> bool:
-    """Incrementa las estadísticas de uso de API para el mes actual"""
+
+
+def _rpc_inexistente(error: Exception) -> bool:
+    """True si el error es que la función RPC no existe en la base (PostgREST PGRST202 / Postgres 42883)"""
+    code = str(getattr(error, 'code', '') or '')
+    texto = str(error).lower()
+    return code in ('PGRST202', '42883') or 'pgrst202' in texto or 'could not find the function' in texto \
+        or ('function' in texto and 'does not exist' in texto)
+
+def increment_api_usage(provider: str, sku: str, cost_usd: float, calls: int = 1, month: Optional[str] = None) -> Optional[bool]:
+    """
+    Incrementa las estadísticas de uso de API (por defecto del mes actual).
+    Usa el RPC atómico increment_api_usage_stats; sólo si la función no existe cae al read-modify-write.
+    Retorna None si el RPC falló sin saber si se aplicó: el llamador no debe reintentarlo.
+    """
     client = get_supabase_admin() # Usar admin para saltar RLS si es necesario
     if not client:
         return False
         
+    current_month = month or datetime.now().replace(day=1).date().isoformat()
+
+    try:
+        # Upsert atómico en Postgres (no pierde incrementos concurrentes). Sin reintentos: el RPC no es
+        # idempotente y un error de red después del commit duplicaría el incremento.
+        client.rpc('increment_api_usage_stats', {
+            'p_month': current_month,
+            'p_provider': provider,
+            'p_sku': sku,
+            'p_calls': calls,
+            'p_cost_usd': cost_usd
+        }).execute()
+        return True
+    except Exception as e:
+        if not _rpc_inexistente(e):
+            # Error transitorio: el incremento pudo haberse aplicado, no se reintenta ni se cae al fallback
+            logger.error(f"Error en RPC increment_api_usage_stats: {e}")
+            return None
+        logger.warning(f"RPC increment_api_usage_stats no disponible, usando read-modify-write: {e}")
+
     try:
-        current_month = datetime.now().replace(day=1).date().isoformat()
-        
-        # Primero intentamos obtener el registro actual para hacer el incremento manual si upsert no soporta increment
-        # Pero Supabase/Postgres permite RPC o simplemente upsert con columnas calculadas
-        # Para simplificar, usaremos una función RPC en el futuro o un upsert aquí
-        
         # Obtener valor actual
         res = execute_with_retry(lambda c: c.table('api_usage_stats').select('calls_count, estimated_cost_usd').eq('month', current_month).eq('provider', provider).eq('sku', sku))
         
         if res.data:
             curr = res.data[0]
-            new_calls = curr['calls_count'] + 1
+            new_calls = curr['calls_count'] + calls
             new_cost = float(curr['estimated_cost_usd']) + cost_usd
             
             execute_with_retry(lambda c: c.table('api_usage_stats').update({
@@ -905,7 +932,7 @@ def increment_api_usage(provider: str, sku: str, cost_usd: float) -> bool:
                 'month': current_month,
                 'provider': provider,
                 'sku': sku,
-                'calls_count': 1,
+                'calls_count': calls,
                 'estimated_cost_usd': cost_usd,
                 'last_update': datetime.now().isoformat()
             }))
@@ -1247,6 +1274,58 @@ def log_api_call(
         logger.error(f"Error registrando log de API: {e}")
         return False
 
+def log_api_calls_batch(rows: List[Dict]) -> bool:
+    """Inserta varios registros de api_call_logs en un único insert multi-fila"""
+    if not rows:
+        return True
+    client = get_supabase_admin()
+    if not client:
+        return False
+        
+    try:
+        execute_with_retry(lambda c: c.table('api_call_logs').insert(rows), is_admin=True)
+        return True
+    except Exception as e:
+        logger.error(f"Error registrando lote de logs de API ({len(rows)} filas): {e}")
+        return False
+
+def get_scraping_cache_entry(domain: str) -> Optional[Dict]:
+    """Entrada de la cache compartida de scraping para un dominio registrable"""
+    client = get_supabase_admin()
+    if not client:
+        return None
+
+    try:
+        response = execute_with_retry(lambda c: c.table('scraping_cache')\
+            .select('domain, status, data, http_status, last_scraped_at')\
+            .eq('domain', domain)\
+            .limit(1), is_admin=True)
+        return response.data[0] if response.data else None
+    except Exception as e:
+        logger.error(f"Error leyendo scraping_cache para {domain}: {e}")
+        return None
+
+def upsert_scraping_cache_entry(domain: str, data: Dict, status: str = 'success', http_status: Optional[int] = None,
+                                last_scraped_at: Optional[str] = None) -> bool:
+    """Guarda (o reemplaza) el resultado de scraping de un dominio en la cache compartida"""
+    client = get_supabase_admin()
+    if not client:
+        return False
+
+    row = {
+        'domain': domain,
+        'status': status,
+        'data': data,
+        'http_status': http_status,
+        'last_scraped_at': last_scraped_at or datetime.utcnow().isoformat()
+    }
+    try:
+        execute_with_retry(lambda c: c.table('scraping_cache').upsert(row, on_conflict='domain'), is_admin=True)
+        return True
+    except Exception as e:
+        logger.error(f"Error guardando scraping_cache para {domain}: {e}")
+        return False
+
 def get_api_logs(limit: int = 100, offset: int = 0) -> List[Dict]:
     """Obtiene los logs detallados de API"""
     client = get_supabase_admin()
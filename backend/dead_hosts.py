@@ -0,0 +1,165 @@
+"""
+Cache negativa de hosts caídos para el scraping.
+
+Muchos websiteUri de Google Places apuntan a dominios vencidos, estacionados o que no responden,
+y cada búsqueda volvía a pagar el timeout completo. Acá se recuerdan los hosts con NXDOMAIN,
+conexión rechazada/inalcanzable, timeout de conexión o error de TLS, y se los saltea hasta su
+próximo chequeo. El intervalo se duplica con cada falla consecutiva (base → tope) y un éxito
+borra la entrada.
+
+Los timeouts de lectura no cuentan: el host existe y respondió, sólo es lento.
+"""
+
+import errno
+import logging
+import os
+import socket
+import ssl
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, Optional
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+DEAD_HOST_BASE_SECONDS = float(os.getenv('SCRAPER_DEAD_HOST_BASE_SECONDS', '900'))
+DEAD_HOST_MAX_SECONDS = float(os.getenv('SCRAPER_DEAD_HOST_MAX_SECONDS', str(7 * 24 * 3600)))
+DEAD_HOST_MAX_ENTRIES = int(os.getenv('SCRAPER_DEAD_HOST_MAX_ENTRIES', '50000'))
+
+MOTIVO_NXDOMAIN = 'nxdomain'
+MOTIVO_TLS = 'tls'
+MOTIVO_INALCANZABLE = 'unreachable'
+MOTIVO_TIMEOUT = 'connect_timeout'
+
+_EAI_DEFINITIVOS = {getattr(socket, n) for n in ('EAI_NONAME', 'EAI_NODATA') if hasattr(socket, n)}
+_ERRNO_INALCANZABLE = {errno.ECONNREFUSED, errno.EHOSTUNREACH, errno.ENETUNREACH}
+_NOMBRES_CONNECT_TIMEOUT = {'ConnectTimeout', 'ConnectTimeoutError'}  # httpx/httpcore, requests/urllib3
+
+
+def _cadena(exc: BaseException):
+    """Recorre la excepción y sus causas (__cause__, __context__ y el .reason de urllib3)"""
+    vistos = set()
+    pendientes = [exc]
+    while pendientes:
+        actual = pendientes.pop()
+        if actual is None or id(actual) in vistos:
+            continue
+        vistos.add(id(actual))
+        yield actual
+        pendientes.extend([actual.__cause__, actual.__context__, getattr(actual, 'reason', None)])
+        pendientes.extend(a for a in getattr(actual, 'args', ()) if isinstance(a, BaseException))
+
+
+def motivo_de_error(exc: BaseException) -> Optional[str]:
+    """Clasifica un error de red; None si no indica que el host esté caído (p.ej. timeout de lectura)"""
+    motivo = None
+    for e in _cadena(exc):
+        if isinstance(e, socket.gaierror):
+            # EAI_AGAIN (falla temporal del resolver) no alcanza para declarar caído al host
+            if e.errno in _EAI_DEFINITIVOS:
+                return MOTIVO_NXDOMAIN
+        elif isinstance(e, (ssl.SSLError, ssl.CertificateError)):
+            motivo = motivo or MOTIVO_TLS
+        elif isinstance(e, OSError) and e.errno in _ERRNO_INALCANZABLE:
+            motivo = motivo or MOTIVO_INALCANZABLE
+        elif type(e).__name__ in _NOMBRES_CONNECT_TIMEOUT:
+            motivo = motivo or MOTIVO_TIMEOUT
+    return motivo
+
+
+def host_de(url_or_host: Optional[str]) -> Optional[str]:
+    if not url_or_host:
+        return None
+    valor = url_or_host if '://' in url_or_host else 'https://' + url_or_host
+    try:
+        return urlparse(valor).hostname
+    except ValueError:
+        return None
+
+
+class DeadHostCache:
+    """host -> próxima vez que se permite volver a intentar, con backoff exponencial"""
+
+    def __init__(
+        self,
+        base_seconds: float = DEAD_HOST_BASE_SECONDS,
+        max_seconds: float = DEAD_HOST_MAX_SECONDS,
+        max_entries: int = DEAD_HOST_MAX_ENTRIES
+    ):
+        self.base_seconds = base_seconds
+        self.max_seconds = max_seconds
+        self.max_entries = max_entries
+        self._lock = Lock()
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._stats = {"skips": 0, "failures": 0, "recoveries": 0, "evictions": 0}
+
+    def is_dead(self, url_or_host: Optional[str]) -> bool:
+        """True si el host falló y todavía no toca re-chequearlo"""
+        host = host_de(url_or_host)
+        if not host:
+            return False
+        with self._lock:
+            entry = self._entries.get(host)
+            if entry is None or entry['next_check'] <= time.monotonic():
+                return False
+            self._stats["skips"] += 1
+            return True
+
+    def record_failure(self, url_or_host: Optional[str], motivo: str) -> float:
+        """Registra una falla y retorna el intervalo hasta el próximo chequeo"""
+        host = host_de(url_or_host)
+        if not host:
+            return 0.0
+        with self._lock:
+            entry = self._entries.pop(host, None) or {'failures': 0}
+            entry['failures'] += 1
+            intervalo = min(self.max_seconds, self.base_seconds * (2 ** (entry['failures'] - 1)))
+            entry.update(motivo=motivo, next_check=time.monotonic() + intervalo)
+            self._entries[host] = entry
+            self._stats["failures"] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+        logger.info(f"Host caído ({motivo}): {host}; próximo chequeo en {intervalo:.0f}s")
+        return intervalo
+
+    def record_error(self, url_or_host: Optional[str], exc: BaseException,
+                     connect_acotado: bool = False) -> Optional[str]:
+        """
+        Clasifica el error y, si indica host caído, lo registra. Retorna el motivo.
+        connect_acotado: el timeout de conexión usado fue menor al normal (el timeout corto de robots.txt,
+        un timeout chico del llamador o el deadline de la empresa), así que un connect timeout no prueba
+        que el host esté caído y no se registra.
+        """
+        motivo = motivo_de_error(exc)
+        if motivo == MOTIVO_TIMEOUT and connect_acotado:
+            return None
+        if motivo:
+            self.record_failure(url_or_host, motivo)
+        return motivo
+
+    def record_success(self, url_or_host: Optional[str]):
+        host = host_de(url_or_host)
+        if not host:
+            return
+        with self._lock:
+            if self._entries.pop(host, None) is not None:
+                self._stats["recoveries"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            now = time.monotonic()
+            return {
+                **self._stats,
+                "hosts": len(self._entries),
+                "dead_now": sum(1 for e in self._entries.values() if e['next_check'] > now)
+            }
+
+
+# Compartida por el scraper sincrónico y el asíncrono
+dead_hosts = DeadHostCache()
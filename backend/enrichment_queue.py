@@ -0,0 +1,340 @@
+"""
+Cola persistente de enriquecimiento diferido.
+
+Los leads que no alcanzaron a enriquecerse dentro del presupuesto de una búsqueda interactiva
+(timeout o búsqueda cortada) y los candidatos que quedaron fuera del tope se encolan acá y los
+procesan workers en background. La cola vive en SQLite, así que sobrevive a reinicios, y se
+comparte entre procesos: cada job se toma con BEGIN IMMEDIATE y un lease que vence si el worker muere.
+
+- Una fila por sitio (dedupe por clave_cache: dominio, o host + ruta en plataformas como
+  sites.google.com): reencolar un sitio pendiente sólo puede subirle la prioridad.
+- Prioridades: PRIORIDAD_INTERACTIVA (0) antes que PRIORIDAD_BACKFILL (10).
+- Reintentos con backoff exponencial hasta QUEUE_MAX_ATTEMPTS; después el job queda 'failed'.
+  Reencolar un job 'failed' conserva sus intentos y respeta su backoff: un sitio caído no se
+  reintenta en cada búsqueda que lo vuelva a traer.
+
+El trabajo en sí lo hace un handler (empresa -> bool) que se pasa en start(): True cierra el job,
+False (o una excepción) lo reprograma.
+"""
+
+import json
+import logging
+import os
+import random
+import sqlite3
+import time
+from threading import Event, Lock, Thread
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    from .scraping_cache import clave_cache
+except ImportError:
+    from scraping_cache import clave_cache
+
+logger = logging.getLogger(__name__)
+
+DEFERRED_ENABLED = os.getenv('SCRAPER_ENABLE_DEFERRED', '1') == '1'
+DEFERRED_WORKERS = max(1, int(os.getenv('SCRAPER_DEFERRED_WORKERS', '3')))
+QUEUE_MAX_ATTEMPTS = max(1, int(os.getenv('SCRAPER_QUEUE_MAX_ATTEMPTS', '4')))
+QUEUE_RETRY_BASE_SECONDS = float(os.getenv('SCRAPER_QUEUE_RETRY_BASE_SECONDS', '300'))
+QUEUE_LEASE_SECONDS = float(os.getenv('SCRAPER_QUEUE_LEASE_SECONDS', '300'))
+QUEUE_POLL_SECONDS = float(os.getenv('SCRAPER_QUEUE_POLL_SECONDS', '2'))
+QUEUE_DONE_RETENTION_SECONDS = 24 * 3600
+
+PRIORIDAD_INTERACTIVA = 0
+PRIORIDAD_BACKFILL = 10
+
+STATUS_PENDING = 'pending'
+STATUS_RUNNING = 'running'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+
+_DEFAULT_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data')
+_PURGE_INTERVAL_SECONDS = 600
+
+
+def necesita_enriquecimiento(empresa: Dict[str, Any]) -> bool:
+    return bool(empresa.get('website')) and (not empresa.get('email') or not empresa.get('telefono'))
+
+
+class EnrichmentQueue:
+    """Cola de jobs de enriquecimiento por dominio, con prioridades, reintentos y workers en threads"""
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        workers: int = DEFERRED_WORKERS,
+        max_attempts: int = QUEUE_MAX_ATTEMPTS,
+        retry_base_seconds: float = QUEUE_RETRY_BASE_SECONDS,
+        lease_seconds: float = QUEUE_LEASE_SECONDS,
+        poll_seconds: float = QUEUE_POLL_SECONDS,
+        enabled: bool = DEFERRED_ENABLED
+    ):
+        self.path = path or os.getenv('SCRAPER_QUEUE_PATH') or os.path.join(_DEFAULT_DATA_DIR, 'enrichment_queue.sqlite3')
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self.enabled = enabled
+        self._lock = Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._wakeup = Event()
+        self._stop = Event()
+        self._threads: List[Thread] = []
+        self._handler: Optional[Callable[[Dict[str, Any]], bool]] = None
+        self._last_purge = 0.0
+        self._stats = {"enqueued": 0, "deduplicated": 0, "processed": 0, "succeeded": 0, "retried": 0, "failed": 0}
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        if self._conn is not None:
+            return self._conn
+        for path in (self.path, os.path.join('/tmp/b2b_data', os.path.basename(self.path))):
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+                # Autocommit: las transacciones se abren explícitamente donde hacen falta
+                conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS enrichment_jobs (
+                        domain TEXT PRIMARY KEY,
+                        empresa TEXT NOT NULL,
+                        priority INTEGER NOT NULL,
+                        status TEXT NOT NULL,
+                        attempts INTEGER NOT NULL DEFAULT 0,
+                        next_run_at REAL NOT NULL,
+                        lease_until REAL NOT NULL DEFAULT 0,
+                        last_error TEXT,
+                        created_at REAL NOT NULL,
+                        updated_at REAL NOT NULL
+                    )
+                """)
+                conn.execute(
+                    "CREATE INDEX IF NOT EXISTS enrichment_jobs_ready ON enrichment_jobs (status, priority, next_run_at)"
+                )
+                self._conn = conn
+                self.path = path
+                return conn
+            except (OSError, sqlite3.Error) as e:
+                logger.warning(f"No se pudo abrir la cola de enriquecimiento en {path}: {e}")
+        return None
+
+    # --- Productores ---
+
+    def encolar(self, empresas: List[Dict[str, Any]], prioridad: int = PRIORIDAD_BACKFILL) -> int:
+        """Encola las empresas que necesitan enriquecimiento (una por sitio). Retorna cuántos jobs nuevos hay."""
+        if not self.enabled or not empresas:
+            return 0
+        ahora = time.time()
+        filas = {}
+        for empresa in empresas:
+            if not isinstance(empresa, dict):
+                logger.warning(f"Empresa inválida en enriquecimiento diferido: {type(empresa)}")
+                continue
+            if not necesita_enriquecimiento(empresa):
+                continue
+            domain = clave_cache(empresa.get('website'))
+            if domain and domain not in filas:
+                filas[domain] = (domain, json.dumps(empresa, ensure_ascii=False, default=str), prioridad,
+                                 STATUS_PENDING, ahora, ahora, ahora)
+        if not filas:
+            return 0
+
+        with self._lock:
+            conn = self._connect()
+            if not conn:
+                return 0
+            try:
+                marcadores = ','.join('?' * len(filas))
+                vivos = conn.execute(
+                    f"SELECT COUNT(*) FROM enrichment_jobs WHERE domain IN ({marcadores}) AND status IN ('pending', 'running')",
+                    list(filas)
+                ).fetchone()[0]
+                # Dedupe por sitio: un job vivo conserva su estado y sólo puede subir de prioridad.
+                # Uno terminado vuelve a quedar pendiente: 'done' desde cero, 'failed' con sus intentos
+                # y sin adelantar el backoff que dejó _terminar
+                conn.executemany("""
+                    INSERT INTO enrichment_jobs (domain, empresa, priority, status, next_run_at, created_at, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(domain) DO UPDATE SET
+                        priority = CASE WHEN status IN ('done', 'failed') THEN excluded.priority
+                                        ELSE MIN(priority, excluded.priority) END,
+                        empresa = CASE WHEN status IN ('done', 'failed') THEN excluded.empresa ELSE empresa END,
+                        attempts = CASE WHEN status = 'done' THEN 0 ELSE attempts END,
+                        next_run_at = CASE WHEN status = 'done' THEN excluded.next_run_at
+                                           WHEN status = 'failed' THEN MAX(next_run_at, excluded.next_run_at)
+                                           ELSE next_run_at END,
+                        status = CASE WHEN status IN ('done', 'failed') THEN 'pending' ELSE status END,
+                        updated_at = excluded.updated_at
+                """, list(filas.values()))
+            except sqlite3.Error as e:
+                logger.error(f"Error encolando enriquecimiento diferido: {e}")
+                return 0
+            nuevas = len(filas) - vivos
+            self._stats["enqueued"] += nuevas
+            self._stats["deduplicated"] += vivos
+
+        self._wakeup.set()
+        return nuevas
+
+    # --- Consumidores ---
+
+    def reclamar(self) -> Optional[Tuple[str, Dict[str, Any], int]]:
+        """Toma el próximo job listo (mayor prioridad primero) con un lease. Retorna (dominio, empresa, intento)."""
+        ahora = time.time()
+        with self._lock:
+            conn = self._connect()
+            if not conn:
+                return None
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    row = conn.execute("""
+                        SELECT domain, empresa, attempts FROM enrichment_jobs
+                        WHERE (status = 'pending' AND next_run_at <= ?) OR (status = 'running' AND lease_until <= ?)
+                        ORDER BY priority, next_run_at
+                        LIMIT 1
+                    """, (ahora, ahora)).fetchone()
+                    if row:
+                        conn.execute(
+                            "UPDATE enrichment_jobs SET status = 'running', attempts = attempts + 1, lease_until = ?, "
+                            "updated_at = ? WHERE domain = ?",
+                            (ahora + self.lease_seconds, ahora, row[0])
+                        )
+                    if ahora - self._last_purge > _PURGE_INTERVAL_SECONDS:
+                        conn.execute(
+                            "DELETE FROM enrichment_jobs WHERE status = 'done' AND updated_at < ?",
+                            (ahora - QUEUE_DONE_RETENTION_SECONDS,)
+                        )
+                        self._last_purge = ahora
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+            except sqlite3.Error as e:
+                logger.error(f"Error tomando job de la cola de enriquecimiento: {e}")
+                return None
+        if not row:
+            return None
+        return row[0], json.loads(row[1]), row[2] + 1
+
+    def _terminar(self, domain: str, intento: int, ok: bool, error: Optional[str] = None):
+        ahora = time.time()
+        if ok:
+            status, next_run_at = STATUS_DONE, ahora
+            self._stats["succeeded"] += 1
+        elif intento >= self.max_attempts:
+            # next_run_at marca hasta cuándo un reencolado sigue esperando (el backoff continúa)
+            status, next_run_at = STATUS_FAILED, ahora + self.retry_base_seconds * (2 ** (intento - 1))
+            self._stats["failed"] += 1
+            logger.warning(f"Enriquecimiento diferido de {domain} abandonado tras {intento} intentos: {error}")
+        else:
+            delay = self.retry_base_seconds * (2 ** (intento - 1))
+            status, next_run_at = STATUS_PENDING, ahora + delay + random.uniform(0, delay * 0.1)
+            self._stats["retried"] += 1
+        with self._lock:
+            conn = self._connect()
+            if not conn:
+                return
+            try:
+                conn.execute(
+                    "UPDATE enrichment_jobs SET status = ?, next_run_at = ?, lease_until = 0, last_error = ?, "
+                    "updated_at = ? WHERE domain = ?",
+                    (status, next_run_at, error, ahora, domain)
+                )
+            except sqlite3.Error as e:
+                logger.error(f"Error actualizando job de {domain}: {e}")
+
+    def procesar_uno(self, handler: Optional[Callable[[Dict[str, Any]], bool]] = None) -> bool:
+        """Procesa un job si hay alguno listo. Retorna False si la cola no tenía trabajo."""
+        handler = handler or self._handler
+        job = self.reclamar()
+        if job is None:
+            return False
+        domain, empresa, intento = job
+        self._stats["processed"] += 1
+        try:
+            ok, error = bool(handler(empresa)), None
+            if not ok:
+                error = "sin resultado"
+        except Exception as e:
+            logger.error(f"Error en enriquecimiento diferido de {domain}: {e}")
+            ok, error = False, str(e)[:500]
+        self._terminar(domain, intento, ok, error)
+        return True
+
+    def _worker(self):
+        while not self._stop.is_set():
+            try:
+                if self.procesar_uno():
+                    continue
+            except Exception as e:
+                logger.error(f"Error en worker de enriquecimiento diferido: {e}")
+            # Sin trabajo listo: esperar a que encolen algo o a que venza algún backoff
+            self._wakeup.wait(self.poll_seconds)
+            self._wakeup.clear()
+
+    def start(self, handler: Callable[[Dict[str, Any]], bool]):
+        """Arranca los workers (idempotente)"""
+        if not self.enabled or any(t.is_alive() for t in self._threads):
+            return
+        self._handler = handler
+        self._stop.clear()
+        self._threads = [
+            Thread(target=self._worker, name=f"enrichment-worker-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for t in self._threads:
+            t.start()
+        logger.info(f"Cola de enriquecimiento diferido iniciada con {self.workers} workers ({self.path})")
+
+    def stop(self, timeout: float = 5.0):
+        """Detiene los workers; los jobs en curso quedan con lease y se retoman después"""
+        self._stop.set()
+        self._wakeup.set()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+
+    def stats(self) -> Dict[str, Any]:
+        data: Dict[str, Any] = {
+            **self._stats,
+            "enabled": self.enabled,
+            "workers": self.workers,
+            "workers_alive": sum(1 for t in self._threads if t.is_alive()),
+            "path": self.path
+        }
+        ahora = time.time()
+        with self._lock:
+            conn = self._connect()
+            if not conn:
+                return data
+            try:
+                data["by_status"] = dict(conn.execute(
+                    "SELECT status, COUNT(*) FROM enrichment_jobs GROUP BY status"
+                ).fetchall())
+                data["pending_by_priority"] = {
+                    str(p): n for p, n in conn.execute(
+                        "SELECT priority, COUNT(*) FROM enrichment_jobs WHERE status = 'pending' GROUP BY priority"
+                    ).fetchall()
+                }
+                ready, oldest = conn.execute(
+                    "SELECT COUNT(*), MIN(created_at) FROM enrichment_jobs WHERE status = 'pending' AND next_run_at <= ?",
+                    (ahora,)
+                ).fetchone()
+                data["ready"] = ready
+                data["oldest_ready_age_seconds"] = round(ahora - oldest, 1) if oldest else 0
+            except sqlite3.Error as e:
+                logger.error(f"Error leyendo métricas de la cola de enriquecimiento: {e}")
+        return data
+
+    def close(self):
+        self.stop()
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# Cola compartida del proceso (los workers se arrancan en el startup de la app)
+enrichment_queue = EnrichmentQueue()
@@ -2,34 +2,125 @@ import os
 import httpx
 import logging
 import asyncio
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Tuple
 import time
 from dotenv import load_dotenv
 import math
-from backend.db_supabase import increment_api_usage, get_current_month_usage, log_api_call
+import random
+import importlib.util
+from backend.db_supabase import increment_api_usage, get_current_month_usage, log_api_calls_batch
+from backend.budget_ledger import BudgetLedger
+from backend.telemetry_sink import ApiTelemetrySink
+from backend.rate_governor import RateGovernor
+from backend.search_cache import TTLLRUCache, build_search_cache_key, normalizar_query
+from backend.places_tile_store import (
+    PlacesTileStore, TILE_MAX_BITS, root_tiles_for_bbox, tile_bbox, tile_children, point_in_bbox
+)
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Cache de coordenadas y resultados para evitar llamadas duplicadas
-_SEARCH_CACHE = {} 
-_SEARCH_CACHE_TTL = 3600 # 1 hora
-
 load_dotenv()
 
+# Cache de resultados para evitar llamadas duplicadas (acotado, con TTL y desalojo LRU)
+_SEARCH_CACHE_TTL = int(os.getenv('GOOGLE_PLACES_CACHE_TTL_SECONDS', '3600')) # 1 hora
+_SEARCH_CACHE = TTLLRUCache(
+    max_entries=int(os.getenv('GOOGLE_PLACES_CACHE_MAX_ENTRIES', '2000')),
+    max_bytes=int(os.getenv('GOOGLE_PLACES_CACHE_MAX_MB', '64')) * 1024 * 1024,
+    ttl_seconds=_SEARCH_CACHE_TTL
+)
+
+# Tiles geohash persistentes compartidos entre búsquedas
+_TILE_STORE = PlacesTileStore()
+
+# Pool de conexiones HTTP compartido (evita un handshake TCP+TLS por llamada)
+PLACES_HTTP2_ENABLED = os.getenv('GOOGLE_PLACES_HTTP2', '1') == '1'
+PLACES_MAX_CONNECTIONS = int(os.getenv('GOOGLE_PLACES_MAX_CONNECTIONS', '20'))
+PLACES_MAX_KEEPALIVE = int(os.getenv('GOOGLE_PLACES_MAX_KEEPALIVE', '10'))
+PLACES_KEEPALIVE_EXPIRY = float(os.getenv('GOOGLE_PLACES_KEEPALIVE_EXPIRY', '60'))
+PLACES_TIMEOUT_SECONDS = float(os.getenv('GOOGLE_PLACES_TIMEOUT_SECONDS', '30'))
+
+# Endpoint base configurable: permite apuntar a places_fake_server para benchmarks offline
+PLACES_API_BASE_URL = os.getenv('GOOGLE_PLACES_BASE_URL', 'https://places.googleapis.com/v1').rstrip('/')
+
+# Concurrencia: límite global de llamadas a Places en vuelo y de cuadrantes simultáneos por búsqueda
+PLACES_MAX_IN_FLIGHT = max(1, int(os.getenv('GOOGLE_PLACES_MAX_IN_FLIGHT', '16')))
+QUADTREE_CONCURRENCY = max(1, int(os.getenv('GOOGLE_PLACES_QUADTREE_CONCURRENCY', '4')))
+
+# Reintentos ante 429/5xx (además de la baja de tasa AIMD del RateGovernor)
+PLACES_MAX_RETRIES = max(0, int(os.getenv('GOOGLE_PLACES_MAX_RETRIES', '2')))
+PLACES_RETRY_BASE_SECONDS = float(os.getenv('GOOGLE_PLACES_RETRY_BASE_SECONDS', '0.5'))
+
+# Modo de dos fases: descubrimiento con máscara Basic y detalles (website/teléfono) sólo para los leads que sobreviven
+PLACES_TWO_PHASE_ENABLED = os.getenv('GOOGLE_PLACES_TWO_PHASE', '0') == '1'
+PLACES_DETAILS_CONCURRENCY = max(1, int(os.getenv('GOOGLE_PLACES_DETAILS_CONCURRENCY', '8')))
+
+# HTTP/2 requiere el extra 'h2' de httpx; si no está instalado caemos a HTTP/1.1 con keep-alive
+_H2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+def _bboxes_intersect(a: Dict[str, float], b: Optional[Dict[str, float]]) -> bool:
+    if not b:
+        return True
+    return a["south"] <= b["north"] and a["north"] >= b["south"] and a["west"] <= b["east"] and a["east"] >= b["west"]
+
+class _InFlightRequest:
+    """Request compartida por llamadas idénticas concurrentes"""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+        self.abandonada = False  # Se le pidió cancel() (ya no quedan interesados)
+
+class _QuadtreeState:
+    """Estado compartido entre todos los cuadrantes de una misma búsqueda"""
+
+    def __init__(
+        self,
+        max_total_results: int,
+        semaphore: asyncio.Semaphore,
+        bbox: Optional[Dict[str, float]] = None,
+        use_advanced: bool = True,
+        user_id: Optional[str] = None
+    ):
+        self.max_total_results = max_total_results
+        self.semaphore = semaphore
+        self.bbox = bbox # Área pedida originalmente (para descartar lugares fuera de ella)
+        self.use_advanced = use_advanced # False en el descubrimiento de dos fases (máscara Basic)
+        self.user_id = user_id
+        self.results: Dict[str, Dict[str, Any]] = {} # google_id -> lead (deduplicado)
+
+    def is_full(self) -> bool:
+        return len(self.results) >= self.max_total_results
+
+    def add(self, mapped: Dict[str, Any]) -> bool:
+        """Agrega un resultado si hay cupo. Retorna False cuando ya no se aceptan más."""
+        if self.is_full():
+            return False
+        if mapped['google_id'] not in self.results:
+            self.results[mapped['google_id']] = mapped
+        return True
+
 class GooglePlacesClient:
     """
     Cliente para Google Places API (New) optimizado para B2B.
     Utiliza el endpoint de Text Search para máxima flexibilidad.
     """
     
-    BASE_URL = "https://places.googleapis.com/v1/places:searchText"
+    BASE_URL = f"{PLACES_API_BASE_URL}/places:searchText"
+    DETAILS_URL = f"{PLACES_API_BASE_URL}/places/{{place_id}}"
     
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = None):
         self.api_key = api_key or os.getenv("GOOGLE_MAPS_API_KEY") or os.getenv("VITE_GOOGLE_MAPS_API_KEY")
         if not self.api_key:
             logger.error("No se encontró GOOGLE_MAPS_API_KEY ni VITE_GOOGLE_MAPS_API_KEY en las variables de entorno.")
+
+        if base_url:
+            base_url = base_url.rstrip('/')
+            self.BASE_URL = f"{base_url}/places:searchText"
+            self.DETAILS_URL = f"{base_url}/places/{{place_id}}"
+        if not self.BASE_URL.startswith("https://places.googleapis.com/"):
+            logger.warning(f"Google Places apuntando a un endpoint alternativo: {self.BASE_URL}")
         
         # Máscaras de campo para optimización de costos según Tiers de Google
         # Basic: $17.00 USD por 1000 calls
@@ -51,20 +142,171 @@ class GooglePlacesClient:
             "places.internationalPhoneNumber"
         ]
         
+        # Campos de contacto para la fase de detalles (Place Details, sin prefijo 'places.')
+        self.FIELD_MASK_DETAILS = [
+            "id",
+            "websiteUri",
+            "nationalPhoneNumber",
+            "internationalPhoneNumber"
+        ]
+        
         # Configuración de costos y límites
         self.COST_PER_ADVANCED_CALL = 0.032 # $32/1k
         self.COST_PER_BASIC_CALL = 0.017    # $17/1k
+        self.COST_PER_DETAILS_CALL = float(os.getenv('GOOGLE_PLACES_DETAILS_COST_USD', '0.020')) # $20/1k (por lugar)
+        self.two_phase_enabled = PLACES_TWO_PHASE_ENABLED
         self.BUDGET_LIMIT_USD = 150.00       # Límite estricto compartido
+        self.budget_ledger = BudgetLedger(usage_loader=get_current_month_usage)
+        # Uso y logs se escriben en lotes (write-behind) en vez de 2 escrituras por llamada
+        self.telemetry = ApiTelemetrySink(usage_writer=increment_api_usage, logs_writer=log_api_calls_batch)
+        # Límite global de QPS con cola justa por usuario (compartido por todas las búsquedas del proceso)
+        self.rate_governor = RateGovernor()
+
+        # Cliente HTTP persistente (se crea de forma lazy en el primer request)
+        self._http_client: Optional[httpx.AsyncClient] = None
+        self._http_client_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._in_flight: Optional[asyncio.Semaphore] = None # Tope global de llamadas simultáneas a Places
+        self._in_flight_requests: Dict[Tuple, _InFlightRequest] = {} # Single-flight por clave de cache
+        self._transport_stats = {
+            "requests": 0,
+            "coalesced_requests": 0,
+            "retries": 0,
+            "new_connections": 0,
+            "reused_connections": 0,
+            "http2_requests": 0,
+        }
+
+    def _get_http_client(self) -> httpx.AsyncClient:
+        """
+        Retorna el cliente HTTP compartido, creándolo si no existe.
+        El pool queda ligado al event loop que lo creó, por lo que se recrea si cambia el loop.
+        """
+        loop = asyncio.get_running_loop()
+        if self._http_client is not None and not self._http_client.is_closed and self._http_client_loop is loop:
+            return self._http_client
+
+        use_http2 = PLACES_HTTP2_ENABLED and _H2_AVAILABLE
+        if PLACES_HTTP2_ENABLED and not _H2_AVAILABLE:
+            logger.warning("HTTP/2 solicitado pero el paquete 'h2' no está instalado. Usando HTTP/1.1 con keep-alive.")
+
+        self._http_client = httpx.AsyncClient(
+            http2=use_http2,
+            timeout=PLACES_TIMEOUT_SECONDS,
+            limits=httpx.Limits(
+                max_connections=PLACES_MAX_CONNECTIONS,
+                max_keepalive_connections=PLACES_MAX_KEEPALIVE,
+                keepalive_expiry=PLACES_KEEPALIVE_EXPIRY
+            )
+        )
+        self._http_client_loop = loop
+        self._in_flight = asyncio.Semaphore(PLACES_MAX_IN_FLIGHT)
+        logger.info(f"Pool HTTP de Google Places creado (http2={use_http2}, max_connections={PLACES_MAX_CONNECTIONS})")
+        return self._http_client
+
+    async def aclose(self):
+        """Vuelca la telemetría pendiente y cierra el pool de conexiones (llamar en el shutdown de la app)"""
+        try:
+            await self.telemetry.aclose()
+        finally:
+            if self._http_client is not None and not self._http_client.is_closed:
+                await self._http_client.aclose()
+            self._http_client = None
+            self._http_client_loop = None
+            self._in_flight = None
+
+    def get_transport_stats(self) -> Dict[str, Any]:
+        """Estadísticas acumuladas de reutilización de conexiones (por intento, reintentos incluidos)"""
+        stats = dict(self._transport_stats)
+        total = stats["requests"]
+        stats["reuse_ratio"] = round(stats["reused_connections"] / total, 3) if total else 0.0
+        return stats
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Contadores del cache de búsquedas (hits, misses, desalojos)"""
+        return _SEARCH_CACHE.stats()
+
+    def get_tile_stats(self) -> Dict[str, Any]:
+        """Contadores del tile store geohash (hits, misses, vencidos)"""
+        return _TILE_STORE.stats()
+
+    async def _post(self, url: str, headers: Dict[str, str], payload: Dict[str, Any], user_id: Optional[str] = None):
+        """POST usando el pool compartido. Retorna (response, connection_reused)."""
+        return await self._send("POST", url, headers, payload, user_id=user_id)
+
+    async def _get(self, url: str, headers: Dict[str, str], user_id: Optional[str] = None):
+        """GET usando el pool compartido. Retorna (response, connection_reused)."""
+        return await self._send("GET", url, headers, user_id=user_id)
+
+    async def _send(
+        self,
+        method: str,
+        url: str,
+        headers: Dict[str, str],
+        payload: Optional[Dict[str, Any]] = None,
+        user_id: Optional[str] = None
+    ):
+        """
+        Envía una request por el pool compartido. Espera turno en el RateGovernor (QPS global,
+        justo por usuario), respeta el tope de llamadas en vuelo y reintenta con backoff ante 429/5xx.
+        Detecta conexiones nuevas mediante el trace de httpcore; las estadísticas de transporte se
+        cuentan por intento (cada reintento es una request más, con su propia conexión).
+        """
+        new_connection = False
+
+        async def trace(event_name: str, info: Dict[str, Any]):
+            nonlocal new_connection
+            if event_name == "connection.connect_tcp.started":
+                new_connection = True
+
+        client = self._get_http_client()
+        for attempt in range(PLACES_MAX_RETRIES + 1):
+            await self.rate_governor.acquire(user_id)
+            new_connection = False
+            async with self._in_flight:
+                response = await client.request(method, url, headers=headers, json=payload, extensions={"trace": trace})
+
+            self._transport_stats["requests"] += 1
+            if new_connection:
+                self._transport_stats["new_connections"] += 1
+            else:
+                self._transport_stats["reused_connections"] += 1
+            if response.http_version == "HTTP/2":
+                self._transport_stats["http2_requests"] += 1
+            if response.status_code != 429 and response.status_code < 500:
+                self.rate_governor.on_success()
+                break
+
+            self.rate_governor.on_throttle()
+            if attempt < PLACES_MAX_RETRIES:
+                retry_after = response.headers.get("Retry-After", "")
+                delay = float(retry_after) if retry_after.isdigit() else PLACES_RETRY_BASE_SECONDS * (2 ** attempt)
+                logger.warning(f"Google Places respondió {response.status_code}. Reintento {attempt + 1}/{PLACES_MAX_RETRIES} en {delay:.1f}s")
+                self._transport_stats["retries"] += 1
+                await asyncio.sleep(delay + random.uniform(0, PLACES_RETRY_BASE_SECONDS))
+
+        return response, not new_connection
         
+    def field_mask_for(self, use_advanced: bool) -> str:
+        """Header X-Goog-FieldMask según el SKU (Basic o Advanced)"""
+        fields = self.FIELD_MASK_BASIC + self.FIELD_MASK_ADVANCED if use_advanced else self.FIELD_MASK_BASIC
+        return ",".join(fields) + ",nextPageToken"
+
     async def is_within_budget(self) -> bool:
-        """Verifica si aún queda crédito mensual disponible"""
-        try:
-            # Aunque get_current_month_usage es síncrona, la envolvemos para no bloquear
-            current_spend = await asyncio.to_thread(get_current_month_usage)
-            return current_spend < self.BUDGET_LIMIT_USD
-        except Exception as e:
-            logger.error(f"Error verificando presupuesto: {e}")
-            return True # Por seguridad, permitimos si falla la verificación
+        """Verifica si aún queda crédito mensual disponible (según el ledger en memoria)"""
+        await self.budget_ledger.ensure_fresh()
+        return self.budget_ledger.available(self.BUDGET_LIMIT_USD) > 0
+
+    def get_telemetry_stats(self) -> Dict[str, Any]:
+        """Estado del buffer de telemetría (pendientes, descartados, volcados)"""
+        return self.telemetry.stats()
+
+    def get_rate_limiter_stats(self) -> Dict[str, Any]:
+        """Tasa actual, profundidad de cola y tiempos de espera del limitador de QPS"""
+        return self.rate_governor.stats()
+
+    def get_budget_stats(self) -> Dict[str, Any]:
+        """Estado del ledger de presupuesto (gastado, reservado, disponible)"""
+        return self.budget_ledger.stats(limit=self.BUDGET_LIMIT_USD)
 
     async def search_places(
         self, 
@@ -75,7 +317,8 @@ class GooglePlacesClient:
         bbox: Optional[Dict[str, float]] = None,
         max_results: int = 20,
         page_token: Optional[str] = None,
-        use_advanced: bool = True # Flag para optimizar costo - default True now to get website/phone
+        use_advanced: bool = True, # Flag para optimizar costo - default True now to get website/phone
+        user_id: Optional[str] = None # Para el reparto justo de cuota entre usuarios
     ) -> Dict[str, Any]:
         """
         Realiza una búsqueda de lugares usando Text Search (New).
@@ -84,33 +327,89 @@ class GooglePlacesClient:
         if not self.api_key:
             return {"error": "API Key faltante", "places": []}
 
-        # 0. Caching (Simple key based on params)
-        cache_key = f"{query}_{lat}_{lng}_{radius}_{page_token}_{use_advanced}"
-        if cache_key in _SEARCH_CACHE:
-            cached_data, timestamp = _SEARCH_CACHE[cache_key]
-            if time.time() - timestamp < _SEARCH_CACHE_TTL:
-                logger.info(f"Retornando resultado cacheado para: {query}")
-                return cached_data
-
-        # 1. Verificar presupuesto antes de llamar
-        if not await self.is_within_budget():
-            logger.error(f"⚠️ PRESUPUESTO AGOTADO: El sistema ha bloqueado la llamada para evitar cargos extra. Límite: ${self.BUDGET_LIMIT_USD}")
-            return {"error": "PRESUPUESTO_AGOTADO", "places": []}
-
         # Determinar SKU y máscara de campos
-        fields = self.FIELD_MASK_BASIC
         sku = 'basic'
         cost = self.COST_PER_BASIC_CALL
         
         if use_advanced:
-            fields = self.FIELD_MASK_BASIC + self.FIELD_MASK_ADVANCED
             sku = 'pro' # Mantenemos 'pro' para consistencia con la DB de usuario
             cost = self.COST_PER_ADVANCED_CALL
 
+        field_mask = self.field_mask_for(use_advanced)
+
+        # 0. Caching (clave normalizada: query, coordenadas cuantizadas, radio, bbox, página y máscara)
+        cache_key = build_search_cache_key(
+            query, lat=lat, lng=lng, radius=radius, bbox=bbox,
+            page_token=page_token, field_mask=field_mask
+        )
+        cached_data = _SEARCH_CACHE.get(cache_key)
+        if cached_data is not None:
+            logger.info(f"Retornando resultado cacheado para: {query}")
+            return cached_data
+
+        # Single-flight: llamadas idénticas concurrentes esperan a la misma request
+        return await self._coalesced(cache_key, lambda: self._request_places(
+            query, lat, lng, radius, bbox, max_results, page_token,
+            sku=sku, cost=cost, field_mask=field_mask, cache_key=cache_key, user_id=user_id
+        ))
+
+    async def _coalesced(self, key: Tuple, factory) -> Dict[str, Any]:
+        """
+        Ejecuta factory() una sola vez por clave mientras esté en vuelo.
+        Todos los que esperan reciben el mismo resultado (incluidos errores, que no se cachean).
+        Si cancelan todos los que esperan, se cancela también la request compartida; una request
+        cancelada o ya terminada (su done callback todavía no corrió) no se reutiliza.
+        """
+        loop = asyncio.get_running_loop()
+        flight = self._in_flight_requests.get(key)
+        if (flight is None or flight.task.get_loop() is not loop or flight.abandonada
+                or flight.task.cancelled() or flight.task.done()):
+            flight = _InFlightRequest(loop.create_task(factory()))
+            self._in_flight_requests[key] = flight
+            flight.task.add_done_callback(
+                lambda t, k=key: self._in_flight_requests.pop(k, None)
+                if k in self._in_flight_requests and self._in_flight_requests[k].task is t else None
+            )
+        else:
+            self._transport_stats["coalesced_requests"] += 1
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                flight.abandonada = True
+                flight.task.cancel()
+
+    async def _request_places(
+        self,
+        query: str,
+        lat: Optional[float],
+        lng: Optional[float],
+        radius: Optional[float],
+        bbox: Optional[Dict[str, float]],
+        max_results: int,
+        page_token: Optional[str],
+        sku: str,
+        cost: float,
+        field_mask: str,
+        cache_key: Tuple,
+        user_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Llamada real a places:searchText (presupuesto, request, cache y telemetría)"""
+        # 1. Reservar el costo en el ledger antes de llamar (sin consultar la DB en cada llamada)
+        await self.budget_ledger.ensure_fresh()
+        reservation = self.budget_ledger.reserve(cost, self.BUDGET_LIMIT_USD)
+        if reservation is None:
+            logger.error(f"⚠️ PRESUPUESTO AGOTADO: El sistema ha bloqueado la llamada para evitar cargos extra. Límite: ${self.BUDGET_LIMIT_USD}")
+            return {"error": "PRESUPUESTO_AGOTADO", "places": []}
+        charged = False
+
         headers = {
             "Content-Type": "application/json",
             "X-Goog-Api-Key": self.api_key,
-            "X-Goog-FieldMask": ",".join(fields) + ",nextPageToken"
+            "X-Goog-FieldMask": field_mask
         }
 
         payload = {
@@ -142,8 +441,7 @@ class GooglePlacesClient:
         try:
             logger.info(f"Buscando en Google Places ({sku}): '{query}'")
             
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(self.BASE_URL, headers=headers, json=payload)
+            response, connection_reused = await self._post(self.BASE_URL, headers=headers, payload=payload, user_id=user_id)
             
             duration_ms = int((time.time() - start_time) * 1000)
             
@@ -151,62 +449,158 @@ class GooglePlacesClient:
                 logger.error(f"Error en Google Places API: {response.status_code} - {response.text}")
                 
                 # Log failure
-                asyncio.create_task(asyncio.to_thread(
-                    log_api_call,
+                self.telemetry.record_call(
                     provider='google',
                     endpoint='places:searchText',
                     sku=sku,
                     cost_usd=0,
                     status_code=response.status_code,
                     duration_ms=duration_ms,
-                    metadata={"query": query, "error": response.text}
-                ))
+                    metadata={"query": query, "error": response.text, "connection_reused": connection_reused, "user_id": user_id}
+                )
                 
                 return {"error": f"API Error {response.status_code}", "places": []}
 
-            # 2. Registrar el gasto (No bloqueante)
+            # 2. Registrar el gasto (ledger local + DB en lote, no bloqueante)
             # NOTA: Usamos 'pro' para consistencia con la configuración actual del usuario
-            asyncio.create_task(asyncio.to_thread(
-                increment_api_usage, provider='google', sku=sku, cost_usd=cost
-            ))
+            self.budget_ledger.commit(reservation)
+            charged = True
+            self.telemetry.record_usage(provider='google', sku=sku, cost_usd=cost)
             
             data = response.json()
             
             # Guardar en cache
-            _SEARCH_CACHE[cache_key] = (data, time.time())
+            _SEARCH_CACHE.set(cache_key, data)
             
             # Log success
-            asyncio.create_task(asyncio.to_thread(
-                log_api_call,
+            self.telemetry.record_call(
                 provider='google',
                 endpoint='places:searchText',
                 sku=sku,
                 cost_usd=cost,
                 status_code=200,
                 duration_ms=duration_ms,
-                metadata={"query": query, "results_count": len(data.get('places', []))}
-            ))
+                metadata={
+                    "query": query,
+                    "results_count": len(data.get('places', [])),
+                    "connection_reused": connection_reused,
+                    "http_version": response.http_version,
+                    "user_id": user_id
+                }
+            )
 
             return data
 
         except Exception as e:
             logger.error(f"Excepción en search_places: {e}")
             # Log exception
-            try:
-                duration_ms = int((time.time() - start_time) * 1000)
-                log_api_call(
-                    provider='google', 
-                    endpoint='places:searchText',
-                    sku='pro',
-                    cost_usd=0,
-                    status_code=500,
-                    duration_ms=duration_ms,
-                    metadata={"query": query, "exception": str(e)}
-                )
-            except:
-                pass
+            duration_ms = int((time.time() - start_time) * 1000)
+            self.telemetry.record_call(
+                provider='google', 
+                endpoint='places:searchText',
+                sku=sku,
+                cost_usd=0,
+                status_code=500,
+                duration_ms=duration_ms,
+                metadata={"query": query, "exception": str(e), "user_id": user_id}
+            )
                 
             return {"error": str(e), "places": []}
+        finally:
+            if not charged:
+                self.budget_ledger.release(reservation)
+
+    async def get_place_details(self, place_id: str, user_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Place Details (New) con sólo los campos de contacto (website y teléfono).
+        Comparte cache, single-flight, presupuesto y telemetría con search_places.
+        """
+        if not self.api_key:
+            return {"error": "API Key faltante"}
+
+        field_mask = ",".join(self.FIELD_MASK_DETAILS)
+        cache_key = ("details", place_id, field_mask)
+        cached_data = _SEARCH_CACHE.get(cache_key)
+        if cached_data is not None:
+            return cached_data
+
+        return await self._coalesced(cache_key, lambda: self._request_details(place_id, field_mask, cache_key, user_id))
+
+    async def _request_details(self, place_id: str, field_mask: str, cache_key: Tuple, user_id: Optional[str] = None) -> Dict[str, Any]:
+        sku = 'details'
+        cost = self.COST_PER_DETAILS_CALL
+
+        await self.budget_ledger.ensure_fresh()
+        reservation = self.budget_ledger.reserve(cost, self.BUDGET_LIMIT_USD)
+        if reservation is None:
+            logger.error(f"⚠️ PRESUPUESTO AGOTADO: detalles de {place_id} bloqueados. Límite: ${self.BUDGET_LIMIT_USD}")
+            return {"error": "PRESUPUESTO_AGOTADO"}
+        charged = False
+
+        headers = {
+            "X-Goog-Api-Key": self.api_key,
+            "X-Goog-FieldMask": field_mask
+        }
+        start_time = time.time()
+        try:
+            response, connection_reused = await self._get(self.DETAILS_URL.format(place_id=place_id), headers=headers, user_id=user_id)
+            duration_ms = int((time.time() - start_time) * 1000)
+
+            if response.status_code != 200:
+                logger.error(f"Error en Place Details: {response.status_code} - {response.text}")
+                self.telemetry.record_call(
+                    provider='google', endpoint='places:details', sku=sku, cost_usd=0,
+                    status_code=response.status_code, duration_ms=duration_ms,
+                    metadata={"place_id": place_id, "error": response.text, "user_id": user_id}
+                )
+                return {"error": f"API Error {response.status_code}"}
+
+            self.budget_ledger.commit(reservation)
+            charged = True
+            self.telemetry.record_usage(provider='google', sku=sku, cost_usd=cost)
+
+            data = response.json()
+            _SEARCH_CACHE.set(cache_key, data)
+            self.telemetry.record_call(
+                provider='google', endpoint='places:details', sku=sku, cost_usd=cost,
+                status_code=200, duration_ms=duration_ms,
+                metadata={"place_id": place_id, "connection_reused": connection_reused, "user_id": user_id}
+            )
+            return data
+        except Exception as e:
+            logger.error(f"Excepción en get_place_details: {e}")
+            duration_ms = int((time.time() - start_time) * 1000)
+            self.telemetry.record_call(
+                provider='google', endpoint='places:details', sku=sku, cost_usd=0,
+                status_code=500, duration_ms=duration_ms,
+                metadata={"place_id": place_id, "exception": str(e), "user_id": user_id}
+            )
+            return {"error": str(e)}
+        finally:
+            if not charged:
+                self.budget_ledger.release(reservation)
+
+    async def fetch_contact_details(self, leads: List[Dict[str, Any]], user_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Fase 2 del modo de dos fases: completa website y teléfono sólo para los leads
+        que sobrevivieron filtros y ranking, en paralelo (GOOGLE_PLACES_DETAILS_CONCURRENCY).
+        """
+        semaphore = asyncio.Semaphore(PLACES_DETAILS_CONCURRENCY)
+
+        async def completar(lead: Dict[str, Any]):
+            if not lead.get('google_id') or (lead.get('website') and lead.get('telefono')):
+                return
+            async with semaphore:
+                data = await self.get_place_details(lead['google_id'], user_id=user_id)
+            if "error" in data:
+                return
+            if not lead.get('website'):
+                lead['website'] = data.get("websiteUri", "")
+            if not lead.get('telefono'):
+                lead['telefono'] = data.get("nationalPhoneNumber", data.get("internationalPhoneNumber", ""))
+
+        await asyncio.gather(*(completar(lead) for lead in leads))
+        return leads
 
     async def search_all_places(
         self,
@@ -219,88 +613,201 @@ class GooglePlacesClient:
         bbox: Optional[Dict[str, float]] = None,
         max_total_results: int = 100,
         depth: int = 0,
-        max_depth: int = 3
+        max_depth: int = 3,
+        use_advanced: bool = True,
+        user_id: Optional[str] = None
     ) -> List[Dict[str, Any]]:
         """
         Versión avanzada de búsqueda que implementa Paginación (60)
         y Subdivisión Espacial (Quadtree) si se detecta saturación.
+        Con use_advanced=False sólo se piden campos Basic; website y teléfono
+        se completan luego con fetch_contact_details para los leads elegidos.
+        Con bbox, el quadtree trabaja sobre tiles geohash fijos cuyos resultados se
+        persisten en el tile store, así búsquedas superpuestas sólo consultan a Google
+        los tiles faltantes o vencidos. Los sub-cuadrantes se exploran de forma
+        concurrente y se cancelan en cuanto se alcanza max_total_results.
+        """
+        state = _QuadtreeState(
+            max_total_results=max_total_results,
+            semaphore=asyncio.Semaphore(QUADTREE_CONCURRENCY),
+            bbox=bbox if isinstance(bbox, dict) else None,
+            use_advanced=use_advanced,
+            user_id=user_id
+        )
+
+        if state.bbox:
+            roots = root_tiles_for_bbox(state.bbox)
+            field_mask = self.field_mask_for(use_advanced=use_advanced)
+            if len(roots) > 1 and not await asyncio.to_thread(
+                _TILE_STORE.vigentes, roots, normalizar_query(query), field_mask
+            ):
+                # Primera búsqueda del área: una sola llamada sobre el bbox pedido. Sólo si satura se
+                # baja a los tiles raíz, que cuentan como el primer nivel de subdivisión (no multiplican max_depth)
+                fetched = await self._fetch_area(state, query, lat, lng, None, state.bbox)
+                if fetched is None:
+                    return list(state.results.values())[:max_total_results]
+                places, dense = fetched
+                self._agregar_lugares(state, places, rubro_nombre, rubro_key, lat, lng)
+                if not dense or depth >= max_depth:
+                    return list(state.results.values())[:max_total_results]
+                depth += 1
+            logger.info(f"Búsqueda por tiles: {len(roots)} tiles raíz de {len(roots[0])} bits para '{query}'")
+            tasks = [
+                asyncio.create_task(self._search_quadrant(
+                    state, query, rubro_nombre, rubro_key,
+                    lat=lat, lng=lng, radius=None, tile=tile,
+                    depth=depth, max_depth=max_depth
+                ))
+                for tile in roots
+            ]
+            await self._await_until_full(state, tasks)
+        else:
+            await self._search_quadrant(
+                state, query, rubro_nombre, rubro_key,
+                lat=lat, lng=lng, radius=radius, tile=None,
+                depth=depth, max_depth=max_depth
+            )
+        return list(state.results.values())[:max_total_results]
+
+    async def _fetch_area(
+        self,
+        state: "_QuadtreeState",
+        query: str,
+        lat: Optional[float],
+        lng: Optional[float],
+        radius: Optional[float],
+        bbox: Optional[Dict[str, float]]
+    ) -> Optional[Tuple[List[Dict[str, Any]], bool]]:
+        """
+        Consulta un área (primera página + paginación si no está saturada).
+        Retorna (lugares crudos, saturada), o None si la primera página falla o ya no hace falta.
         """
         # No clutter the query with too many keywords; Google Places (New) is smart enough.
         # We just use the query as is for higher quality results.
         optimized_query = query
-        
-        all_results = {} # Usamos dict con google_id para deduplicar
-        results_this_area = []
 
         # 1. Búsqueda INICIAL para determinar densidad
         # Solo hacemos 1 llamada inicial. Si hay muchos resultados (>15), 
         # saltamos directamente a la subdivisión sin paginar el área grande (ahorro de costos).
-        data = await self.search_places(
-            query=optimized_query,
-            lat=lat,
-            lng=lng,
-            radius=radius,
-            bbox=bbox,
-            use_advanced=True # SKU avanzado ($32/1k) para traer website y phone
-        )
-        
-        if "error" not in data:
-            places = data.get("places", [])
-            for p in places:
-                mapped = self.map_to_internal_format(p, rubro_nombre, rubro_key, lat, lng)
-                if mapped['google_id'] not in all_results:
-                    all_results[mapped['google_id']] = mapped
-                    results_this_area.append(mapped)
-
-        # 2. Lógica de Paginación vs Subdivisión (Optimizada)
-        # Si hay sospecha de que hay más resultados, elegimos la estrategia más eficiente
-        if len(results_this_area) >= 15 and depth < max_depth and bbox:
-            # Estrategia: "Go Deep" (Subdividir)
-            # No paginamos más el área grande, vamos directo a las 4 sub-áreas
-            logger.info(f" Área densa. Subdividiendo cuadrante (Nivel {depth+1}) para mayor resolución...")
-            
-            s, w, n, e = bbox["south"], bbox["west"], bbox["north"], bbox["east"]
-            mid_lat = (s + n) / 2
-            mid_lng = (w + e) / 2
+        async with state.semaphore:
+            if state.is_full():
+                return None
+            data = await self.search_places(
+                query=optimized_query,
+                lat=lat,
+                lng=lng,
+                radius=radius,
+                bbox=bbox,
+                use_advanced=state.use_advanced, # SKU avanzado ($32/1k) para traer website y phone
+                user_id=state.user_id
+            )
+        if "error" in data:
+            return None
+
+        places = list(data.get("places", []))
+        if len(places) >= 15:
+            return places, True
+
+        # Estrategia: "Stay Here" (Paginar)
+        # Solo si no es tan densa como para subdividir, pero hay más páginas
+        current_page_token = data.get("nextPageToken")
+        for _ in range(4): # Max 4 páginas extra (total 100)
+            if not current_page_token or state.is_full(): break
             
-            sub_bboxes = [
-                {"south": s, "west": w, "north": mid_lat, "east": mid_lng}, # SW
-                {"south": s, "west": mid_lng, "north": mid_lat, "east": e}, # SE
-                {"south": mid_lat, "west": w, "north": n, "east": mid_lng}, # NW
-                {"south": mid_lat, "west": mid_lng, "north": n, "east": e}  # NE
-            ]
-            for sub_bbox in sub_bboxes:
-                if len(all_results) >= max_total_results: break
-                sub_results = await self.search_all_places(
-                    query=query, rubro_nombre=rubro_nombre, rubro_key=rubro_key,
-                    lat=lat, lng=lng, bbox=sub_bbox,
-                    max_total_results=max_total_results, depth=depth + 1, max_depth=max_depth
-                )
-                for res in sub_results:
-                    if len(all_results) >= max_total_results: break
-                    all_results[res['google_id']] = res
-        elif data.get("nextPageToken") and len(all_results) < max_total_results:
-            # Estrategia: "Stay Here" (Paginar)
-            # Solo si no es tan densa como para subdividir, pero hay más páginas
-            current_page_token = data.get("nextPageToken")
-            for _ in range(4): # Max 4 páginas extra (total 100)
-                if not current_page_token or len(all_results) >= max_total_results: break
-                
+            async with state.semaphore:
                 data_page = await self.search_places(
                     query=optimized_query, lat=lat, lng=lng, radius=radius, bbox=bbox,
-                    page_token=current_page_token, use_advanced=True
+                    page_token=current_page_token, use_advanced=state.use_advanced,
+                    user_id=state.user_id
                 )
-                if "error" in data_page: break
-                
-                for p in data_page.get("places", []):
-                    mapped = self.map_to_internal_format(p, rubro_nombre, rubro_key, lat, lng)
-                    if mapped['google_id'] not in all_results:
-                        all_results[mapped['google_id']] = mapped
-                        if len(all_results) >= max_total_results: break
-                
-                current_page_token = data_page.get("nextPageToken")
+            if "error" in data_page: break
+            
+            places.extend(data_page.get("places", []))
+            current_page_token = data_page.get("nextPageToken")
 
-        return list(all_results.values())[:max_total_results]
+        return places, False
+
+    async def _search_quadrant(
+        self,
+        state: "_QuadtreeState",
+        query: str,
+        rubro_nombre: str,
+        rubro_key: str,
+        lat: Optional[float],
+        lng: Optional[float],
+        radius: Optional[float],
+        tile: Optional[str],
+        depth: int,
+        max_depth: int
+    ):
+        """Explora un tile (o el área sin bbox) y, si está saturado, sus 4 sub-tiles en paralelo"""
+        if state.is_full():
+            return
+
+        bbox = tile_bbox(tile) if tile else None
+        field_mask = self.field_mask_for(use_advanced=state.use_advanced)
+        store_query = normalizar_query(query)
+
+        # 1. Reutilizar el tile si otra búsqueda ya lo trajo y sigue vigente
+        cached_tile = await asyncio.to_thread(_TILE_STORE.get, tile, store_query, field_mask) if tile else None
+        if cached_tile is not None:
+            places, dense = cached_tile["places"], cached_tile["dense"]
+        else:
+            fetched = await self._fetch_area(state, query, lat, lng, radius, bbox)
+            if fetched is None:
+                return
+            places, dense = fetched
+            if tile:
+                await asyncio.to_thread(_TILE_STORE.put, tile, store_query, field_mask, places, dense)
+
+        self._agregar_lugares(state, places, rubro_nombre, rubro_key, lat, lng)
+
+        # 2. Estrategia: "Go Deep" (Subdividir)
+        # No paginamos más el área grande, vamos directo a los 4 sub-tiles
+        if dense and tile and depth < max_depth and len(tile) + 2 <= TILE_MAX_BITS:
+            logger.info(f" Área densa. Subdividiendo cuadrante (Nivel {depth+1}) para mayor resolución...")
+            children = [
+                child for child in tile_children(tile)
+                if _bboxes_intersect(tile_bbox(child), state.bbox)
+            ]
+            tasks = [
+                asyncio.create_task(self._search_quadrant(
+                    state, query, rubro_nombre, rubro_key,
+                    lat=lat, lng=lng, radius=None, tile=child,
+                    depth=depth + 1, max_depth=max_depth
+                ))
+                for child in children
+            ]
+            await self._await_until_full(state, tasks)
+
+    def _agregar_lugares(self, state: "_QuadtreeState", places: List[Dict[str, Any]], rubro_nombre: str,
+                         rubro_key: str, lat: Optional[float], lng: Optional[float]):
+        for p in places:
+            mapped = self.map_to_internal_format(p, rubro_nombre, rubro_key, lat, lng)
+            if state.bbox and not point_in_bbox(mapped['latitud'], mapped['longitud'], state.bbox):
+                continue # Los tiles pueden exceder el área pedida
+            if not state.add(mapped):
+                break
+
+    async def _await_until_full(self, state: "_QuadtreeState", tasks: List[asyncio.Task]):
+        """
+        Espera a los sub-cuadrantes y cancela los pendientes en cuanto se completa el cupo.
+        Si esta tarea es cancelada, propaga la cancelación a todos sus hijos.
+        """
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if not task.cancelled() and task.exception():
+                        logger.error(f"Error explorando sub-cuadrante: {task.exception()}")
+                if state.is_full():
+                    break
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
 
     def calcular_distancia(self, lat1, lon1, lat2, lon2):
         """Calcula la distancia en km entre dos puntos usando Haversine."""
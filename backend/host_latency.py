@@ -0,0 +1,145 @@
+"""
+Latencias observadas por host y por sufijo (com.ar, wixsite.com...) para derivar timeouts adaptativos.
+
+Cada descarga registra el tiempo hasta los encabezados de la respuesta (conexión + TLS + servidor)
+en un histograma de buckets logarítmicos. El timeout de lectura sale del p95 del host (o de su
+sufijo, si el host tiene pocas muestras) multiplicado por un margen, acotado entre
+LATENCY_MIN_TIMEOUT y el timeout por defecto de quien llama: un host que siempre responde en 300ms
+no retiene un lote durante 10s, y uno lento conocido conserva el timeout completo.
+
+El de conexión no se adapta: un connect timeout marca al host como caído en dead_hosts (con
+backoff de horas o días), así que no puede depender de la latencia de otros hosts del sufijo.
+
+El p90 también marca cuándo conviene disparar una segunda solicitud de cobertura (hedge).
+Las descargas que vencen por timeout se registran con el tiempo que se esperó, así el histograma
+no subestima a los hosts lentos.
+"""
+
+import bisect
+import os
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    from .dead_hosts import host_de
+    from .scraping_cache import normalizar_dominio
+except ImportError:
+    from dead_hosts import host_de
+    from scraping_cache import normalizar_dominio
+
+LATENCY_MIN_SAMPLES = max(1, int(os.getenv('SCRAPER_LATENCY_MIN_SAMPLES', '5')))
+LATENCY_TIMEOUT_FACTOR = float(os.getenv('SCRAPER_LATENCY_TIMEOUT_FACTOR', '3'))
+LATENCY_MIN_TIMEOUT = float(os.getenv('SCRAPER_LATENCY_MIN_TIMEOUT_SECONDS', '2'))
+CONNECT_TIMEOUT_MAX = float(os.getenv('SCRAPER_CONNECT_TIMEOUT_SECONDS', '5'))
+LATENCY_MAX_HOSTS = int(os.getenv('SCRAPER_LATENCY_MAX_HOSTS', '20000'))
+_MAX_MUESTRAS = 200  # Al superarlas se reducen a la mitad: pesan más las recientes
+
+# Límites superiores de los buckets: 50ms, 75ms, ... ~50s
+_BUCKETS: List[float] = [round(0.05 * 1.5 ** i, 3) for i in range(18)]
+
+
+class Histograma:
+    """Conteos por bucket logarítmico; los percentiles retornan el límite superior del bucket"""
+    __slots__ = ("conteos", "total")
+
+    def __init__(self):
+        self.conteos = [0] * (len(_BUCKETS) + 1)
+        self.total = 0
+
+    def registrar(self, segundos: float):
+        self.conteos[bisect.bisect_left(_BUCKETS, segundos)] += 1
+        self.total += 1
+        if self.total > _MAX_MUESTRAS:
+            self.conteos = [c // 2 for c in self.conteos]
+            self.total = sum(self.conteos)
+
+    def percentil(self, q: float) -> Optional[float]:
+        if not self.total:
+            return None
+        objetivo = q * self.total
+        acumulado = 0
+        for i, conteo in enumerate(self.conteos):
+            acumulado += conteo
+            if acumulado >= objetivo:
+                return _BUCKETS[i] if i < len(_BUCKETS) else _BUCKETS[-1] * 1.5
+        return _BUCKETS[-1] * 1.5
+
+
+def sufijo_de(host: str) -> str:
+    """'tienda.empresa.com.ar' -> 'com.ar'; 'x.wixsite.com' -> 'wixsite.com'"""
+    dominio = normalizar_dominio(host) or host
+    return dominio.split('.', 1)[1] if '.' in dominio else dominio
+
+
+class HostLatency:
+    """Histogramas por host (LRU acotado) y por sufijo, con timeouts y umbral de hedge derivados"""
+
+    def __init__(
+        self,
+        min_samples: int = LATENCY_MIN_SAMPLES,
+        factor: float = LATENCY_TIMEOUT_FACTOR,
+        min_timeout: float = LATENCY_MIN_TIMEOUT,
+        connect_max: float = CONNECT_TIMEOUT_MAX,
+        max_hosts: int = LATENCY_MAX_HOSTS
+    ):
+        self.min_samples = min_samples
+        self.factor = factor
+        self.min_timeout = min_timeout
+        self.connect_max = connect_max
+        self.max_hosts = max_hosts
+        self._lock = Lock()
+        self._hosts: "OrderedDict[str, Histograma]" = OrderedDict()
+        self._sufijos: Dict[str, Histograma] = {}
+        self._stats = {"samples": 0, "adaptive_timeouts": 0}
+
+    def registrar(self, url: str, segundos: float):
+        host = host_de(url)
+        if not host:
+            return
+        with self._lock:
+            hist = self._hosts.pop(host, None) or Histograma()
+            hist.registrar(segundos)
+            self._hosts[host] = hist
+            while len(self._hosts) > self.max_hosts:
+                self._hosts.popitem(last=False)
+            self._sufijos.setdefault(sufijo_de(host), Histograma()).registrar(segundos)
+            self._stats["samples"] += 1
+
+    def percentil(self, url: str, q: float) -> Optional[float]:
+        """Percentil del host si tiene muestras suficientes; si no, el de su sufijo; None sin datos"""
+        host = host_de(url)
+        if not host:
+            return None
+        with self._lock:
+            for hist in (self._hosts.get(host), self._sufijos.get(sufijo_de(host))):
+                if hist is not None and hist.total >= self.min_samples:
+                    return hist.percentil(q)
+        return None
+
+    def timeouts(self, url: str, default: float) -> Tuple[float, float]:
+        """(connect, read) para la próxima descarga de url, nunca por encima de default; connect es fijo"""
+        connect = min(self.connect_max, default)
+        p95 = self.percentil(url, 0.95)
+        if p95 is None:
+            return connect, default
+        self._stats["adaptive_timeouts"] += 1
+        return connect, min(default, max(self.min_timeout, p95 * self.factor))
+
+    def umbral_hedge(self, url: str, default: float) -> float:
+        """Segundos a esperar la primera solicitud antes de lanzar la de cobertura (p90 observado)"""
+        p90 = self.percentil(url, 0.90)
+        return default if p90 is None else p90
+
+    def clear(self):
+        with self._lock:
+            self._hosts.clear()
+            self._sufijos.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._stats, "hosts": len(self._hosts), "suffixes": len(self._sufijos)}
+
+
+# Compartido por el scraper sincrónico y el asíncrono
+host_latency = HostLatency()
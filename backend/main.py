@@ -34,7 +34,10 @@ try:
     )
     from backend.scraper import enriquecer_empresa_b2b, ScraperSession
     from backend.social_scraper import enriquecer_con_redes_sociales
-    from backend.scraper_parallel import enriquecer_empresas_paralelo
+    from backend.scraper_parallel import enriquecer_empresas_paralelo, procesar_job_diferido
+    from backend.scraper_async import async_scraper
+    from backend.enrichment_queue import enrichment_queue
+    from backend.parse_pool import parse_pool
     from backend.validators import validar_empresa
     from backend.smart_filter_service import apply_smart_filter
     from backend.db_supabase import (
@@ -81,6 +84,9 @@ except ImportError as e:
     from scraper import *
     from social_scraper import *
     from scraper_parallel import *
+    from scraper_async import async_scraper
+    from enrichment_queue import enrichment_queue
+    from parse_pool import parse_pool
     from validators import *
     from db_supabase import (
         insertar_empresa, 
@@ -339,6 +345,35 @@ async def startup():
         logger.error(f"⚠️ Error no fatal en startup: {e}")
         # No relanzamos la excepción para permitir que la app inicie
 
+    try:
+        # Sembrar el ledger de presupuesto de Google Places desde api_usage_stats
+        await google_client.budget_ledger.reconcile()
+        logger.info(f"Ledger de presupuesto inicializado: {google_client.get_budget_stats()}")
+    except Exception as e:
+        logger.error(f"⚠️ No se pudo sembrar el ledger de presupuesto: {e}")
+
+    try:
+        # Workers del enriquecimiento diferido (retoman los jobs que quedaron de ejecuciones anteriores)
+        enrichment_queue.start(procesar_job_diferido)
+    except Exception as e:
+        logger.error(f"⚠️ No se pudo iniciar la cola de enriquecimiento diferido: {e}")
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Libera recursos compartidos (pools HTTP de Google Places y del scraper, pool de parseo)"""
+    # Cada cierre por separado: si uno falla, los demás igual liberan sus recursos
+    cierres = [
+        ("cliente de Google Places (y su telemetría)", google_client.aclose),
+        ("scraper async", async_scraper.aclose),
+        ("cola de enriquecimiento diferido", lambda: asyncio.to_thread(enrichment_queue.stop)),
+        ("pool de parseo", lambda: asyncio.to_thread(parse_pool.shutdown)),
+    ]
+    for nombre, cerrar in cierres:
+        try:
+            await cerrar()
+        except Exception as e:
+            logger.error(f"Error cerrando {nombre} en shutdown: {e}")
+
 
 @app.get("/")
 async def root():
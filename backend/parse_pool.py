@@ -0,0 +1,142 @@
+"""
+Etapa de CPU del scraping: parseo de HTML y extracción de contactos en un pool de procesos.
+
+Los threads (o corutinas) de descarga sólo esperan sockets; BeautifulSoup, get_text y las regex
+corren en procesos aparte, así el parseo de una página grande no frena por el GIL la red de las
+demás. Al pool entra el HTML ya decodificado y vuelve el dict compacto de extraer_datos_pagina
+(listas y strings), nunca el soup. Los trabajos (scraper.analizar_home / analizar_subpagina) son
+funciones de módulo para poder picklearse.
+
+Entre ambas etapas hay una cola acotada (PARSE_QUEUE_SIZE trabajos entre encolados y en curso):
+cuando se llena, la descarga siguiente espera turno en vez de acumular HTML en memoria.
+
+Con SCRAPER_PARSE_PROCESSES=0, o si el pool no puede arrancar o se rompe, se parsea en el
+proceso actual como antes.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+PARSE_PROCESSES = max(0, int(os.getenv('SCRAPER_PARSE_PROCESSES', str(os.cpu_count() or 1))))  # 0 = sin pool
+PARSE_QUEUE_SIZE = max(1, int(os.getenv('SCRAPER_PARSE_QUEUE_SIZE', str(max(1, PARSE_PROCESSES) * 4))))
+
+
+class PoolParseo:
+    """Pool de procesos perezoso con cola de entrada acotada y respaldo en el proceso actual"""
+
+    def __init__(self, procesos: int = PARSE_PROCESSES, max_pendientes: int = PARSE_QUEUE_SIZE):
+        self.procesos = procesos
+        self.max_pendientes = max_pendientes
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._deshabilitado = procesos <= 0
+        self._slots = threading.BoundedSemaphore(max_pendientes)
+        self._slots_async: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = \
+            weakref.WeakKeyDictionary()
+        self._stats = {"parsed_in_pool": 0, "parsed_inline": 0, "backpressure_waits": 0, "pool_failures": 0,
+                       "parse_seconds": 0.0, "queue_wait_seconds": 0.0}
+
+    def _get_executor(self) -> Optional[ProcessPoolExecutor]:
+        if self._deshabilitado:
+            return None
+        with self._lock:
+            if self._executor is None and not self._deshabilitado:
+                try:
+                    # spawn: los hijos no heredan los threads ni los sockets del proceso que scrapea
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.procesos, mp_context=multiprocessing.get_context('spawn')
+                    )
+                except (OSError, ValueError, NotImplementedError) as e:
+                    logger.warning(f"No se pudo crear el pool de parseo, se parsea en el proceso actual: {e}")
+                    self._deshabilitado = True
+            return self._executor
+
+    def _marcar_roto(self, executor: ProcessPoolExecutor, error: Exception):
+        """Un hijo murió (OOM, segfault de lxml): se descarta el pool y se recrea en el próximo trabajo"""
+        logger.warning(f"Pool de parseo roto, se recrea: {error}")
+        with self._lock:
+            self._stats["pool_failures"] += 1
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _inline(self, fn: Callable[..., Dict], *args) -> Dict:
+        self._stats["parsed_inline"] += 1
+        inicio = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            self._stats["parse_seconds"] += time.perf_counter() - inicio
+
+    def ejecutar(self, fn: Callable[..., Dict], *args) -> Dict:
+        """Corre fn(*args) en el pool y espera el resultado; bloquea si la cola está llena"""
+        executor = self._get_executor()
+        if executor is None:
+            return self._inline(fn, *args)
+
+        if not self._slots.acquire(blocking=False):
+            self._stats["backpressure_waits"] += 1
+            inicio = time.perf_counter()
+            self._slots.acquire()
+            self._stats["queue_wait_seconds"] += time.perf_counter() - inicio
+        inicio = time.perf_counter()
+        try:
+            resultado = executor.submit(fn, *args).result()
+        except BrokenProcessPool as e:
+            self._marcar_roto(executor, e)
+            return self._inline(fn, *args)
+        finally:
+            self._slots.release()
+        self._stats["parsed_in_pool"] += 1
+        self._stats["parse_seconds"] += time.perf_counter() - inicio
+        return resultado
+
+    async def ejecutar_async(self, fn: Callable[..., Dict], *args) -> Dict:
+        """Equivalente asíncrono: espera turno en la cola sin bloquear el event loop"""
+        executor = self._get_executor()
+        if executor is None:
+            return await asyncio.to_thread(self._inline, fn, *args)
+
+        loop = asyncio.get_running_loop()
+        slots = self._slots_async.get(loop)
+        if slots is None:
+            slots = self._slots_async[loop] = asyncio.Semaphore(self.max_pendientes)
+        if slots.locked():
+            self._stats["backpressure_waits"] += 1
+        inicio = time.perf_counter()
+        async with slots:
+            self._stats["queue_wait_seconds"] += time.perf_counter() - inicio
+            inicio = time.perf_counter()
+            try:
+                resultado = await loop.run_in_executor(executor, fn, *args)
+            except BrokenProcessPool as e:
+                self._marcar_roto(executor, e)
+                return await asyncio.to_thread(self._inline, fn, *args)
+        self._stats["parsed_in_pool"] += 1
+        self._stats["parse_seconds"] += time.perf_counter() - inicio
+        return resultado
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats, "parse_seconds": round(self._stats["parse_seconds"], 3),
+                "queue_wait_seconds": round(self._stats["queue_wait_seconds"], 3),
+                "processes": 0 if self._deshabilitado else self.procesos, "queue_size": self.max_pendientes}
+
+
+# Compartido por el scraper sincrónico, el asíncrono y la cola diferida
+parse_pool = PoolParseo()
@@ -0,0 +1,408 @@
+"""
+Servidor local que imita Google Places API (New) para benchmarks y pruebas de carga.
+
+Modos:
+  - synthetic: genera lugares sintéticos deterministas con densidad configurable por zona,
+    paginación (20 por página, máximo 60 como Google), latencia log-normal y errores 429 inyectables.
+  - record: reenvía cada request a Google real y guarda la respuesta en un cassette JSONL.
+  - replay: responde desde el cassette, sin red ni costo.
+
+Uso:
+    python -m backend.places_fake_server --mode synthetic --port 8099
+    GOOGLE_PLACES_BASE_URL=http://127.0.0.1:8099/v1 uvicorn backend.main:app
+
+Variables (o flags equivalentes):
+  FAKE_PLACES_DENSITY          lugares por km² fuera de las zonas (default 5)
+  FAKE_PLACES_DENSITY_ZONES    JSON: [{"south":..,"west":..,"north":..,"east":..,"density":..}, ...]
+  FAKE_PLACES_LATENCY_MS       mediana de latencia (default 120)
+  FAKE_PLACES_LATENCY_SIGMA    dispersión log-normal (default 0.5)
+  FAKE_PLACES_ERROR_RATE       fracción de respuestas 429 (default 0)
+  FAKE_PLACES_CASSETTE         archivo JSONL para record/replay
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import math
+import os
+import random
+from functools import lru_cache
+from threading import Lock
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+logger = logging.getLogger(__name__)
+
+FAKE_DENSITY = float(os.getenv('FAKE_PLACES_DENSITY', '5'))
+FAKE_DENSITY_ZONES = os.getenv('FAKE_PLACES_DENSITY_ZONES', '')
+FAKE_LATENCY_MS = float(os.getenv('FAKE_PLACES_LATENCY_MS', '120'))
+FAKE_LATENCY_SIGMA = float(os.getenv('FAKE_PLACES_LATENCY_SIGMA', '0.5'))
+FAKE_ERROR_RATE = float(os.getenv('FAKE_PLACES_ERROR_RATE', '0'))
+FAKE_CASSETTE = os.getenv('FAKE_PLACES_CASSETTE', 'data/places_cassette.jsonl')
+FAKE_UPSTREAM_URL = os.getenv('FAKE_PLACES_UPSTREAM_URL', 'https://places.googleapis.com')
+FAKE_SEED = int(os.getenv('FAKE_PLACES_SEED', '42'))
+
+CELL_DEG = 0.01  # Grilla fija: dos bboxes solapados ven los mismos lugares en la intersección
+PAGE_SIZE = 20
+MAX_RESULTS = 60  # Google no devuelve más de 3 páginas por query
+MAX_CELLS = 40000  # Evita generar millones de celdas ante un bbox gigante
+KM_PER_DEG = 111.32
+
+_RUBRO_TYPES = ["establishment", "point_of_interest", "store"]
+
+
+def _parse_zones(raw: str) -> List[Dict[str, float]]:
+    if not raw:
+        return []
+    try:
+        zones = json.loads(raw)
+        return [z for z in zones if all(k in z for k in ("south", "west", "north", "east", "density"))]
+    except (ValueError, TypeError):
+        logger.warning("FAKE_PLACES_DENSITY_ZONES inválido, se ignora")
+        return []
+
+
+def _haversine_m(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    r = 6371000.0
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lng2 - lng1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * r * math.asin(math.sqrt(a))
+
+
+def _poisson(rng: random.Random, mean: float) -> int:
+    """Muestra de Poisson (Knuth para medias chicas, aproximación normal para grandes)"""
+    if mean <= 0:
+        return 0
+    if mean > 30:
+        return max(0, int(round(rng.gauss(mean, math.sqrt(mean)))))
+    limit, k, p = math.exp(-mean), 0, 1.0
+    while True:
+        p *= rng.random()
+        if p <= limit:
+            return k
+        k += 1
+
+
+def _request_fingerprint(payload: Dict[str, Any]) -> str:
+    """Identifica la búsqueda sin el pageToken, para validar la paginación"""
+    base = {k: v for k, v in payload.items() if k != "pageToken"}
+    return hashlib.sha256(json.dumps(base, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def _apply_field_mask(place: Dict[str, Any], field_mask: str, prefix: str = "places.") -> Dict[str, Any]:
+    """Devuelve sólo los campos pedidos, igual que Google (permite medir el efecto de las máscaras)"""
+    if not field_mask or field_mask.strip() == "*":
+        return place
+    fields = set()
+    for f in field_mask.split(","):
+        f = f.strip()
+        if prefix and f.startswith(prefix):
+            f = f[len(prefix):]
+        if f:
+            fields.add(f.split(".")[0])
+    return {k: v for k, v in place.items() if k in fields}
+
+
+class SyntheticPlaces:
+    """Generador determinista de lugares sobre una grilla fija de celdas"""
+
+    def __init__(
+        self,
+        density: float = FAKE_DENSITY,
+        zones: Optional[List[Dict[str, float]]] = None,
+        seed: int = FAKE_SEED
+    ):
+        self.density = density
+        self.zones = zones if zones is not None else _parse_zones(FAKE_DENSITY_ZONES)
+        self.seed = seed
+        # Las celdas son deterministas: se memorizan para que bboxes grandes no se regeneren en cada página
+        self.cell_places = lru_cache(maxsize=100000)(self._cell_places)
+
+    def density_at(self, lat: float, lng: float) -> float:
+        for z in self.zones:
+            if z["south"] <= lat <= z["north"] and z["west"] <= lng <= z["east"]:
+                return float(z["density"])
+        return self.density
+
+    def _query_key(self, query: str) -> str:
+        return hashlib.sha1(" ".join(query.lower().split()).encode()).hexdigest()[:8]
+
+    def _cell_places(self, qkey: str, cx: int, cy: int) -> List[Dict[str, Any]]:
+        south, west = cy * CELL_DEG, cx * CELL_DEG
+        lat_c = south + CELL_DEG / 2
+        area_km2 = (CELL_DEG * KM_PER_DEG) * (CELL_DEG * KM_PER_DEG * math.cos(math.radians(lat_c)))
+        rng = random.Random(f"{self.seed}:{qkey}:{cx}:{cy}")
+        count = _poisson(rng, self.density_at(lat_c, west + CELL_DEG / 2) * area_km2)
+
+        places = []
+        for i in range(count):
+            place_id = f"fake_{qkey}_{cx}_{cy}_{i}"
+            has_web = rng.random() < 0.6
+            has_phone = rng.random() < 0.7
+            place = {
+                "id": place_id,
+                "displayName": {"text": f"Empresa {qkey[:4].upper()} {cx}.{cy}.{i}", "languageCode": "es"},
+                "formattedAddress": f"Calle Falsa {rng.randint(1, 9999)}, Ciudad",
+                "location": {
+                    "latitude": round(south + rng.random() * CELL_DEG, 7),
+                    "longitude": round(west + rng.random() * CELL_DEG, 7)
+                },
+                "types": _RUBRO_TYPES,
+                "rating": round(rng.uniform(2.5, 5.0), 1),
+                "userRatingCount": rng.randint(0, 800),
+                "businessStatus": "OPERATIONAL",
+                "_relevance": rng.random()
+            }
+            if has_web:
+                place["websiteUri"] = f"https://{place_id.replace('_', '-')}.example.com"
+            if has_phone:
+                phone = f"011 {rng.randint(4000, 4999)}-{rng.randint(1000, 9999)}"
+                place["nationalPhoneNumber"] = phone
+                place["internationalPhoneNumber"] = f"+54 {phone[1:]}"
+            places.append(place)
+        return places
+
+    def search(self, query: str, region: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Lugares de la región ordenados por 'relevancia', truncados a MAX_RESULTS"""
+        south, west, north, east, circle = self._region_bounds(region)
+        qkey = self._query_key(query)
+        cy0, cy1 = math.floor(south / CELL_DEG), math.floor(north / CELL_DEG)
+        cx0, cx1 = math.floor(west / CELL_DEG), math.floor(east / CELL_DEG)
+        if (cy1 - cy0 + 1) * (cx1 - cx0 + 1) > MAX_CELLS:
+            # Región enorme: Google igual devuelve a lo sumo 60; muestreamos alrededor del centro
+            mid_y, mid_x = (cy0 + cy1) // 2, (cx0 + cx1) // 2
+            half = int(math.sqrt(MAX_CELLS)) // 2
+            cy0, cy1, cx0, cx1 = mid_y - half, mid_y + half, mid_x - half, mid_x + half
+
+        found = []
+        for cy in range(cy0, cy1 + 1):
+            for cx in range(cx0, cx1 + 1):
+                for p in self.cell_places(qkey, cx, cy):
+                    lat, lng = p["location"]["latitude"], p["location"]["longitude"]
+                    if not (south <= lat <= north and west <= lng <= east):
+                        continue
+                    if circle and _haversine_m(circle[0], circle[1], lat, lng) > circle[2]:
+                        continue
+                    found.append(p)
+        found.sort(key=lambda p: p["_relevance"], reverse=True)
+        return found[:MAX_RESULTS]
+
+    def details(self, place_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            _, qkey, cx, cy, i = place_id.split("_")
+            places = self.cell_places(qkey, int(cx), int(cy))
+            return places[int(i)]
+        except (ValueError, IndexError):
+            return None
+
+    @staticmethod
+    def _region_bounds(region: Dict[str, Any]) -> Tuple[float, float, float, float, Optional[Tuple[float, float, float]]]:
+        rect = region.get("rectangle")
+        if rect:
+            return (rect["low"]["latitude"], rect["low"]["longitude"],
+                    rect["high"]["latitude"], rect["high"]["longitude"], None)
+        circle = region.get("circle")
+        if circle:
+            lat, lng = circle["center"]["latitude"], circle["center"]["longitude"]
+            radius = float(circle.get("radius", 5000))
+            dlat = radius / 1000 / KM_PER_DEG
+            dlng = dlat / max(0.01, math.cos(math.radians(lat)))
+            return lat - dlat, lng - dlng, lat + dlat, lng + dlng, (lat, lng, radius)
+        # Sin región: Google usa una zona por defecto; usamos ~10 km alrededor de CABA
+        return -34.70, -58.53, -34.53, -58.33, None
+
+
+class Cassette:
+    """Respuestas grabadas en JSONL, indexadas por método, ruta, cuerpo y máscara de campos"""
+
+    def __init__(self, path: str = FAKE_CASSETTE):
+        self.path = path
+        self._lock = Lock()
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        entry = json.loads(line)
+                        self._entries[entry["key"]] = entry
+
+    @staticmethod
+    def key(method: str, path: str, body: Optional[Dict[str, Any]], field_mask: str) -> str:
+        raw = json.dumps([method, path, body or {}, field_mask], sort_keys=True)
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return self._entries.get(key)
+
+    def put(self, key: str, status: int, body: Any):
+        entry = {"key": key, "status": status, "body": body}
+        with self._lock:
+            self._entries[key] = entry
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def _error(status: int, message: str) -> JSONResponse:
+    status_name = {400: "INVALID_ARGUMENT", 404: "NOT_FOUND", 429: "RESOURCE_EXHAUSTED"}.get(status, "INTERNAL")
+    return JSONResponse(status_code=status, content={"error": {"code": status, "message": message, "status": status_name}})
+
+
+def create_app(
+    mode: str = "synthetic",
+    places: Optional[SyntheticPlaces] = None,
+    cassette: Optional[Cassette] = None,
+    latency_ms: float = FAKE_LATENCY_MS,
+    latency_sigma: float = FAKE_LATENCY_SIGMA,
+    error_rate: float = FAKE_ERROR_RATE,
+    upstream_url: str = FAKE_UPSTREAM_URL
+) -> FastAPI:
+    """Construye la app del servidor falso. Los contadores quedan en app.state.stats."""
+    if mode not in ("synthetic", "record", "replay"):
+        raise ValueError(f"Modo desconocido: {mode}")
+
+    app = FastAPI(title="Fake Google Places")
+    places = places or SyntheticPlaces()
+    if mode != "synthetic" and cassette is None:
+        cassette = Cassette()
+    rng = random.Random()
+    app.state.stats = {"search_calls": 0, "details_calls": 0, "throttled": 0, "replay_misses": 0, "recorded": 0}
+
+    async def simulate_latency():
+        if latency_ms > 0:
+            await asyncio.sleep(rng.lognormvariate(math.log(latency_ms), latency_sigma) / 1000)
+
+    async def forward(method: str, path: str, request: Request, body: Optional[Dict[str, Any]]):
+        """record: reenvía a Google y graba; replay: responde desde el cassette"""
+        field_mask = request.headers.get("X-Goog-FieldMask", "")
+        key = Cassette.key(method, path, body, field_mask)
+        if mode == "replay":
+            entry = cassette.get(key)
+            if entry is None:
+                app.state.stats["replay_misses"] += 1
+                return _error(404, "Request no grabada en el cassette")
+            await simulate_latency()
+            return JSONResponse(status_code=entry["status"], content=entry["body"])
+
+        headers = {
+            "Content-Type": "application/json",
+            "X-Goog-Api-Key": request.headers.get("X-Goog-Api-Key", ""),
+            "X-Goog-FieldMask": field_mask
+        }
+        async with httpx.AsyncClient(timeout=30) as client:
+            upstream = await client.request(method, f"{upstream_url.rstrip('/')}{path}", headers=headers, json=body)
+        content = upstream.json() if upstream.content else {}
+        if upstream.status_code == 200:
+            cassette.put(key, upstream.status_code, content)
+            app.state.stats["recorded"] += 1
+        return JSONResponse(status_code=upstream.status_code, content=content)
+
+    @app.post("/v1/places:searchText")
+    async def search_text(request: Request):
+        app.state.stats["search_calls"] += 1
+        payload = await request.json()
+        if mode != "synthetic":
+            return await forward("POST", "/v1/places:searchText", request, payload)
+
+        await simulate_latency()
+        if error_rate and rng.random() < error_rate:
+            app.state.stats["throttled"] += 1
+            return _error(429, "Quota exceeded (simulado)")
+        if not payload.get("textQuery"):
+            return _error(400, "textQuery es obligatorio")
+
+        fingerprint = _request_fingerprint(payload)
+        offset = 0
+        if payload.get("pageToken"):
+            try:
+                token = json.loads(base64.urlsafe_b64decode(payload["pageToken"].encode()))
+                assert token["f"] == fingerprint
+                offset = int(token["o"])
+            except Exception:
+                return _error(400, "pageToken inválido para esta búsqueda")
+
+        region = payload.get("locationRestriction") or payload.get("locationBias") or {}
+        results = places.search(payload["textQuery"], region)
+        page_size = max(1, min(PAGE_SIZE, int(payload.get("maxResultCount", PAGE_SIZE))))
+        page = results[offset:offset + page_size]
+
+        field_mask = request.headers.get("X-Goog-FieldMask", "")
+        body: Dict[str, Any] = {}
+        if page:
+            body["places"] = [_apply_field_mask({k: v for k, v in p.items() if k != "_relevance"}, field_mask) for p in page]
+        if offset + page_size < len(results):
+            token = json.dumps({"f": fingerprint, "o": offset + page_size})
+            body["nextPageToken"] = base64.urlsafe_b64encode(token.encode()).decode()
+        return JSONResponse(content=body)
+
+    @app.get("/v1/places/{place_id}")
+    async def place_details(place_id: str, request: Request):
+        app.state.stats["details_calls"] += 1
+        if mode != "synthetic":
+            return await forward("GET", f"/v1/places/{place_id}", request, None)
+
+        await simulate_latency()
+        if error_rate and rng.random() < error_rate:
+            app.state.stats["throttled"] += 1
+            return _error(429, "Quota exceeded (simulado)")
+        place = places.details(place_id)
+        if place is None:
+            return _error(404, f"Lugar no encontrado: {place_id}")
+        place = {k: v for k, v in place.items() if k != "_relevance"}
+        return JSONResponse(content=_apply_field_mask(place, request.headers.get("X-Goog-FieldMask", ""), prefix=""))
+
+    @app.get("/_stats")
+    async def stats():
+        data = dict(app.state.stats)
+        data["mode"] = mode
+        if cassette is not None:
+            data["cassette_entries"] = len(cassette)
+        return data
+
+    @app.post("/_reset")
+    async def reset():
+        for k in app.state.stats:
+            app.state.stats[k] = 0
+        return {"ok": True}
+
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Servidor local que imita Google Places API (New)")
+    parser.add_argument("--mode", choices=["synthetic", "record", "replay"], default="synthetic")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--density", type=float, default=FAKE_DENSITY, help="Lugares por km²")
+    parser.add_argument("--latency-ms", type=float, default=FAKE_LATENCY_MS)
+    parser.add_argument("--latency-sigma", type=float, default=FAKE_LATENCY_SIGMA)
+    parser.add_argument("--error-rate", type=float, default=FAKE_ERROR_RATE)
+    parser.add_argument("--cassette", default=FAKE_CASSETTE)
+    parser.add_argument("--seed", type=int, default=FAKE_SEED)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    fake_app = create_app(
+        mode=args.mode,
+        places=SyntheticPlaces(density=args.density, seed=args.seed),
+        cassette=Cassette(args.cassette) if args.mode != "synthetic" else None,
+        latency_ms=args.latency_ms,
+        latency_sigma=args.latency_sigma,
+        error_rate=args.error_rate
+    )
+    print(f"Fake Places ({args.mode}) en http://{args.host}:{args.port}/v1")
+    print(f"Apuntar el backend con: GOOGLE_PLACES_BASE_URL=http://{args.host}:{args.port}/v1")
+    uvicorn.run(fake_app, host=args.host, port=args.port, log_level="warning")
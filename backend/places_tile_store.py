@@ -0,0 +1,236 @@
+"""
+Teselado geohash y almacenamiento persistente de resultados de Google Places por tile.
+
+Los tiles son celdas geohash binarias: cada nivel agrega 2 bits (longitud y latitud),
+por lo que un tile se divide exactamente en 4 hijos, igual que el quadtree de búsqueda.
+Como la grilla es global y fija, búsquedas distintas que se superponen reutilizan
+los mismos tiles ya consultados.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import time
+from threading import Lock
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+TILE_TTL_HOURS = float(os.getenv('PLACES_TILE_TTL_HOURS', '72'))
+TILE_MAX_ROOTS = max(1, int(os.getenv('PLACES_TILE_MAX_ROOTS', '4')))
+TILE_PURGE_INTERVAL_SECONDS = float(os.getenv('PLACES_TILE_PURGE_INTERVAL_SECONDS', '3600'))
+TILE_MIN_BITS = 2
+TILE_MAX_BITS = 40  # ~40m x 20m, suficiente para cualquier densidad urbana
+
+_DEFAULT_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data')
+
+
+# --- Geohash binario ---
+
+def tile_bbox(bits: str) -> Dict[str, float]:
+    """Retorna el bbox (south, west, north, east) de un tile geohash binario"""
+    lat_min, lat_max = -90.0, 90.0
+    lng_min, lng_max = -180.0, 180.0
+    for i, bit in enumerate(bits):
+        if i % 2 == 0:
+            mid = (lng_min + lng_max) / 2
+            if bit == '1':
+                lng_min = mid
+            else:
+                lng_max = mid
+        else:
+            mid = (lat_min + lat_max) / 2
+            if bit == '1':
+                lat_min = mid
+            else:
+                lat_max = mid
+    return {"south": lat_min, "west": lng_min, "north": lat_max, "east": lng_max}
+
+
+def tile_children(bits: str) -> List[str]:
+    """Los 4 sub-tiles de un tile con cantidad par de bits (SW, SE, NW, NE)"""
+    return [bits + '00', bits + '10', bits + '01', bits + '11']
+
+
+def _interleave(lng_idx: int, lat_idx: int, k: int) -> str:
+    """Construye los bits geohash (longitud primero) a partir de índices de grilla de k bits"""
+    lng_bits = format(lng_idx, f'0{k}b') if k else ''
+    lat_bits = format(lat_idx, f'0{k}b') if k else ''
+    return ''.join(a + b for a, b in zip(lng_bits, lat_bits))
+
+
+def _index_range(low: float, high: float, origin: float, size: float, n: int) -> range:
+    first = int((low - origin) // size)
+    last = int((high - origin) // size)
+    return range(max(0, first), min(n - 1, last) + 1)
+
+
+def tiles_for_bbox(bbox: Dict[str, float], nbits: int) -> List[str]:
+    """Tiles de nbits (par) que cubren el bbox"""
+    k = nbits // 2
+    n = 2 ** k
+    lng_size = 360.0 / n
+    lat_size = 180.0 / n
+    lng_range = _index_range(bbox["west"], bbox["east"], -180.0, lng_size, n)
+    lat_range = _index_range(bbox["south"], bbox["north"], -90.0, lat_size, n)
+    return [_interleave(x, y, k) for y in lat_range for x in lng_range]
+
+
+def root_tiles_for_bbox(bbox: Dict[str, float], max_roots: int = TILE_MAX_ROOTS) -> List[str]:
+    """
+    Elige el nivel más fino en el que el bbox queda cubierto por a lo sumo max_roots tiles,
+    de modo que los tiles raíz tengan un tamaño comparable al área pedida.
+    """
+    best = tiles_for_bbox(bbox, TILE_MIN_BITS)
+    for nbits in range(TILE_MIN_BITS + 2, TILE_MAX_BITS + 1, 2):
+        tiles = tiles_for_bbox(bbox, nbits)
+        if len(tiles) > max_roots:
+            break
+        best = tiles
+    return best
+
+
+def point_in_bbox(lat: Optional[float], lng: Optional[float], bbox: Dict[str, float]) -> bool:
+    if lat is None or lng is None:
+        return False
+    return bbox["south"] <= lat <= bbox["north"] and bbox["west"] <= lng <= bbox["east"]
+
+
+# --- Store persistente ---
+
+class PlacesTileStore:
+    """
+    Store SQLite de resultados crudos de Places por (tile, query, field_mask).
+    Cada entrada guarda los lugares, si el tile estaba saturado y el momento de la consulta.
+    """
+
+    def __init__(self, path: Optional[str] = None, ttl_hours: float = TILE_TTL_HOURS):
+        self.ttl_seconds = ttl_hours * 3600
+        self.path = path or os.getenv('PLACES_TILE_STORE_PATH') or os.path.join(_DEFAULT_DATA_DIR, 'places_tiles.sqlite3')
+        self._lock = Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self._last_purge = 0.0
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        if self._conn is not None:
+            return self._conn
+        for path in (self.path, os.path.join('/tmp/b2b_data', os.path.basename(self.path))):
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+                conn = sqlite3.connect(path, check_same_thread=False)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS places_tiles (
+                        tile TEXT NOT NULL,
+                        query TEXT NOT NULL,
+                        field_mask TEXT NOT NULL,
+                        payload TEXT NOT NULL,
+                        fetched_at REAL NOT NULL,
+                        PRIMARY KEY (tile, query, field_mask)
+                    )
+                """)
+                conn.commit()
+                self._conn = conn
+                self.path = path
+                return conn
+            except (OSError, sqlite3.Error) as e:
+                logger.warning(f"No se pudo abrir el tile store en {path}: {e}")
+        return None
+
+    def get(self, tile: str, query: str, field_mask: str) -> Optional[Dict[str, Any]]:
+        """Retorna {'places': [...], 'dense': bool} si hay una entrada vigente"""
+        with self._lock:
+            conn = self._connect()
+            if not conn:
+                return None
+            try:
+                row = conn.execute(
+                    "SELECT payload, fetched_at FROM places_tiles WHERE tile = ? AND query = ? AND field_mask = ?",
+                    (tile, query, field_mask)
+                ).fetchone()
+            except sqlite3.Error as e:
+                logger.error(f"Error leyendo tile {tile}: {e}")
+                return None
+
+            if not row:
+                self.misses += 1
+                return None
+            if time.time() - row[1] > self.ttl_seconds:
+                self.stale += 1
+                return None
+
+            self.hits += 1
+            return json.loads(row[0])
+
+    def vigentes(self, tiles: List[str], query: str, field_mask: str) -> bool:
+        """True si todos los tiles tienen una entrada vigente (sin tocar los contadores)"""
+        if not tiles:
+            return False
+        with self._lock:
+            conn = self._connect()
+            if not conn:
+                return False
+            try:
+                marcadores = ','.join('?' * len(tiles))
+                count = conn.execute(
+                    f"SELECT COUNT(*) FROM places_tiles WHERE tile IN ({marcadores}) AND query = ? AND field_mask = ? "
+                    "AND fetched_at >= ?",
+                    [*tiles, query, field_mask, time.time() - self.ttl_seconds]
+                ).fetchone()[0]
+            except sqlite3.Error as e:
+                logger.error(f"Error consultando tiles: {e}")
+                return False
+        return count == len(set(tiles))
+
+    def put(self, tile: str, query: str, field_mask: str, places: List[Dict[str, Any]], dense: bool):
+        payload = json.dumps({"places": places, "dense": dense}, ensure_ascii=False)
+        with self._lock:
+            conn = self._connect()
+            if not conn:
+                return
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO places_tiles (tile, query, field_mask, payload, fetched_at) VALUES (?, ?, ?, ?, ?)",
+                    (tile, query, field_mask, payload, time.time())
+                )
+                conn.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Error guardando tile {tile}: {e}")
+        # Las entradas vencidas no se vuelven a leer: se purgan de vez en cuando para acotar el archivo
+        if time.time() - self._last_purge > TILE_PURGE_INTERVAL_SECONDS:
+            self._last_purge = time.time()
+            self.purge_stale()
+
+    def purge_stale(self) -> int:
+        """Elimina entradas vencidas. Retorna la cantidad eliminada."""
+        with self._lock:
+            conn = self._connect()
+            if not conn:
+                return 0
+            try:
+                cur = conn.execute("DELETE FROM places_tiles WHERE fetched_at < ?", (time.time() - self.ttl_seconds,))
+                conn.commit()
+                return cur.rowcount
+            except sqlite3.Error as e:
+                logger.error(f"Error purgando tiles vencidos: {e}")
+                return 0
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses + self.stale
+        return {
+            "path": self.path,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "hit_ratio": round(self.hits / total, 3) if total else 0.0
+        }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
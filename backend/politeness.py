@@ -0,0 +1,108 @@
+"""
+Planificador de cortesía por dominio para el scraper.
+
+Guarda el próximo instante permitido por host. Cada request reserva su turno bajo un lock
+(sólo aritmética, nunca se duerme con el lock tomado) y después espera fuera de él, así un
+dominio lento no frena a los demás. Respeta MIN_DELAY_PER_DOMAIN y el Crawl-delay de robots.txt.
+Sirve tanto para threads (wait_sync) como para el event loop (wait).
+"""
+
+import asyncio
+import logging
+import os
+import time
+from threading import Lock
+from typing import Any, Dict, Optional
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+MIN_DELAY_PER_DOMAIN = float(os.getenv('SCRAPER_MIN_DELAY_SECONDS', '0.25'))
+MAX_CRAWL_DELAY = float(os.getenv('SCRAPER_MAX_CRAWL_DELAY_SECONDS', '10'))  # Tope a Crawl-delay abusivos
+_PRUNE_THRESHOLD = 5000
+
+
+def _host_de(url: Optional[str]) -> Optional[str]:
+    if not url:
+        return None
+    try:
+        host = urlparse(url).netloc.lower()
+    except Exception:
+        return None
+    return host or None
+
+
+class DomainPolitenessScheduler:
+    """Turnos por dominio: next_allowed[host] avanza 'delay' segundos por cada request reservada"""
+
+    def __init__(self, min_delay: float = MIN_DELAY_PER_DOMAIN, max_crawl_delay: float = MAX_CRAWL_DELAY):
+        self.min_delay = min_delay
+        self.max_crawl_delay = max_crawl_delay
+        self._lock = Lock()
+        self._next_allowed: Dict[str, float] = {}
+        self._crawl_delays: Dict[str, float] = {}
+        self.delayed_requests = 0
+        self.total_wait = 0.0
+
+    def set_crawl_delay(self, url_or_host: str, seconds: Optional[float]):
+        """Registra el Crawl-delay de robots.txt para el host (None o 0 lo elimina)"""
+        host = _host_de(url_or_host) if "://" in url_or_host else url_or_host.lower()
+        if not host:
+            return
+        with self._lock:
+            if seconds and seconds > 0:
+                self._crawl_delays[host] = min(float(seconds), self.max_crawl_delay)
+            else:
+                self._crawl_delays.pop(host, None)
+
+    def delay_for(self, host: str) -> float:
+        return max(self.min_delay, self._crawl_delays.get(host, 0.0))
+
+    def reserve(self, url: Optional[str]) -> float:
+        """Reserva el próximo turno del dominio y retorna cuántos segundos hay que esperar"""
+        host = _host_de(url)
+        if not host:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            delay = self.delay_for(host)
+            if delay <= 0:
+                return 0.0
+            slot = max(now, self._next_allowed.get(host, 0.0))
+            self._next_allowed[host] = slot + delay
+            if len(self._next_allowed) > _PRUNE_THRESHOLD:
+                self._prune(now)
+            wait = slot - now
+            if wait > 0:
+                self.delayed_requests += 1
+                self.total_wait += wait
+            return wait
+
+    def _prune(self, now: float):
+        """Descarta hosts cuyo turno ya pasó (se llama con el lock tomado)"""
+        self._next_allowed = {h: t for h, t in self._next_allowed.items() if t > now}
+
+    def wait_sync(self, url: Optional[str]) -> float:
+        wait = self.reserve(url)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def wait(self, url: Optional[str]) -> float:
+        wait = self.reserve(url)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "tracked_hosts": len(self._next_allowed),
+                "crawl_delay_hosts": len(self._crawl_delays),
+                "delayed_requests": self.delayed_requests,
+                "total_wait_seconds": round(self.total_wait, 3)
+            }
+
+
+# Planificador compartido por el scraper sincrónico y el asíncrono
+domain_scheduler = DomainPolitenessScheduler()
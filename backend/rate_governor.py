@@ -0,0 +1,154 @@
+"""
+Limitador global de tasa (QPS) para Google Places.
+
+Token bucket compartido por todo el proceso con cola justa por usuario: cuando no hay
+tokens, los pedidos esperan en una cola por usuario y se atienden en round-robin, así
+una búsqueda exhaustiva de un usuario no deja sin cupo al resto. La tasa se ajusta con
+AIMD: baja a la mitad ante 429/5xx y sube de a poco con cada respuesta exitosa.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+PLACES_QPS = float(os.getenv('GOOGLE_PLACES_QPS', '10'))
+PLACES_BURST = float(os.getenv('GOOGLE_PLACES_BURST', '20'))
+PLACES_MIN_QPS = float(os.getenv('GOOGLE_PLACES_MIN_QPS', '1'))
+AIMD_INCREASE = float(os.getenv('GOOGLE_PLACES_AIMD_INCREASE', '0.1'))  # QPS sumados por respuesta OK
+AIMD_DECREASE = 0.5
+THROTTLE_COOLDOWN_SECONDS = 1.0  # Una ráfaga de 429 simultáneos cuenta como una sola señal
+
+
+class RateGovernor:
+    """Token bucket con cola justa por clave (usuario) y ajuste AIMD de la tasa"""
+
+    def __init__(
+        self,
+        rate: float = PLACES_QPS,
+        burst: float = PLACES_BURST,
+        min_rate: float = PLACES_MIN_QPS,
+        max_rate: Optional[float] = None
+    ):
+        self.max_rate = max_rate or rate
+        self.min_rate = min(min_rate, self.max_rate)
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self._tokens = self.burst
+        self._last_refill = time.monotonic()
+        self._queues: Dict[str, Deque[asyncio.Future]] = {}
+        self._turns: Deque[str] = deque()  # Orden round-robin de claves con pedidos en espera
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._last_throttle = 0.0
+        # Métricas
+        self.acquired = 0
+        self.throttles = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.max_queue_depth = 0
+
+    def _bind_loop(self):
+        """Las colas guardan futures del loop actual; si cambia el loop se descartan"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._queues.clear()
+            self._turns.clear()
+            self._timer = None
+        return loop
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    def queue_depth(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    async def acquire(self, key: Optional[str] = None) -> float:
+        """Espera un token respetando el turno de cada usuario. Retorna los segundos esperados."""
+        loop = self._bind_loop()
+        key = key or "anonymous"
+        start = time.monotonic()
+
+        fut = loop.create_future()
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = self._queues[key] = deque()
+            self._turns.append(key)
+        queue.append(fut)
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth())
+
+        self._dispatch()
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut in queue:
+                queue.remove(fut)
+            raise
+
+        waited = time.monotonic() - start
+        self.acquired += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+        return waited
+
+    def _dispatch(self):
+        """Entrega tokens disponibles en round-robin entre usuarios y agenda el próximo reparto"""
+        self._refill()
+        while self._turns and self._tokens >= 1:
+            key = self._turns.popleft()
+            queue = self._queues[key]
+            while queue and queue[0].done():
+                queue.popleft()  # Pedidos cancelados
+            if queue:
+                queue.popleft().set_result(None)
+                self._tokens -= 1
+            if queue:
+                self._turns.append(key)
+            else:
+                del self._queues[key]
+
+        if self._turns and self._timer is None and self._loop is not None:
+            delay = max(0.001, (1 - self._tokens) / self.rate)
+            self._timer = self._loop.call_later(delay, self._on_timer)
+
+    def _on_timer(self):
+        # Sólo el timer libera su handle: un acquire() con un reparto ya agendado no agenda otro
+        self._timer = None
+        self._dispatch()
+
+    def on_success(self):
+        """Aumento aditivo de la tasa"""
+        self.rate = min(self.max_rate, self.rate + AIMD_INCREASE)
+
+    def on_throttle(self):
+        """Disminución multiplicativa de la tasa ante 429/5xx"""
+        now = time.monotonic()
+        self.throttles += 1
+        if now - self._last_throttle < THROTTLE_COOLDOWN_SECONDS:
+            return
+        self._last_throttle = now
+        self._refill()
+        self.rate = max(self.min_rate, self.rate * AIMD_DECREASE)
+        self._tokens = min(self._tokens, 1.0)  # Cortar la ráfaga acumulada
+        logger.warning(f"Google Places limitado (429/5xx). Reduciendo tasa a {self.rate:.2f} QPS")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rate_qps": round(self.rate, 3),
+            "max_rate_qps": self.max_rate,
+            "burst": self.burst,
+            "queue_depth": self.queue_depth(),
+            "queued_users": len(self._turns),
+            "max_queue_depth": self.max_queue_depth,
+            "acquired": self.acquired,
+            "throttles": self.throttles,
+            "avg_wait_ms": round(self.total_wait / self.acquired * 1000, 2) if self.acquired else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 2)
+        }
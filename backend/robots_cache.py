@@ -0,0 +1,250 @@
+"""
+Cache de robots.txt compartida por todo el proceso (scraper sincrónico, asíncrono y workers).
+
+- Expira por TTL: los robots.txt parseados duran ROBOTS_TTL_SECONDS; los resultados negativos
+  (error de red o 5xx, que se tratan como "permitido") duran ROBOTS_NEGATIVE_TTL_SECONDS para
+  reintentar pronto. Un 4xx significa "sin robots.txt" y se cachea con el TTL normal.
+- Single-flight por dominio: si varios threads o corutinas preguntan por el mismo dominio a la vez,
+  sólo uno descarga robots.txt y el resto espera ese resultado.
+- Desalojo LRU al superar ROBOTS_MAX_ENTRIES.
+
+La descarga en sí la provee quien llama (fetcher), así cada scraper usa su propio cliente HTTP.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from threading import Event, Lock
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+from urllib.parse import urlparse
+from urllib.robotparser import RobotFileParser
+
+try:
+    from .politeness import domain_scheduler
+except ImportError:
+    from politeness import domain_scheduler
+
+logger = logging.getLogger(__name__)
+
+ROBOTS_TTL_SECONDS = float(os.getenv('SCRAPER_ROBOTS_TTL_SECONDS', str(24 * 3600)))
+ROBOTS_NEGATIVE_TTL_SECONDS = float(os.getenv('SCRAPER_ROBOTS_NEGATIVE_TTL_SECONDS', '900'))
+ROBOTS_MAX_ENTRIES = int(os.getenv('SCRAPER_ROBOTS_MAX_ENTRIES', '20000'))
+ROBOTS_PREFETCH_CONCURRENCY = int(os.getenv('SCRAPER_ROBOTS_PREFETCH_CONCURRENCY', '16'))
+_SYNC_WAIT_SECONDS = 10  # Tope de espera de un thread por la descarga de otro
+
+# Resultado de una descarga: (status_code, texto) o None ante error de red
+RespuestaRobots = Optional[Tuple[int, str]]
+
+
+def dominio_y_robots_url(url: str) -> Tuple[Optional[str], Optional[str]]:
+    parsed = urlparse(url)
+    if not parsed.netloc:
+        return None, None
+    domain = parsed.netloc.lower()
+    return domain, f"{parsed.scheme or 'https'}://{domain}/robots.txt"
+
+
+class _Entrada:
+    __slots__ = ("parser", "expires_at", "negativa")
+
+    def __init__(self, parser: Optional[RobotFileParser], expires_at: float, negativa: bool):
+        self.parser = parser  # None = todo permitido
+        self.expires_at = expires_at
+        self.negativa = negativa
+
+    def permite(self, url: str) -> bool:
+        if self.parser is None:
+            return True
+        try:
+            return self.parser.can_fetch("*", url)
+        except Exception as e:
+            logger.warning(f"Error general evaluando can_fetch para {url}: {e}")
+            return True
+
+
+class RobotsCache:
+    """robots.txt parseados por dominio, con TTL, cache negativa y descarga single-flight"""
+
+    def __init__(
+        self,
+        ttl_seconds: float = ROBOTS_TTL_SECONDS,
+        negative_ttl_seconds: float = ROBOTS_NEGATIVE_TTL_SECONDS,
+        max_entries: int = ROBOTS_MAX_ENTRIES
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self.max_entries = max_entries
+        self._lock = Lock()
+        self._entries: "OrderedDict[str, _Entrada]" = OrderedDict()
+        self._inflight_sync: Dict[str, Event] = {}
+        self._inflight_async: Dict[str, asyncio.Task] = {}
+        self._stats = {"hits": 0, "misses": 0, "fetches": 0, "coalesced": 0, "evictions": 0, "expired": 0}
+
+    # --- Almacenamiento ---
+
+    def _vigente(self, domain: str) -> Optional[_Entrada]:
+        """Entrada no expirada del dominio (se llama con el lock tomado)"""
+        entrada = self._entries.get(domain)
+        if entrada is None:
+            return None
+        if entrada.expires_at <= time.monotonic():
+            del self._entries[domain]
+            self._stats["expired"] += 1
+            return None
+        self._entries.move_to_end(domain)
+        return entrada
+
+    def _consultar(self, domain: str) -> Optional[_Entrada]:
+        with self._lock:
+            entrada = self._vigente(domain)
+            self._stats["hits" if entrada is not None else "misses"] += 1
+            return entrada
+
+    def _guardar(self, domain: str, robots_url: str, respuesta: RespuestaRobots) -> _Entrada:
+        """Interpreta la respuesta de robots.txt y la cachea con el TTL que corresponda"""
+        parser, negativa = None, False
+        if respuesta is None or respuesta[0] >= 500:
+            negativa = True
+        elif respuesta[0] == 200:
+            parser = RobotFileParser()
+            parser.set_url(robots_url)
+            parser.parse(respuesta[1].splitlines())
+            domain_scheduler.set_crawl_delay(domain, parser.crawl_delay("*"))
+
+        ttl = self.negative_ttl_seconds if negativa else self.ttl_seconds
+        entrada = _Entrada(parser, time.monotonic() + ttl, negativa)
+        with self._lock:
+            self._entries[domain] = entrada
+            self._entries.move_to_end(domain)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+        return entrada
+
+    def invalidate(self, domain: str):
+        with self._lock:
+            self._entries.pop(domain.lower(), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    # --- Consulta sincrónica (threads) ---
+
+    def permite_sync(self, url: str, fetcher: Callable[[str], RespuestaRobots]) -> bool:
+        """Verifica url contra robots.txt; fetcher(robots_url) sólo se llama si falta la entrada"""
+        domain, robots_url = dominio_y_robots_url(url)
+        if not domain:
+            return True  # Si no hay netloc, permitimos (ej: paths relativos)
+
+        entrada = self._consultar(domain)
+        if entrada is not None:
+            return entrada.permite(url)
+
+        with self._lock:
+            event = self._inflight_sync.get(domain)
+            owner = event is None
+            if owner:
+                event = self._inflight_sync[domain] = Event()
+            else:
+                self._stats["coalesced"] += 1
+
+        if not owner:
+            event.wait(_SYNC_WAIT_SECONDS)
+            with self._lock:
+                entrada = self._vigente(domain)
+            return entrada.permite(url) if entrada is not None else True
+
+        try:
+            self._stats["fetches"] += 1
+            try:
+                respuesta = fetcher(robots_url)
+            except Exception as e:
+                logger.warning(f"Error de red/parseo para robots.txt en {robots_url}: {e}")
+                respuesta = None
+            return self._guardar(domain, robots_url, respuesta).permite(url)
+        finally:
+            with self._lock:
+                self._inflight_sync.pop(domain, None)
+            event.set()
+
+    # --- Consulta asíncrona (event loop) ---
+
+    async def permite(self, url: str, fetcher: Callable[[str], Awaitable[RespuestaRobots]]) -> bool:
+        """Equivalente asíncrono de permite_sync; las corutinas del mismo loop comparten la descarga"""
+        domain, robots_url = dominio_y_robots_url(url)
+        if not domain:
+            return True
+
+        entrada = self._consultar(domain)
+        if entrada is not None:
+            return entrada.permite(url)
+
+        loop = asyncio.get_running_loop()
+        task = self._inflight_async.get(domain)
+        if task is None or task.get_loop() is not loop:
+            self._stats["fetches"] += 1
+            task = loop.create_task(self._descargar(domain, robots_url, fetcher))
+            self._inflight_async[domain] = task
+            task.add_done_callback(
+                lambda t, d=domain: self._inflight_async.pop(d, None) if self._inflight_async.get(d) is t else None
+            )
+        else:
+            self._stats["coalesced"] += 1
+
+        # shield: si cancelan a uno de los que esperan, la descarga sigue para los demás
+        entrada = await asyncio.shield(task)
+        return entrada.permite(url)
+
+    async def _descargar(self, domain: str, robots_url: str, fetcher) -> _Entrada:
+        try:
+            respuesta = await fetcher(robots_url)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Error de red/parseo para robots.txt en {robots_url}: {e}")
+            respuesta = None
+        return self._guardar(domain, robots_url, respuesta)
+
+    async def prefetch(
+        self,
+        urls: Iterable[str],
+        fetcher: Callable[[str], Awaitable[RespuestaRobots]],
+        concurrency: int = ROBOTS_PREFETCH_CONCURRENCY
+    ) -> int:
+        """Descarga en paralelo los robots.txt que falten para un lote de sitios. Retorna cuántos dominios pidió."""
+        pendientes: Dict[str, str] = {}
+        with self._lock:
+            for url in urls:
+                if not url:
+                    continue
+                domain, _ = dominio_y_robots_url(url if url.startswith('http') else 'https://' + url)
+                if domain and domain not in pendientes and self._vigente(domain) is None:
+                    pendientes[domain] = url if url.startswith('http') else 'https://' + url
+        if not pendientes:
+            return 0
+
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def uno(url: str):
+            async with semaphore:
+                await self.permite(url, fetcher)
+
+        await asyncio.gather(*(uno(u) for u in pendientes.values()), return_exceptions=True)
+        return len(pendientes)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            negativas = sum(1 for e in self._entries.values() if e.negativa)
+            return {
+                **self._stats,
+                "entries": len(self._entries),
+                "negative_entries": negativas,
+                "in_flight": len(self._inflight_sync) + len(self._inflight_async)
+            }
+
+
+# Cache compartida por todas las sesiones y motores de scraping del proceso
+robots_cache = RobotsCache()
@@ -7,108 +7,301 @@ import requests
 from bs4 import BeautifulSoup
 import re
 import logging
-from typing import Dict, List, Optional, Any
+import importlib.util
+import codecs
+import hashlib
+import os
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from threading import Event
+from typing import Callable, Dict, List, Optional, Any, Tuple
 from urllib.parse import urlparse, urljoin
 import time
-from urllib.robotparser import RobotFileParser
+
+try:
+    from .dead_hosts import dead_hosts
+    from .host_latency import CONNECT_TIMEOUT_MAX, host_latency
+    from .parse_pool import parse_pool
+    from .politeness import domain_scheduler
+    from .robots_cache import ROBOTS_PREFETCH_CONCURRENCY, robots_cache
+    from .scraping_cache import ScrapingCache, encabezados_condicionales
+    from .social_scraper import SOCIAL_PATTERNS, extraer_redes_sociales
+    from .structured_data import extraer_datos_estructurados
+except ImportError:
+    from dead_hosts import dead_hosts
+    from host_latency import CONNECT_TIMEOUT_MAX, host_latency
+    from parse_pool import parse_pool
+    from politeness import domain_scheduler
+    from robots_cache import ROBOTS_PREFETCH_CONCURRENCY, robots_cache
+    from scraping_cache import ScrapingCache, encabezados_condicionales
+    from social_scraper import SOCIAL_PATTERNS, extraer_redes_sociales
+    from structured_data import extraer_datos_estructurados
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+REDES_SOCIALES = tuple(SOCIAL_PATTERNS)  # instagram, facebook, twitter, linkedin, youtube, tiktok
+
+# lxml parsea varias veces más rápido que html.parser; si no está instalado se usa el parser puro Python
+HTML_PARSER = 'lxml' if importlib.util.find_spec("lxml") is not None else 'html.parser'
+
+# --- Descarga en streaming ---
+# Se descarta por cabeceras lo que no es HTML (PDFs, imágenes en URLs de "contacto") y se deja
+# de leer al llegar al presupuesto de bytes; el texto se decodifica de a bloques a medida que llega.
+MAX_PAGE_BYTES = int(os.getenv('SCRAPER_MAX_PAGE_BYTES', str(1_500_000)))
+STREAM_CHUNK_SIZE = 16 * 1024
+CONTENT_TYPES_HTML = ('text/html', 'application/xhtml+xml', 'text/plain')
+_CHARSET_HEADER_RE = re.compile(r'charset\s*=\s*["\']?([\w.:-]+)', re.IGNORECASE)
+_CHARSET_META_RE = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?([\w.:-]+)', re.IGNORECASE)
+
+def es_contenido_html(content_type: Optional[str]) -> bool:
+    """Sin Content-Type se asume HTML (muchos sitios chicos no lo envían)"""
+    if not content_type:
+        return True
+    return content_type.split(';', 1)[0].strip().lower() in CONTENT_TYPES_HTML
+
+def detectar_charset(content_type: Optional[str], primer_bloque: bytes) -> str:
+    """Charset de la cabecera, si no del <meta> del primer bloque, y si no UTF-8"""
+    match = _CHARSET_HEADER_RE.search(content_type or '') or _CHARSET_META_RE.search(primer_bloque[:4096])
+    if match:
+        charset = match.group(1)
+        charset = charset.decode('ascii', 'ignore') if isinstance(charset, bytes) else charset
+        try:
+            return codecs.lookup(charset).name
+        except LookupError:
+            pass
+    return 'utf-8'
+
+class DecodificadorHTML:
+    """Acumula el cuerpo de una respuesta decodificando de a bloques, hasta max_bytes (y lo hashea para revalidar)"""
+
+    def __init__(self, content_type: Optional[str] = None, max_bytes: int = MAX_PAGE_BYTES):
+        self.content_type = content_type
+        self.max_bytes = max_bytes
+        self.bytes_leidos = 0
+        self.truncado = False
+        self._decoder = None
+        self._partes: List[str] = []
+        self._hash = hashlib.blake2b(digest_size=16)
+
+    def agregar(self, bloque: bytes) -> bool:
+        """Suma un bloque; retorna False cuando se agotó el presupuesto y hay que dejar de leer"""
+        if not bloque:
+            return True
+        if self._decoder is None:
+            charset = detectar_charset(self.content_type, bloque)
+            self._decoder = codecs.getincrementaldecoder(charset)(errors='replace')
+        restante = self.max_bytes - self.bytes_leidos
+        if len(bloque) > restante:
+            bloque = bloque[:restante]
+            self.truncado = True
+        self.bytes_leidos += len(bloque)
+        self._hash.update(bloque)
+        self._partes.append(self._decoder.decode(bloque))
+        return not self.truncado
+
+    def resultado(self) -> Dict[str, Any]:
+        if self._decoder is not None:
+            # Un carácter multibyte cortado por el presupuesto se descarta en vez de reemplazarse
+            self._partes.append(self._decoder.decode(b'', final=not self.truncado))
+            self._decoder = None
+        return {'html': ''.join(self._partes), 'truncado': self.truncado, 'bytes': self.bytes_leidos,
+                'hash': self._hash.hexdigest()}
+
+def validadores_de_respuesta(headers) -> Dict[str, Optional[str]]:
+    return {'etag': headers.get('ETag'), 'last_modified': headers.get('Last-Modified')}
+
+def respuesta_no_modificada() -> Dict[str, Any]:
+    """Resultado de descarga para un 304: no hay cuerpo, se reutiliza lo extraído la vez anterior"""
+    return {'html': None, 'no_modificada': True, 'truncado': False, 'bytes': 0}
+
 class ScraperSession:
     """Session handling with connection pooling and robots.txt caching"""
-    def __init__(self):
+    DEFAULT_HEADERS = {
+        'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36',
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
+        'Accept-Language': 'es-ES,es;q=0.9,en;q=0.8',
+    }
+
+    def __init__(self, cache: Optional[ScrapingCache] = None):
         self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
-            'Accept-Language': 'es-ES,es;q=0.9,en;q=0.8',
-        })
-        self._robots_cache = {}
+        self.session.headers.update(self.DEFAULT_HEADERS)
+        self.cache = cache  # Validadores por página para re-scrapes condicionales (None = siempre descarga completa)
 
-    def check_robots(self, url: str) -> bool:
-        """Verifica robots.txt con cache por dominio. Perfeccionado para B2B."""
+    def _fetch_robots(self, robots_url: str) -> Optional[Tuple[int, str]]:
+        if dead_hosts.is_dead(robots_url):
+            return None
+        timeout = 3  # Timeout corto para robots.txt
         try:
-            parsed = urlparse(url)
-            if not parsed.netloc: return True # Si no hay netloc, permitimos (ej: paths relativos)
-            
-            domain = parsed.netloc
-            if domain in self._robots_cache:
-                return self._robots_cache[domain].can_fetch("*", url) # Usar "*" para ser más amplio
-            
-            robots_url = f"{parsed.scheme}://{domain}/robots.txt"
-            rp = RobotFileParser()
-            rp.set_url(robots_url)
-            try:
-                # Usar timeout corto para robots.txt
-                resp = self.session.get(robots_url, timeout=3)
-                if resp.status_code == 200:
-                    rp.parse(resp.text.splitlines())
-                else:
-                    # Si no hay 200 (404, 500, etc), permitimos por defecto
-                    return True
-            except Exception as e:
-                logger.warning(f"Error de red/parseo para robots.txt en {robots_url}: {e}")
-                # Ante cualquier error de conexión para el robots.txt, permitimos
-                return True
-                
-            self._robots_cache[domain] = rp
-            return rp.can_fetch("*", url)
+            resp = self.session.get(robots_url, timeout=timeout)
         except Exception as e:
-            logger.warning(f"Error general evaluando can_fetch para {url}: {e}")
-            return True
+            dead_hosts.record_error(robots_url, e, connect_acotado=timeout < CONNECT_TIMEOUT_MAX)
+            raise
+        dead_hosts.record_success(robots_url)
+        return resp.status_code, resp.text
 
-    def get_soup(self, url: str, timeout: int = 10) -> Optional[BeautifulSoup]:
-        """Obtiene BeautifulSoup de una URL usando el pool de la sesión"""
-        try:
-            response = self.session.get(url, timeout=timeout, allow_redirects=True)
-            if response.status_code == 200:
-                return BeautifulSoup(response.content, 'html.parser')
+    def check_robots(self, url: str) -> bool:
+        """Verifica robots.txt contra la cache compartida del proceso (TTL, single-flight por dominio)"""
+        return robots_cache.permite_sync(url, self._fetch_robots)
+
+    def prefetch_robots(self, urls: List[str]) -> List[Future]:
+        """Encola la descarga de los robots.txt que falten para un lote de sitios, sin esperarla"""
+        urls = [u if u.startswith('http') else 'https://' + u for u in urls if u]
+        return [_ROBOTS_PREFETCH_EXECUTOR.submit(self.check_robots, u) for u in dict.fromkeys(urls)]
+
+    def descargar_pagina(self, url: str, timeout: int = 10, max_bytes: int = MAX_PAGE_BYTES,
+                         validadores: Optional[Dict[str, Any]] = None,
+                         deadline: Optional[float] = None,
+                         cancelado: Optional[Event] = None) -> Optional[Dict[str, Any]]:
+        """
+        GET en streaming usando el pool de la sesión. Retorna {'html', 'truncado', 'bytes', 'hash', 'etag',
+        'last_modified'} o None si la respuesta no es 200, no es HTML según sus cabeceras o hubo un error de red.
+        Con validadores de una descarga anterior el GET es condicional y un 304 retorna respuesta_no_modificada().
+        timeout es el tope: los timeouts reales de conexión y lectura se adaptan a la latencia observada del
+        host y nunca pasan del deadline (time.monotonic()) de la empresa.
+        Si se activa cancelado (ya no hace falta la página) se deja de leer y se retorna None.
+        """
+        if dead_hosts.is_dead(url) or (cancelado is not None and cancelado.is_set()):
             return None
+        inicio = None
+        connect_acotado = False
+        try:
+            domain_scheduler.wait_sync(url)
+            connect, read = host_latency.timeouts(url, timeout)
+            if deadline is not None:
+                restante = deadline - time.monotonic()
+                if restante <= 0:
+                    logger.debug(f"Sin tiempo restante para {url}")
+                    return None
+                connect, read = min(connect, restante), min(read, restante)
+            connect_acotado = connect < CONNECT_TIMEOUT_MAX
+            headers = encabezados_condicionales(validadores)
+            inicio = time.monotonic()
+            with self.session.get(url, timeout=(connect, read), allow_redirects=True, stream=True,
+                                  headers=headers) as response:
+                host_latency.registrar(url, time.monotonic() - inicio)
+                dead_hosts.record_success(url)
+                if response.status_code == 304 and validadores:
+                    return respuesta_no_modificada()
+                if response.status_code != 200:
+                    return None
+                content_type = response.headers.get('Content-Type')
+                if not es_contenido_html(content_type):
+                    logger.debug(f"Contenido no HTML ({content_type}) en {url}")
+                    return None
+                decodificador = DecodificadorHTML(content_type, max_bytes=max_bytes)
+                for bloque in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+                    if cancelado is not None and cancelado.is_set():
+                        logger.debug(f"Descarga cancelada: {url}")
+                        return None
+                    if not decodificador.agregar(bloque):
+                        logger.debug(f"Página truncada a {max_bytes} bytes: {url}")
+                        break
+                    if deadline is not None and time.monotonic() > deadline:
+                        logger.debug(f"Plazo vencido leyendo {url}: se usa lo descargado")
+                        decodificador.truncado = True
+                        break
+                return {**decodificador.resultado(), **validadores_de_respuesta(response.headers)}
         except Exception as e:
+            if inicio is not None and isinstance(e, requests.exceptions.Timeout):
+                host_latency.registrar(url, time.monotonic() - inicio)
+            dead_hosts.record_error(url, e, connect_acotado=connect_acotado)
             logger.debug(f"Error obteniendo {url}: {e}")
             return None
 
+    def get_soup(self, url: str, timeout: int = 10) -> Optional[BeautifulSoup]:
+        """Obtiene BeautifulSoup de una URL usando el pool de la sesión"""
+        pagina = self.descargar_pagina(url, timeout=timeout)
+        return parsear_html(pagina['html']) if pagina else None
+
+_ROBOTS_PREFETCH_EXECUTOR = ThreadPoolExecutor(max_workers=ROBOTS_PREFETCH_CONCURRENCY, thread_name_prefix="robots")
+_sesion_compartida: Optional[ScraperSession] = None
+
 def check_robots_txt(url: str) -> bool:
     """Legacy wrapper - recomienda usar ScraperSession"""
-    return ScraperSession().check_robots(url)
+    global _sesion_compartida
+    if _sesion_compartida is None:
+        _sesion_compartida = ScraperSession()
+    return _sesion_compartida.check_robots(url)
 
-def extraer_emails_b2b(soup: BeautifulSoup, text: str) -> List[str]:
-    """Extrae emails corporativos priorizando contactos comerciales"""
-    emails = []
-    
-    # Buscar en enlaces mailto
-    for link in soup.find_all('a', href=re.compile(r'^mailto:')):
-        email = link['href'].replace('mailto:', '').split('?')[0].strip()
-        emails.append(email)
-    
-    # Buscar en texto con patrón mejorado (limitamos el TLD para evitar junk)
-    # Soporta TLDs comunes y extensiones de país (ar, cl, etc) ordenados para match más largo primero
-    tld_pattern = r'(?:com\.ar|com\.mx|com\.cl|com\.uy|com\.br|com|net|org|edu|gov|biz|info|ar|cl|br|mx|co|es|uy|py|pe|bo|ve|ec|us|uk|it|fr|de)'
-    patrones_email = [
-        fr'\b[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.{tld_pattern}',
-        fr'\b[a-zA-Z0-9._%+-]+\s*\[at\]\s*[a-zA-Z0-9.-]+\s*\.\s*{tld_pattern}', 
-        fr'\b[a-zA-Z0-9._%+-]+\s*\(at\)\s*[a-zA-Z0-9.-]+\s*\.\s*{tld_pattern}',
-        fr'\b[a-zA-Z0-9._%+-]+\s*@\s*[a-zA-Z0-9.-]+\s*\.\s*{tld_pattern}',
-    ]
-    
-    for patron in patrones_email:
-        found = re.findall(patron, text, re.IGNORECASE)
-        for e in found:
-            email_limpio = e.replace(' [at] ', '@').replace(' (at) ', '@').replace('[at]', '@').replace('(at)', '@').replace(' ', '').lower()
-            emails.append(email_limpio)
-    
-    # Priorizar emails corporativos
+# --- Extracción en una sola pasada ---
+# Un único parseo (lxml si está instalado), un único recorrido de enlaces y un único get_text.
+# Los patrones se compilan una vez a nivel de módulo.
+
+_TLD_PATTERN = r'(?:com\.ar|com\.mx|com\.cl|com\.uy|com\.br|com|net|org|edu|gov|biz|info|ar|cl|br|mx|co|es|uy|py|pe|bo|ve|ec|us|uk|it|fr|de)'
+# Cubre 'a@b.com', 'a @ b . com', 'a [at] b.com' y 'a (at) b.com' en un solo escaneo
+EMAIL_RE = re.compile(
+    fr'\b[a-zA-Z0-9._%+-]+\s*(?:@|\[at\]|\(at\))\s*[a-zA-Z0-9.-]+\s*\.\s*{_TLD_PATTERN}',
+    re.IGNORECASE
+)
+TELEFONO_RE = re.compile('|'.join([
+    r'\+?\d{1,4}[-.\s]?\(?\d{1,4}\)?[-.\s]?\d{1,4}[-.\s]?\d{1,4}[-.\s]?\d{1,9}', # General
+    r'\d{2,4}\s*\d{4}[-.\s]?\d{4}', # Argentina Fijos
+    r'11\s*\d{4}[-.\s]?\d{4}', # Buenos Aires Celulares
+    r'0?8\d{2}[-.\s]?\d{3}[-.\s]?\d{4}', # 0800 / 0810
+]))
+WHATSAPP_RE = re.compile(r'phone=(\d+)|wa\.me/(\d+)')
+_NO_DIGITO_RE = re.compile(r'\D')
+
+_EMAILS_DESCARTADOS = ('noreply', 'no-reply', 'example', 'test', 'spam', 'domain.com')
+_EMAILS_COMERCIALES = ('contacto', 'contact', 'info', 'ventas', 'sales', 'comercial', 'hola', 'hello')
+_EMAILS_DIRECTIVOS = ('admin', 'director', 'gerente', 'ceo', 'presupuestos', 'cotizacion')
+
+KEYWORDS_CONTACTO = [
+    'contact', 'contacto', 'about', 'nosotros', 'donde', 'sucursal', 
+    'ubicacion', 'quienes', 'empresa', 'info', 'escribinos', 'ayuda',
+    'institucional', 'secretaria', 'secretaría', 'administracion', 'niveles',
+    'admision', 'ingreso', 'comunidad', 'tel', 'admisiones', 'primaria', 
+    'secundaria', 'jardin', 'contacto-colegio', 'staff', 'docentes', 
+    'bachillerato', 'ciclo', 'clases', 'inscripcion'
+]
+
+# Puntaje de relevancia de sub-páginas: se descargan primero las que más probablemente tengan contacto
+_PUNTAJE_SUBPAGINA = [
+    (('contacto', 'contact', 'escribinos'), 10),
+    (('sucursal', 'donde', 'ubicacion'), 6),
+    (('nosotros', 'about', 'quienes', 'institucional', 'empresa'), 4),
+]
+_KEYWORDS_COLEGIOS = ('secretaria', 'secretaría', 'admision', 'admisiones', 'inscripcion', 'administracion')
+
+SUBPAGE_CONCURRENCY = max(1, int(os.getenv('SCRAPER_SUBPAGE_CONCURRENCY', '3')))  # Sub-páginas simultáneas por sitio
+SUBPAGE_WORKERS = max(1, int(os.getenv('SCRAPER_SUBPAGE_WORKERS', '32')))  # Threads de sub-páginas de todo el proceso
+# Compartido por todos los sitios: acota los threads de sub-páginas del proceso aunque haya muchas empresas en paralelo
+_SUBPAGE_EXECUTOR = ThreadPoolExecutor(max_workers=SUBPAGE_WORKERS, thread_name_prefix="subpaginas")
+
+def puntuar_subpagina(url: str, texto: str = "", rubro: str = "") -> int:
+    """Relevancia de un link de sub-página según su URL, su texto y el rubro"""
+    u, t = url.lower(), texto.lower()
+    score = 1
+    for keywords, puntos in _PUNTAJE_SUBPAGINA:
+        if any(k in u or k in t for k in keywords):
+            score = max(score, puntos)
+    if rubro == "colegios" and any(k in u or k in t for k in _KEYWORDS_COLEGIOS):
+        score = max(score, 8)
+    # Las páginas cercanas a la raíz y sin query suelen ser las institucionales
+    path = urlparse(url).path.strip('/')
+    score -= min(3, path.count('/'))
+    if '?' in url:
+        score -= 2
+    return score
+
+def parsear_html(content) -> BeautifulSoup:
+    return BeautifulSoup(content, HTML_PARSER)
+
+def _limpiar_email(raw: str) -> str:
+    return raw.replace(' [at] ', '@').replace(' (at) ', '@').replace('[at]', '@').replace('(at)', '@').replace(' ', '').lower()
+
+def _priorizar_emails(emails: List[str]) -> List[str]:
+    """Descarta emails genéricos y prioriza los comerciales"""
     emails_validos = []
     for email in set(emails):
         email = email.lower().strip()
-        if any(x in email for x in ['noreply', 'no-reply', 'example', 'test', 'spam', 'domain.com']):
+        if any(x in email for x in _EMAILS_DESCARTADOS):
             continue
         
         prioridad = 0
-        if any(x in email for x in ['contacto', 'contact', 'info', 'ventas', 'sales', 'comercial', 'hola', 'hello']):
+        if any(x in email for x in _EMAILS_COMERCIALES):
             prioridad = 10
-        elif any(x in email for x in ['admin', 'director', 'gerente', 'ceo', 'presupuestos', 'cotizacion']):
+        elif any(x in email for x in _EMAILS_DIRECTIVOS):
             prioridad = 5
         
         emails_validos.append((prioridad, email))
@@ -116,169 +309,340 @@ def extraer_emails_b2b(soup: BeautifulSoup, text: str) -> List[str]:
     emails_validos.sort(key=lambda x: x[0], reverse=True)
     return [email for _, email in emails_validos[:5]]
 
-def extraer_telefonos_b2b(soup: BeautifulSoup, text: str) -> List[str]:
-    """Extrae teléfonos corporativos incluyendo WhatsApp"""
-    telefonos = []
-    
-    # 1. Enlaces tel:
-    for link in soup.find_all('a', href=re.compile(r'^tel:')):
-        telefono = link['href'].replace('tel:', '').strip()
-        telefonos.append(telefono)
-    
-    # 2. Enlaces de WhatsApp (wa.me, api.whatsapp.com)
-    for link in soup.find_all('a', href=re.compile(r'wa\.me|whatsapp\.com/send')):
-        href = link['href']
-        # Extraer número del href
-        match = re.search(r'phone=(\d+)', href) or re.search(r'wa\.me/(\d+)', href)
-        if match:
-            telefonos.append(match.group(1))
-
-    # 3. Patrones de texto (Argentina y formatos globales)
-    patrones = [
-        r'\+?\d{1,4}[-.\s]?\(?\d{1,4}\)?[-.\s]?\d{1,4}[-.\s]?\d{1,4}[-.\s]?\d{1,9}', # General
-        r'\d{2,4}\s*\d{4}[-.\s]?\d{4}', # Argentina Fijos
-        r'11\s*\d{4}[-.\s]?\d{4}', # Buenos Aires Celulares
-        r'0?8\d{2}[-.\s]?\d{3}[-.\s]?\d{4}', # 0800 / 0810
-    ]
-    
-    for patron in patrones:
-        found = re.findall(patron, text)
-        for f in found:
-            # Limpiar para validar largo
-            digitos = re.sub(r'\D', '', f)
-            if 7 <= len(digitos) <= 15:
-                telefonos.append(f.strip())
-    
-    # Deduplicar y limpiar
+def _depurar_telefonos(telefonos: List[str]) -> List[str]:
+    """Deduplica por dígitos y conserva el orden de aparición"""
     telefonos_limpios = []
     vistos = set()
     for tel in telefonos:
-        digitos = re.sub(r'\D', '', tel)
+        digitos = _NO_DIGITO_RE.sub('', tel)
         if digitos and digitos not in vistos:
             telefonos_limpios.append(tel.strip())
             vistos.add(digitos)
-            
     return telefonos_limpios[:5]
 
-def buscar_en_paginas_adicionales(base_url: str, soup: BeautifulSoup, session: Optional[ScraperSession] = None, rubro: str = "") -> Dict:
-    """Busca páginas de contacto, nosotros y sucursales"""
-    if not session: session = ScraperSession()
-    urls_a_escanear = []
-    
-    keywords_contacto = [
-        'contact', 'contacto', 'about', 'nosotros', 'donde', 'sucursal', 
-        'ubicacion', 'quienes', 'empresa', 'info', 'escribinos', 'ayuda',
-        'institucional', 'secretaria', 'secretaría', 'administracion', 'niveles',
-        'admision', 'ingreso', 'comunidad', 'tel', 'admisiones', 'primaria', 
-        'secundaria', 'jardin', 'contacto-colegio', 'staff', 'docentes', 
-        'bachillerato', 'ciclo', 'clases', 'inscripcion'
+def _emails_en_texto(text: str) -> List[str]:
+    return [_limpiar_email(e) for e in EMAIL_RE.findall(text)]
+
+def _telefonos_en_texto(text: str) -> List[str]:
+    telefonos = []
+    for match in TELEFONO_RE.finditer(text):
+        f = match.group(0)
+        # Limpiar para validar largo
+        if 7 <= len(_NO_DIGITO_RE.sub('', f)) <= 15:
+            telefonos.append(f.strip())
+    return telefonos
+
+def _telefonos_estructurados(valores: List[str]) -> List[str]:
+    """Teléfonos declarados en JSON-LD/microdata, con el mismo filtro de largo que los del texto"""
+    telefonos = [v.replace('tel:', '').strip() for v in valores]
+    return [t for t in telefonos if 7 <= len(_NO_DIGITO_RE.sub('', t)) <= 15]
+
+def _telefono_de_whatsapp(href: str) -> Optional[str]:
+    match = WHATSAPP_RE.search(href)
+    return (match.group(1) or match.group(2)) if match else None
+
+def extraer_emails_b2b(soup: BeautifulSoup, text: str) -> List[str]:
+    """Extrae emails corporativos priorizando contactos comerciales"""
+    emails = [
+        a['href'].replace('mailto:', '').split('?')[0].strip()
+        for a in soup.find_all('a', href=True) if a['href'].startswith('mailto:')
     ]
-    
+    return _priorizar_emails(emails + _emails_en_texto(text))
+
+def extraer_telefonos_b2b(soup: BeautifulSoup, text: str) -> List[str]:
+    """Extrae teléfonos corporativos incluyendo WhatsApp"""
+    telefonos = []
+    for a in soup.find_all('a', href=True):
+        href = a['href']
+        if href.startswith('tel:'):
+            telefonos.append(href.replace('tel:', '').strip())
+        elif 'wa.me' in href or 'whatsapp.com/send' in href:
+            numero = _telefono_de_whatsapp(href)
+            if numero:
+                telefonos.append(numero)
+    return _depurar_telefonos(telefonos + _telefonos_en_texto(text))
+
+def _sumar_subpagina_candidata(subpaginas: Dict[str, int], url: str, netloc_base: str, link, rubro: str = "") -> None:
+    """Si el enlace apunta a una sub-página de contacto del mismo dominio, la suma con su puntaje (no toca el soup)"""
+    href = link['href']
+    href_lower = href.lower()
+    texto = link.get_text().lower()
+    if any(k in href_lower or k in texto for k in KEYWORDS_CONTACTO):
+        full_url = urljoin(url, href)
+        # Evitar repetir la base_url y filtrar dominios externos
+        if full_url != url and urlparse(full_url).netloc == netloc_base:
+            score = puntuar_subpagina(full_url, texto, rubro)
+            subpaginas[full_url] = max(score, subpaginas.get(full_url, score))
+
+def _ordenar_subpaginas(subpaginas: Dict[str, int], rubro: str = "") -> List[str]:
+    """Por relevancia (estable: a igual puntaje se respeta el orden del documento), hasta 5 (8 en colegios)"""
+    ordenadas = sorted(subpaginas, key=lambda u: subpaginas[u], reverse=True)
+    return ordenadas[:8 if rubro == "colegios" else 5]
+
+def extraer_datos_pagina(url: str, soup: BeautifulSoup, rubro: str = "", contenido: bool = True) -> Dict:
+    """
+    Extrae todo lo necesario de una página en un solo recorrido:
+    metadatos, contenido, emails, teléfonos, redes y sub-páginas candidatas.
+    Si los datos estructurados (JSON-LD/microdata) ya traen email y teléfono, no se escanea el texto
+    con regex ni se proponen sub-páginas. Modifica el soup (quita scripts y estilos).
+    """
+    datos = {
+        'emails': [], 'telefonos': [], **{red: '' for red in REDES_SOCIALES},
+        'website_title': '', 'website_description': '', 'website_content': '', 'subpaginas': []
+    }
+    emails, telefonos, hrefs = [], [], []
+    subpaginas: Dict[str, int] = {}  # url -> puntaje de relevancia
+    netloc_base = urlparse(url).netloc
+
+    # 0. Datos estructurados primero: son los contactos que la empresa declara explícitamente
+    estructurados = extraer_datos_estructurados(soup)
+    emails_estructurados = _emails_en_texto(' '.join(estructurados['emails']))
+    telefonos_estructurados = _telefonos_estructurados(estructurados['telefonos'])
+    completos = contactos_completos(_priorizar_emails(emails_estructurados), telefonos_estructurados)
+
+    # 1. Único recorrido de enlaces: mailto, tel, WhatsApp, redes y sub-páginas de contacto
     for link in soup.find_all('a', href=True):
-        href = link['href'].lower()
-        texto = link.get_text().lower()
-        
-        if any(k in href or k in texto for k in keywords_contacto):
-            full_url = urljoin(base_url, link['href'])
-            # Evitar repetir la base_url y filtrar dominios externos
-            if full_url != base_url and urlparse(full_url).netloc == urlparse(base_url).netloc:
-                urls_a_escanear.append(full_url)
-    
-    # Priorizar y limpiar URLs
-    # 1. Eliminar duplicados manteniendo orden
-    urls_a_escanear = list(dict.fromkeys(urls_a_escanear))
-    
-    # 2. Priorizar URLs que tengan 'contacto' o 'contact'
-    urls_a_escanear.sort(key=lambda u: 0 if any(k in u.lower() for k in ['contact', 'contacto']) else 1)
-    
-    # 3. Tomar las más prometedoras (Deep Scraper for Schools)
-    limit = 8 if rubro == "colegios" else 5
-    urls_a_escanear = urls_a_escanear[:limit]
-    
+        href = link['href']
+        if href.startswith('mailto:'):
+            emails.append(href.replace('mailto:', '').split('?')[0].strip())
+            continue
+        if href.startswith('tel:'):
+            telefonos.append(href.replace('tel:', '').strip())
+            continue
+        if 'wa.me' in href or 'whatsapp.com/send' in href:
+            numero = _telefono_de_whatsapp(href)
+            if numero:
+                telefonos.append(numero)
+        hrefs.append(href)
+
+        if contenido and not completos:
+            _sumar_subpagina_candidata(subpaginas, url, netloc_base, link, rubro)
+
+    # 2. Metadatos y redes sociales (antes de quitar los <script>: el JSON-LD vive ahí).
+    # Las redes reutilizan los hrefs del recorrido anterior y los sameAs ya decodificados.
+    if contenido:
+        datos.update(extraer_redes_sociales(soup, hrefs, same_as=estructurados['same_as']))
+        try:
+            if soup.title and soup.title.string:
+                datos['website_title'] = soup.title.string.strip()
+            meta_desc = soup.find('meta', attrs={'name': 'description'}) or soup.find('meta', attrs={'property': 'og:description'})
+            if meta_desc:
+                datos['website_description'] = (meta_desc.get('content') or '').strip()
+        except Exception as e:
+            logger.warning(f"Error extrayendo metadatos de {url}: {e}")
+
+    # 3. Texto: se quitan scripts/estilos; nav/footer/header se separan del contenido pero
+    # su texto sí se escanea en busca de contactos (el email suele estar en el footer).
+    # Con los contactos ya completos sólo hace falta el texto principal, y sólo en la home.
+    emails_texto, telefonos_texto = [], []
+    if contenido or not completos:
+        for tag in soup(["script", "style", "noscript", "template"]):
+            tag.decompose()
+        periferia = [tag.extract() for tag in soup(["nav", "footer", "header"])] if contenido else []
+        text_principal = soup.get_text(separator=' ')
+
+        if contenido:
+            # Guardamos primeros 3000 caracteres para no explotar la DB
+            datos['website_content'] = ' '.join(text_principal.split())[:3000]
+
+        if not completos:
+            text = ' '.join([text_principal] + [tag.get_text(separator=' ') for tag in periferia])
+            emails_texto, telefonos_texto = _emails_en_texto(text), _telefonos_en_texto(text)
+
+    datos['emails'] = _priorizar_emails(emails_estructurados + emails + emails_texto)
+    datos['telefonos'] = _depurar_telefonos(telefonos_estructurados + telefonos + telefonos_texto)
+
+    if contenido:
+        datos['subpaginas'] = _ordenar_subpaginas(subpaginas, rubro)
+    return datos
+
+# --- Trabajos de la etapa de CPU (corren en parse_pool; reciben HTML y retornan dicts compactos) ---
+
+def analizar_home(url: str, content: str, rubro: str = "") -> Dict:
+    """Parseo y extracción completa de la home"""
+    return extraer_datos_pagina(url, parsear_html(content), rubro=rubro)
+
+def analizar_subpagina(url: str, content: str, rubro: str = "") -> Dict:
+    """Emails y teléfonos de una sub-página (misma firma que analizar_home)"""
+    return extraer_contactos_subpagina(parsear_html(content))
+
+def descargar_y_analizar(session: ScraperSession, url: str, trabajo: Callable[..., Dict], rubro: str = "",
+                         timeout: int = 10, deadline: Optional[float] = None,
+                         cancelado: Optional[Event] = None) -> Optional[Dict]:
+    """
+    Descarga (condicional si hay validadores guardados) y analiza una página. Si no cambió desde el
+    último scraping (304 o mismo hash) se reutiliza lo extraído entonces, sin parsear.
+    Retorna lo extraído más 'truncado', o None si no se pudo obtener.
+    """
+    previa = session.cache.get_pagina(url) if session.cache is not None else None
+    pagina = session.descargar_pagina(url, timeout=timeout, validadores=previa, deadline=deadline, cancelado=cancelado)
+    if not pagina or (cancelado is not None and cancelado.is_set()):
+        return None
+    datos = session.cache.reutilizar_pagina(previa, pagina) if session.cache is not None else None
+    if datos is not None:
+        return datos
+    if pagina['html'] is None:
+        return None
+    # El parseo va al pool de procesos: este thread vuelve a quedar libre para la red
+    datos = parse_pool.ejecutar(trabajo, url, pagina['html'], rubro)
+    datos['truncado'] = pagina['truncado']
+    if session.cache is not None:
+        session.cache.put_pagina(url, pagina, datos)
+    return datos
+
+def seleccionar_paginas_adicionales(base_url: str, soup: BeautifulSoup, rubro: str = "") -> List[str]:
+    """
+    Elige las sub-páginas de contacto, nosotros y sucursales más prometedoras del mismo dominio.
+    Sólo recorre los enlaces y no modifica el soup; si ya se extrajo la página, usar datos['subpaginas'].
+    """
+    subpaginas: Dict[str, int] = {}
+    netloc_base = urlparse(base_url).netloc
+    for link in soup.find_all('a', href=True):
+        _sumar_subpagina_candidata(subpaginas, base_url, netloc_base, link, rubro)
+    return _ordenar_subpaginas(subpaginas, rubro)
+
+def extraer_contactos_subpagina(soup_sub: BeautifulSoup) -> Dict:
+    """Emails y teléfonos de una sub-página ya parseada"""
+    datos = extraer_datos_pagina('', soup_sub, contenido=False)
+    return {'emails': datos['emails'], 'telefonos': datos['telefonos']}
+
+def contactos_completos(emails: List[str], telefonos: List[str]) -> bool:
+    """Criterio de corte temprano: ya hay al menos un email y un teléfono"""
+    return bool(emails) and bool(telefonos)
+
+def _escanear_subpaginas(urls: List[str], session: ScraperSession, emails_previos: Optional[List[str]] = None,
+                         telefonos_previos: Optional[List[str]] = None, deadline: Optional[float] = None) -> Dict:
+    """
+    Descarga las sub-páginas en el pool compartido (a lo sumo SUBPAGE_CONCURRENCY por sitio, en orden de
+    relevancia) y corta apenas se completan email y teléfono o vence el deadline: las que no empezaron se
+    cancelan y las que están en curso dejan de leer en el próximo bloque.
+    """
     emails_totales = []
     telefonos_totales = []
-    
-    for url in urls_a_escanear:
+    emails_previos = emails_previos or []
+    telefonos_previos = telefonos_previos or []
+
+    truncado = False
+    cancelado = Event()
+
+    def descargar(url: str) -> Optional[Dict]:
+        if cancelado.is_set():
+            return None
         logger.info(f"  Escaneando sub-página: {url}")
         # Usar un timeout un poco más corto para sub-páginas
-        soup_sub = session.get_soup(url, timeout=7)
-        if soup_sub:
-            text_sub = soup_sub.get_text()
-            emails_totales.extend(extraer_emails_b2b(soup_sub, text_sub))
-            telefonos_totales.extend(extraer_telefonos_b2b(soup_sub, text_sub))
-            
+        return descargar_y_analizar(session, url, analizar_subpagina, timeout=7, deadline=deadline, cancelado=cancelado)
+
+    pendientes = list(urls)
+    en_curso = set()
+    try:
+        completos = False
+        while (pendientes or en_curso) and not completos:
+            while pendientes and len(en_curso) < SUBPAGE_CONCURRENCY:
+                en_curso.add(_SUBPAGE_EXECUTOR.submit(descargar, pendientes.pop(0)))
+            restante = None if deadline is None else max(0.0, deadline - time.monotonic())
+            listas, en_curso = wait(en_curso, timeout=restante, return_when=FIRST_COMPLETED)
+            if not listas:
+                logger.debug("Plazo vencido escaneando sub-páginas: se usa lo obtenido")
+                break
+            for future in listas:
+                try:
+                    datos = future.result()
+                except Exception as e:
+                    logger.debug(f"Error escaneando sub-página: {e}")
+                    continue
+                if not datos:
+                    continue
+                emails_totales.extend(datos['emails'])
+                telefonos_totales.extend(datos['telefonos'])
+                truncado = truncado or datos['truncado']
+                if contactos_completos(emails_previos + emails_totales, telefonos_previos + telefonos_totales):
+                    completos = True
+                    break
+    finally:
+        cancelado.set()
+        for future in en_curso:
+            future.cancel()
+
     return {
         'emails': list(set(emails_totales)),
-        'telefonos': list(set(telefonos_totales))
+        'telefonos': list(set(telefonos_totales)),
+        'truncado': truncado
     }
 
-def scrapear_empresa_b2b(url: str, session: Optional[ScraperSession] = None, rubro: str = "") -> Dict:
-    """Scrapea sitio web empresarial persistente o efímero"""
+def buscar_en_paginas_adicionales(base_url: str, soup: BeautifulSoup, session: Optional[ScraperSession] = None, rubro: str = "",
+                                  subpaginas: Optional[List[str]] = None) -> Dict:
+    """Busca páginas de contacto, nosotros y sucursales (subpaginas: las que ya eligió extraer_datos_pagina)"""
     if not session: session = ScraperSession()
-    resultado = {
-        'emails': [], 'telefonos': [], 'linkedin': '', 'facebook': '',
-        'twitter': '', 'instagram': '', 'exito': False
+    if subpaginas is None:
+        subpaginas = seleccionar_paginas_adicionales(base_url, soup, rubro=rubro)
+    return _escanear_subpaginas(subpaginas, session)
+
+def nuevo_resultado_scraping() -> Dict:
+    return {
+        'emails': [], 'telefonos': [], **{red: '' for red in REDES_SOCIALES},
+        'exito': False, 'bloqueado': False, 'truncado': False, 'host_caido': False, 'plazo_vencido': False
     }
+
+def volcar_datos_pagina(resultado: Dict, datos: Dict) -> List[str]:
+    """Copia al resultado lo extraído de la home y retorna las sub-páginas a escanear (si faltan contactos)"""
+    for campo in ('emails', 'telefonos', *REDES_SOCIALES):
+        resultado[campo] = datos[campo]
+    for campo in ('website_title', 'website_description', 'website_content'):
+        resultado[campo] = datos[campo]
+    if contactos_completos(resultado['emails'], resultado['telefonos']):
+        return []
+    return datos['subpaginas']
+
+def combinar_contactos(resultado: Dict, datos_contacto: Dict) -> None:
+    resultado['emails'] = list(set(resultado['emails'] + datos_contacto['emails']))
+    resultado['telefonos'] = list(set(resultado['telefonos'] + datos_contacto['telefonos']))
+    resultado['truncado'] = resultado.get('truncado', False) or datos_contacto.get('truncado', False)
+
+def recortar_resultado(resultado: Dict) -> None:
+    resultado['emails'] = resultado['emails'][:3]
+    resultado['telefonos'] = resultado['telefonos'][:3]
+    resultado['exito'] = True
+
+def scrapear_empresa_b2b(url: str, session: Optional[ScraperSession] = None, rubro: str = "",
+                         deadline: Optional[float] = None) -> Dict:
+    """
+    Scrapea sitio web empresarial persistente o efímero. Con deadline (time.monotonic()) ninguna
+    descarga lo excede; si vence sin haber obtenido la home, el resultado sale con 'plazo_vencido'.
+    """
+    if not session: session = ScraperSession()
+    resultado = nuevo_resultado_scraping()
     
     if not url: return resultado
     if not url.startswith('http'): url = 'https://' + url
     
+    if dead_hosts.is_dead(url):
+        logger.info(f"Host caído, se saltea: {url}")
+        resultado['host_caido'] = True
+        return resultado
+    
     try:
         if not session.check_robots(url):
             logger.warning(f"Bloqueado por robots: {url}")
+            resultado['bloqueado'] = True
             return resultado
         
         logger.info(f"Scrapeando: {url} | Rubro: {rubro}")
-        soup = session.get_soup(url)
+        datos = descargar_y_analizar(session, url, analizar_home, rubro, deadline=deadline)
         
-        if soup:
-            # Extraer metadatos básicos para Deep Enrichment
-            try:
-                # Title
-                if soup.title:
-                    resultado['website_title'] = soup.title.string.strip() if soup.title.string else ''
-                
-                # Meta Description
-                meta_desc = soup.find('meta', attrs={'name': 'description'}) or soup.find('meta', attrs={'property': 'og:description'})
-                if meta_desc:
-                    resultado['website_description'] = meta_desc.get('content', '').strip()
-                
-                # Body Content (Truncated)
-                # Eliminamos scripts, estilos y navegarion para obtener texto limpio
-                for script in soup(["script", "style", "nav", "footer", "header"]):
-                    script.decompose()
-                
-                text_content = soup.get_text(separator=' ', strip=True)
-                # Limpiamos espacios múltiples
-                text_content = ' '.join(text_content.split())
-                # Guardamos primeros 3000 caracteres para no explotar la DB
-                resultado['website_content'] = text_content[:3000]
-                
-            except Exception as e:
-                logger.warning(f"Error extrayendo contenido extra de {url}: {e}")
-
-            text = soup.get_text()
-            resultado['emails'] = extraer_emails_b2b(soup, text)
-            resultado['telefonos'] = extraer_telefonos_b2b(soup, text)
-            
-            if not resultado['emails'] or not resultado['telefonos']:
-                datos_contacto = buscar_en_paginas_adicionales(url, soup, session, rubro=rubro)
-                resultado['emails'] = list(set(resultado['emails'] + datos_contacto['emails']))
-                resultado['telefonos'] = list(set(resultado['telefonos'] + datos_contacto['telefonos']))
-            
-            for link in soup.find_all('a', href=True):
-                href = link['href']
-                if 'linkedin.com' in href: resultado['linkedin'] = href
-                elif 'facebook.com' in href: resultado['facebook'] = href
-                elif 'twitter.com' in href or 'x.com' in href: resultado['twitter'] = href
-                elif 'instagram.com' in href: resultado['instagram'] = href
-            
-            resultado['emails'] = resultado['emails'][:3]
-            resultado['telefonos'] = resultado['telefonos'][:3]
-            resultado['exito'] = True
+        if datos:
+            resultado['truncado'] = datos['truncado']
+            subpaginas = volcar_datos_pagina(resultado, datos)
+            if subpaginas:
+                combinar_contactos(resultado, _escanear_subpaginas(
+                    subpaginas, session, resultado['emails'], resultado['telefonos'], deadline=deadline
+                ))
+            recortar_resultado(resultado)
     except Exception as e:
         logger.error(f"Error scraping {url}: {e}")
     
+    if not resultado['exito'] and deadline is not None and time.monotonic() >= deadline:
+        resultado['plazo_vencido'] = True
+    
     return resultado
 
 def enriquecer_empresa_b2b(empresa: Dict, session: Optional[ScraperSession] = None) -> Dict:
@@ -289,6 +653,10 @@ def enriquecer_empresa_b2b(empresa: Dict, session: Optional[ScraperSession] = No
         return empresa
     
     datos_scraped = scrapear_empresa_b2b(website, session, rubro=rubro)
+    return aplicar_datos_scrapeados(empresa, datos_scraped)
+
+def aplicar_datos_scrapeados(empresa: Dict, datos_scraped: Dict) -> Dict:
+    """Vuelca en la empresa los contactos y metadatos obtenidos del sitio"""
     if not empresa.get('email') and datos_scraped['emails']:
         empresa['email'] = datos_scraped['emails'][0]
     if not empresa.get('telefono') and datos_scraped['telefonos']:
@@ -306,4 +674,3 @@ def enriquecer_empresa_b2b(empresa: Dict, session: Optional[ScraperSession] = No
         'website_content': datos_scraped.get('website_content', '')
     })
     return empresa
-
@@ -0,0 +1,671 @@
+"""
+Motor de scraping asíncrono para el enriquecimiento de empresas.
+
+Reemplaza el camino ThreadPoolExecutor + requests: un único event loop maneja cientos de
+descargas concurrentes con un httpx.AsyncClient compartido, límite de conexiones por host,
+cache de DNS compartida y cancelación cooperativa. El parseo HTML (CPU) se delega a threads
+para no bloquear el loop; la lógica de extracción es la misma que la del scraper sincrónico.
+"""
+
+import asyncio
+import contextlib
+import ipaddress
+import logging
+import os
+import socket
+import time
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Set, Tuple
+from urllib.parse import urlparse
+
+import httpcore
+import httpx
+
+try:
+    from .dead_hosts import dead_hosts, host_de
+    from .host_latency import CONNECT_TIMEOUT_MAX, host_latency
+    from .enrichment_queue import PRIORIDAD_INTERACTIVA, enrichment_queue
+    from .parse_pool import parse_pool
+    from .politeness import domain_scheduler
+    from .robots_cache import RespuestaRobots, RobotsCache, robots_cache
+    from .scraping_cache import (
+        ScrapingCache, STATUS_SUCCESS, aplicar_entrada_cache, encabezados_condicionales, estado_de_resultado,
+        normalizar_dominio, payload_cacheable, scraping_cache
+    )
+    from .scraper import (
+        MAX_PAGE_BYTES, STREAM_CHUNK_SIZE, SUBPAGE_CONCURRENCY, DecodificadorHTML, ScraperSession,
+        aplicar_datos_scrapeados, analizar_home, analizar_subpagina, combinar_contactos, contactos_completos,
+        es_contenido_html, nuevo_resultado_scraping, recortar_resultado, respuesta_no_modificada, validadores_de_respuesta,
+        volcar_datos_pagina
+    )
+except ImportError:
+    from dead_hosts import dead_hosts, host_de
+    from host_latency import CONNECT_TIMEOUT_MAX, host_latency
+    from enrichment_queue import PRIORIDAD_INTERACTIVA, enrichment_queue
+    from parse_pool import parse_pool
+    from politeness import domain_scheduler
+    from robots_cache import RespuestaRobots, RobotsCache, robots_cache
+    from scraping_cache import (
+        ScrapingCache, STATUS_SUCCESS, aplicar_entrada_cache, encabezados_condicionales, estado_de_resultado,
+        normalizar_dominio, payload_cacheable, scraping_cache
+    )
+    from scraper import (
+        MAX_PAGE_BYTES, STREAM_CHUNK_SIZE, SUBPAGE_CONCURRENCY, DecodificadorHTML, ScraperSession,
+        aplicar_datos_scrapeados, analizar_home, analizar_subpagina, combinar_contactos, contactos_completos,
+        es_contenido_html, nuevo_resultado_scraping, recortar_resultado, respuesta_no_modificada, validadores_de_respuesta,
+        volcar_datos_pagina
+    )
+
+logger = logging.getLogger(__name__)
+
+SCRAPER_ASYNC_CONCURRENCY = max(1, int(os.getenv('SCRAPER_ASYNC_CONCURRENCY', '100')))  # Empresas en simultáneo
+SCRAPER_ASYNC_MAX_CONNECTIONS = max(1, int(os.getenv('SCRAPER_ASYNC_MAX_CONNECTIONS', '200')))
+SCRAPER_ASYNC_MAX_PER_HOST = max(1, int(os.getenv('SCRAPER_ASYNC_MAX_PER_HOST', '2')))
+SCRAPER_DNS_TTL_SECONDS = float(os.getenv('SCRAPER_DNS_TTL_SECONDS', '300'))
+SCRAPER_PAGE_TIMEOUT = float(os.getenv('SCRAPER_PAGE_TIMEOUT_SECONDS', '10'))
+SCRAPER_SUBPAGE_TIMEOUT = float(os.getenv('SCRAPER_SUBPAGE_TIMEOUT_SECONDS', '7'))
+SCRAPER_ROBOTS_TIMEOUT = 3.0
+SCRAPER_DNS_PRERESOLVE_CONCURRENCY = int(os.getenv('SCRAPER_DNS_PRERESOLVE_CONCURRENCY', '32'))
+SCRAPER_DNS_PRERESOLVE_TIMEOUT = float(os.getenv('SCRAPER_DNS_PRERESOLVE_TIMEOUT_SECONDS', '3'))
+# Solicitud de cobertura (hedge) para la home: se lanza al superar el p90 del host (o este valor sin datos)
+SCRAPER_HEDGE_ENABLED = os.getenv('SCRAPER_HEDGE_ENABLED', '1') == '1'
+SCRAPER_HEDGE_AFTER_SECONDS = float(os.getenv('SCRAPER_HEDGE_AFTER_SECONDS', '3'))
+
+
+class _ResolucionAbandonada(Exception):
+    """La corutina que resolvía un nombre fue cancelada antes de terminar"""
+
+
+class _CachingDNSBackend(httpcore.AsyncNetworkBackend):
+    """
+    Network backend de httpcore que resuelve nombres con cache TTL compartida.
+    Conecta por IP; el SNI/Host siguen usando el nombre original (httpcore los toma del origin).
+    """
+
+    def __init__(self, inner: httpcore.AsyncNetworkBackend, ttl_seconds: float = SCRAPER_DNS_TTL_SECONDS):
+        self._inner = inner
+        self.ttl_seconds = ttl_seconds
+        self._cache: Dict[Tuple[str, int], Tuple[float, List[str]]] = {}
+        self._pending: Dict[Tuple[str, int], asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def _resolve(self, host: str, port: int) -> List[str]:
+        key = (host, port)
+        while True:
+            entry = self._cache.get(key)
+            if entry and entry[0] > time.monotonic():
+                self.hits += 1
+                return entry[1]
+
+            pending = self._pending.get(key)
+            if pending is None:
+                break
+            try:
+                resultado = await asyncio.shield(pending)
+            except _ResolucionAbandonada:
+                continue  # Quien resolvía fue cancelado: se vuelve a mirar la cache o se resuelve acá
+            self.hits += 1
+            return resultado
+
+        self.misses += 1
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._pending[key] = fut
+        try:
+            infos = await loop.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+            addrs = list(dict.fromkeys(info[4][0] for info in infos))
+            self._cache[key] = (time.monotonic() + self.ttl_seconds, addrs)
+            fut.set_result(addrs)
+            return addrs
+        except Exception as e:
+            error = httpcore.ConnectError(f"DNS: {host}: {e}")
+            fut.set_exception(error)
+            fut.exception()  # Evita el warning de excepción no recuperada si nadie más espera
+            raise error from e
+        finally:
+            self._pending.pop(key, None)
+            if not fut.done():
+                # Resolución cancelada (timeout del lead, hedge perdedor): los que esperaban no se
+                # cancelan con ella, reintentan por su cuenta
+                fut.set_exception(_ResolucionAbandonada())
+                fut.exception()
+
+    async def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        try:
+            ipaddress.ip_address(host)
+            addrs = [host]
+        except ValueError:
+            addrs = await self._resolve(host, port)
+
+        last_error: Optional[Exception] = None
+        for addr in addrs:
+            try:
+                return await self._inner.connect_tcp(
+                    addr, port, timeout=timeout, local_address=local_address, socket_options=socket_options
+                )
+            except (httpcore.ConnectError, httpcore.ConnectTimeout) as e:
+                last_error = e
+        raise last_error or httpcore.ConnectError(f"Sin direcciones para {host}")
+
+    async def connect_unix_socket(self, path, timeout=None, socket_options=None):
+        return await self._inner.connect_unix_socket(path, timeout=timeout, socket_options=socket_options)
+
+    async def sleep(self, seconds: float) -> None:
+        await self._inner.sleep(seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"dns_cache_entries": len(self._cache), "dns_hits": self.hits, "dns_misses": self.misses}
+
+
+class AsyncScraperEngine:
+    """Cliente HTTP asíncrono compartido para scraping, con límite por host y cache de DNS"""
+
+    def __init__(
+        self,
+        max_connections: int = SCRAPER_ASYNC_MAX_CONNECTIONS,
+        max_per_host: int = SCRAPER_ASYNC_MAX_PER_HOST,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        cache: Optional[ScrapingCache] = scraping_cache,
+        robots: RobotsCache = robots_cache
+    ):
+        self.max_connections = max_connections
+        self.max_per_host = max_per_host
+        self.cache = cache  # None desactiva la cache por dominio
+        self.robots = robots
+        self._transport = transport  # Inyectable en tests
+        self._client: Optional[httpx.AsyncClient] = None
+        self._client_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._dns: Optional[_CachingDNSBackend] = None
+        self._host_slots: Dict[str, asyncio.Semaphore] = {}
+        self._stats = {"fetches": 0, "fetch_errors": 0, "bytes": 0, "robots_blocked": 0, "timeouts": 0, "cache_hits": 0,
+                       "subpage_early_exits": 0, "non_html_skipped": 0, "truncated": 0,
+                       "dead_host_skips": 0, "dead_hosts_detected": 0, "hedges": 0, "hedges_won": 0}
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Cliente perezoso ligado al event loop actual (igual que el pool de Google Places)"""
+        loop = asyncio.get_running_loop()
+        if self._client is not None and self._client_loop is loop and not self._client.is_closed:
+            return self._client
+
+        transport = self._transport
+        if transport is None:
+            transport = httpx.AsyncHTTPTransport(
+                limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections // 2)
+            )
+            pool = getattr(transport, "_pool", None)
+            if pool is not None and hasattr(pool, "_network_backend"):
+                if self._dns is None:
+                    self._dns = _CachingDNSBackend(pool._network_backend)
+                pool._network_backend = self._dns
+            else:
+                logger.warning("No se pudo instalar la cache de DNS en el transporte de httpx")
+
+        self._client = httpx.AsyncClient(
+            transport=transport,
+            headers=dict(ScraperSession.DEFAULT_HEADERS),
+            follow_redirects=True,
+            timeout=SCRAPER_PAGE_TIMEOUT
+        )
+        self._client_loop = loop
+        self._host_slots = {}
+        return self._client
+
+    def _host_slot(self, url: str) -> asyncio.Semaphore:
+        host = urlparse(url).netloc.lower()
+        slot = self._host_slots.get(host)
+        if slot is None:
+            slot = self._host_slots[host] = asyncio.Semaphore(self.max_per_host)
+        return slot
+
+    async def fetch(self, url: str, timeout: float = SCRAPER_PAGE_TIMEOUT, polite: bool = True) -> Optional[httpx.Response]:
+        """GET respetando el turno de cortesía del dominio y el límite por host. Retorna None ante errores de red."""
+        if dead_hosts.is_dead(url):
+            self._stats["dead_host_skips"] += 1
+            return None
+        client = self._get_client()
+        if polite:
+            await domain_scheduler.wait(url)
+        async with self._host_slot(url):
+            try:
+                response = await client.get(url, timeout=timeout)
+            except httpx.HTTPError as e:
+                self._registrar_error(url, e, connect_acotado=timeout < CONNECT_TIMEOUT_MAX)
+                return None
+        dead_hosts.record_success(url)
+        self._stats["fetches"] += 1
+        self._stats["bytes"] += len(response.content)
+        return response
+
+    async def fetch_pagina(self, url: str, timeout: float = SCRAPER_PAGE_TIMEOUT, max_bytes: int = MAX_PAGE_BYTES,
+                           validadores: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """
+        GET en streaming con el mismo turno de cortesía y límite por host que fetch().
+        Retorna {'status_code', 'html', 'truncado', 'bytes'} (más 'hash', 'etag' y 'last_modified' si hubo HTML);
+        'html' es None si no hubo 200 o el Content-Type no es HTML. Retorna None ante errores de red.
+        Con validadores el GET es condicional y un 304 se marca con 'no_modificada'.
+        timeout es el tope: conexión y lectura se adaptan a la latencia observada del host.
+        """
+        if dead_hosts.is_dead(url):
+            self._stats["dead_host_skips"] += 1
+            return None
+        client = self._get_client()
+        await domain_scheduler.wait(url)
+        async with self._host_slot(url):
+            connect, read = host_latency.timeouts(url, timeout)
+            inicio = time.monotonic()
+            try:
+                headers = encabezados_condicionales(validadores)
+                async with client.stream("GET", url, timeout=httpx.Timeout(read, connect=connect),
+                                         headers=headers) as response:
+                    host_latency.registrar(url, time.monotonic() - inicio)
+                    dead_hosts.record_success(url)
+                    pagina = {'status_code': response.status_code, 'html': None, 'truncado': False, 'bytes': 0}
+                    content_type = response.headers.get('content-type')
+                    if response.status_code == 304 and validadores:
+                        pagina.update(respuesta_no_modificada())
+                    elif response.status_code != 200:
+                        pass
+                    elif not es_contenido_html(content_type):
+                        self._stats["non_html_skipped"] += 1
+                        logger.debug(f"Contenido no HTML ({content_type}) en {url}")
+                    else:
+                        decodificador = DecodificadorHTML(content_type, max_bytes=max_bytes)
+                        async for bloque in response.aiter_bytes(STREAM_CHUNK_SIZE):
+                            if not decodificador.agregar(bloque):
+                                self._stats["truncated"] += 1
+                                break
+                        pagina.update(decodificador.resultado(), **validadores_de_respuesta(response.headers))
+            except httpx.HTTPError as e:
+                if isinstance(e, httpx.TimeoutException):
+                    host_latency.registrar(url, time.monotonic() - inicio)
+                self._registrar_error(url, e, connect_acotado=connect < CONNECT_TIMEOUT_MAX)
+                return None
+        self._stats["fetches"] += 1
+        self._stats["bytes"] += pagina['bytes']
+        return pagina
+
+    def _registrar_error(self, url: str, e: httpx.HTTPError, connect_acotado: bool = False):
+        """
+        Cuenta el error y, si indica host caído (DNS, conexión, TLS), lo registra en la cache negativa.
+        connect_acotado: el connect timeout era menor al normal, así que un ConnectTimeout no prueba nada.
+        """
+        if isinstance(e, httpx.TimeoutException):
+            self._stats["timeouts"] += 1
+        else:
+            self._stats["fetch_errors"] += 1
+            logger.debug(f"Error obteniendo {url}: {e}")
+        if dead_hosts.record_error(url, e, connect_acotado=connect_acotado):
+            self._stats["dead_hosts_detected"] += 1
+
+    async def preresolver(self, urls: List[str]) -> Set[str]:
+        """
+        Resuelve en paralelo los hosts de un lote (calentando la cache de DNS) y retorna los caídos:
+        los que ya estaban en la cache negativa más los que dieron NXDOMAIN ahora.
+        Con un transporte inyectado no se controla el DNS y sólo se consulta la cache negativa.
+        """
+        hosts = {}
+        for url in urls:
+            host = host_de(url)
+            if host and host not in hosts:
+                hosts[host] = 80 if url.startswith('http://') else 443
+        caidos = {h for h in hosts if dead_hosts.is_dead(h)}
+
+        self._get_client()
+        if self._dns is None or not hosts:
+            return caidos
+
+        semaphore = asyncio.Semaphore(SCRAPER_DNS_PRERESOLVE_CONCURRENCY)
+
+        async def resolver(host: str, port: int):
+            async with semaphore:
+                try:
+                    await asyncio.wait_for(self._dns._resolve(host, port), timeout=SCRAPER_DNS_PRERESOLVE_TIMEOUT)
+                except httpcore.ConnectError as e:
+                    if dead_hosts.record_error(host, e):
+                        self._stats["dead_hosts_detected"] += 1
+                        caidos.add(host)
+                except asyncio.TimeoutError:
+                    pass  # Resolver lento no es prueba de host caído: se intenta igual
+
+        await asyncio.gather(*(resolver(h, p) for h, p in hosts.items() if h not in caidos))
+        return caidos
+
+    async def _fetch_robots(self, robots_url: str) -> RespuestaRobots:
+        response = await self.fetch(robots_url, timeout=SCRAPER_ROBOTS_TIMEOUT, polite=False)
+        return None if response is None else (response.status_code, response.text)
+
+    async def check_robots(self, url: str) -> bool:
+        """Verifica robots.txt contra la cache compartida del proceso. Ante errores o sin robots.txt, permite."""
+        return await self.robots.permite(url, self._fetch_robots)
+
+    async def prefetch_robots(self, urls: List[str]) -> int:
+        """Descarga en paralelo los robots.txt de un lote de sitios antes de pedir sus páginas"""
+        if self.cache is not None:
+            # Los sitios ya cacheados no se van a scrapear: no hace falta su robots.txt
+            urls = await asyncio.to_thread(lambda: [u for u in urls if not self.cache.tiene_local(u)])
+        return await self.robots.prefetch(urls, self._fetch_robots)
+
+    async def scrapear(self, url: str, rubro: str = "") -> Dict:
+        """Equivalente asíncrono de scrapear_empresa_b2b (mismo formato de resultado)"""
+        resultado = nuevo_resultado_scraping()
+        if not url:
+            return resultado
+        if not url.startswith('http'):
+            url = 'https://' + url
+
+        if dead_hosts.is_dead(url):
+            self._stats["dead_host_skips"] += 1
+            resultado['host_caido'] = True
+            return resultado
+
+        try:
+            if not await self.check_robots(url):
+                self._stats["robots_blocked"] += 1
+                logger.warning(f"Bloqueado por robots: {url}")
+                resultado['bloqueado'] = True
+                return resultado
+
+            logger.info(f"Scrapeando: {url} | Rubro: {rubro}")
+            pagina, datos = await self._descargar_y_analizar(url, analizar_home, rubro, cobertura=True)
+            if pagina is None:
+                return resultado
+            resultado['http_status'] = pagina['status_code']
+            if datos is None:
+                return resultado
+            resultado['truncado'] = datos['truncado']
+            subpaginas = volcar_datos_pagina(resultado, datos)
+
+            if subpaginas:
+                combinar_contactos(resultado, await self._escanear_subpaginas(subpaginas, resultado))
+
+            recortar_resultado(resultado)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error scraping {url}: {e}")
+
+        return resultado
+
+    async def _fetch_con_cobertura(
+        self, url: str, timeout: float, validadores: Optional[Dict[str, Any]]
+    ) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """
+        fetch_pagina con solicitud de cobertura: si la primera tarda más que el p90 observado del host,
+        se pide la misma página en la variante www/apex (o https si era http) y gana la primera respuesta
+        útil. Retorna (url que respondió, pagina).
+        """
+        alternativa = _variante_de_url(url) if SCRAPER_HEDGE_ENABLED else None
+        if alternativa is None:
+            return url, await self.fetch_pagina(url, timeout=timeout, validadores=validadores)
+
+        async def pedir_alternativa() -> Optional[Dict[str, Any]]:
+            if not await self.check_robots(alternativa):
+                return None
+            return await self.fetch_pagina(alternativa, timeout=timeout)
+
+        primera = asyncio.create_task(self.fetch_pagina(url, timeout=timeout, validadores=validadores))
+        tasks = {primera: url}
+        try:
+            done, _ = await asyncio.wait({primera}, timeout=host_latency.umbral_hedge(url, SCRAPER_HEDGE_AFTER_SECONDS))
+            if not done:
+                self._stats["hedges"] += 1
+                logger.debug(f"Cobertura para {url}: se pide también {alternativa}")
+                tasks[asyncio.create_task(pedir_alternativa())] = alternativa
+            pendientes = set(tasks)
+            while pendientes:
+                done, pendientes = await asyncio.wait(pendientes, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    pagina = task.result()
+                    if pagina is not None and (pagina['html'] is not None or pagina.get('no_modificada')):
+                        if task is not primera:
+                            self._stats["hedges_won"] += 1
+                        return tasks[task], pagina
+            # Ninguna trajo HTML: se informa lo de la original (status code incluido)
+            return url, primera.result()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _descargar_y_analizar(
+        self, url: str, trabajo: Callable[..., Dict], rubro: str = "", timeout: float = SCRAPER_PAGE_TIMEOUT,
+        cobertura: bool = False
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[Dict]]:
+        """
+        Equivalente asíncrono de scraper.descargar_y_analizar: GET condicional si hay validadores
+        guardados y reutilización de lo extraído ante un 304 o el mismo hash. Retorna (pagina, datos).
+        Con cobertura=True la descarga puede resolverse por la variante www/apex de la URL.
+        """
+        previa = await asyncio.to_thread(self.cache.get_pagina, url) if self.cache is not None else None
+        if cobertura:
+            url, pagina = await self._fetch_con_cobertura(url, timeout, previa)
+        else:
+            pagina = await self.fetch_pagina(url, timeout=timeout, validadores=previa)
+        if pagina is None:
+            return None, None
+        datos = self.cache.reutilizar_pagina(previa, pagina) if self.cache is not None else None
+        if datos is not None:
+            return pagina, datos
+        if pagina['html'] is None:
+            return pagina, None
+        datos = await parse_pool.ejecutar_async(trabajo, url, pagina['html'], rubro)
+        datos['truncado'] = pagina['truncado']
+        if self.cache is not None:
+            await asyncio.to_thread(self.cache.put_pagina, url, pagina, datos)
+        return pagina, datos
+
+    async def _escanear_subpaginas(self, urls: List[str], resultado: Dict) -> Dict:
+        """
+        Sub-páginas en paralelo (SUBPAGE_CONCURRENCY por sitio, en orden de relevancia).
+        Apenas hay email y teléfono se cancelan las descargas pendientes.
+        """
+        semaphore = asyncio.Semaphore(SUBPAGE_CONCURRENCY)
+        emails, telefonos = [], []
+        truncado = False
+
+        async def descargar(sub_url: str) -> Optional[Dict]:
+            async with semaphore:
+                logger.info(f"  Escaneando sub-página: {sub_url}")
+                _, datos = await self._descargar_y_analizar(sub_url, analizar_subpagina, timeout=SCRAPER_SUBPAGE_TIMEOUT)
+                return datos
+
+        tasks = [asyncio.create_task(descargar(u)) for u in urls]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                datos = await next_done
+                if not datos:
+                    continue
+                emails.extend(datos['emails'])
+                telefonos.extend(datos['telefonos'])
+                truncado = truncado or datos['truncado']
+                if contactos_completos(resultado['emails'] + emails, resultado['telefonos'] + telefonos):
+                    self._stats["subpage_early_exits"] += 1
+                    break
+        finally:
+            pendientes = [t for t in tasks if not t.done()]
+            for t in pendientes:
+                t.cancel()
+            if pendientes:
+                await asyncio.gather(*pendientes, return_exceptions=True)
+
+        return {'emails': list(set(emails)), 'telefonos': list(set(telefonos)), 'truncado': truncado}
+
+    async def enriquecer(self, empresa: Dict) -> Dict:
+        """Equivalente asíncrono de enriquecer_empresa_b2b, consultando antes la cache por dominio"""
+        website = empresa.get('website')
+        if not website or (empresa.get('email') and empresa.get('telefono')):
+            return empresa
+
+        if self.cache is not None:
+            entry = await asyncio.to_thread(self.cache.get, website)
+            if entry is not None:
+                self._stats["cache_hits"] += 1
+                if entry['status'] == STATUS_SUCCESS:
+                    empresa.update(aplicar_entrada_cache(empresa, entry))
+                return empresa  # Las entradas negativas evitan reintentar sitios caídos o bloqueados
+
+        datos_scraped = await self.scrapear(website, rubro=empresa.get('rubro_key', ''))
+        aplicar_datos_scrapeados(empresa, datos_scraped)
+
+        if self.cache is not None:
+            status = estado_de_resultado(datos_scraped)
+            payload = payload_cacheable(empresa) if status == STATUS_SUCCESS else {}
+            await asyncio.to_thread(self.cache.put, website, payload, status, datos_scraped.get('http_status'))
+        return empresa
+
+    async def aclose(self):
+        """Cierra el cliente (llamar en el shutdown de la app)"""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+        self._client_loop = None
+
+    def stats(self) -> Dict[str, Any]:
+        data = dict(self._stats)
+        data["hosts_tracked"] = len(self._host_slots)
+        data["robots"] = self.robots.stats()
+        data["parse_pool"] = parse_pool.stats()
+        data["latency"] = host_latency.stats()
+        data["dead_hosts"] = dead_hosts.stats()
+        if self._dns is not None:
+            data.update(self._dns.stats())
+        return data
+
+
+def _variante_de_url(url: str) -> Optional[str]:
+    """La otra forma habitual del mismo sitio: https si era http; si no, www <-> dominio sin www"""
+    parsed = urlparse(url)
+    host = parsed.hostname
+    if not host or host.replace('.', '').isdigit():
+        return None
+    if parsed.scheme == 'http':
+        return parsed._replace(scheme='https').geturl()
+    if host.startswith('www.'):
+        otro = host[4:]
+    elif normalizar_dominio(host) == host:
+        otro = 'www.' + host
+    else:
+        return None  # Subdominio propio (tienda.empresa.com): no hay variante obvia
+    netloc = otro if parsed.port is None else f"{otro}:{parsed.port}"
+    return parsed._replace(netloc=netloc).geturl()
+
+
+def _necesita_enriquecimiento(empresa: Dict) -> bool:
+    return bool(empresa.get('website')) and (not empresa.get('email') or not empresa.get('telefono'))
+
+
+async def _enriquecer_por_llegada(
+    empresas: List[Dict],
+    engine: "AsyncScraperEngine",
+    concurrency: int,
+    timeout_por_empresa: float
+) -> AsyncIterator[Tuple[int, Dict]]:
+    """
+    Produce (índice, empresa) a medida que termina cada una; cancela lo pendiente al cerrarse.
+    Las que se quedan sin tiempo (timeout o búsqueda cortada) pasan a la cola diferida.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    diferidas: List[Dict] = []
+
+    async def procesar(idx: int, empresa: Dict) -> Tuple[int, Dict]:
+        async with semaphore:
+            try:
+                return idx, await asyncio.wait_for(engine.enriquecer(empresa), timeout=timeout_por_empresa)
+            except asyncio.TimeoutError:
+                logger.warning(f"Timeout enriqueciendo {empresa.get('nombre', 'Empresa')} ({timeout_por_empresa}s)")
+                diferidas.append(empresa)
+            except Exception as e:
+                logger.error(f"Error enriqueciendo {empresa.get('nombre', 'Empresa')}: {e}")
+            return idx, empresa
+
+    # Etapa de DNS: los hosts caídos (NXDOMAIN o en la cache negativa) se descartan antes de
+    # programar cualquier descarga, y los vivos quedan con el DNS ya resuelto
+    websites = [e['website'] for e in empresas if _necesita_enriquecimiento(e)]
+    caidos = await engine.preresolver(websites) if websites else set()
+    if caidos:
+        logger.info(f"Se descartan {len(caidos)} hosts caídos antes de scrapear")
+
+    # Los robots.txt de todo el lote se piden en paralelo desde el arranque; cada sitio después
+    # se suma a la descarga en vuelo (single-flight) o encuentra la entrada ya cacheada
+    prefetch = asyncio.create_task(engine.prefetch_robots(
+        [w for w in websites if host_de(w) not in caidos]
+    ))
+    tasks = []
+    empresa_de_task: Dict[asyncio.Task, Dict] = {}
+    try:
+        for idx, empresa in enumerate(empresas):
+            if _necesita_enriquecimiento(empresa) and host_de(empresa['website']) not in caidos:
+                task = asyncio.create_task(procesar(idx, empresa))
+                tasks.append(task)
+                empresa_de_task[task] = empresa
+            else:
+                yield idx, empresa
+
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        pendientes = [t for t in tasks + [prefetch] if not t.done()]
+        diferidas.extend(empresa_de_task[t] for t in pendientes if t in empresa_de_task)
+        for t in pendientes:
+            t.cancel()
+        if pendientes:
+            await asyncio.gather(*pendientes, return_exceptions=True)
+        if diferidas:
+            # Escritura local y chica en SQLite: se hace en línea para no depender del loop al cerrar
+            try:
+                encoladas = enrichment_queue.encolar(diferidas, prioridad=PRIORIDAD_INTERACTIVA)
+                logger.info(f"{encoladas} empresas sin terminar pasan al enriquecimiento diferido")
+            except Exception as e:
+                logger.error(f"No se pudieron diferir {len(diferidas)} empresas: {e}")
+
+
+async def enriquecer_empresas_async(
+    empresas: List[Dict],
+    engine: Optional["AsyncScraperEngine"] = None,
+    concurrency: int = SCRAPER_ASYNC_CONCURRENCY,
+    timeout_por_empresa: float = 20
+) -> AsyncIterator[Dict]:
+    """
+    Generador asíncrono que emite cada empresa apenas termina su enriquecimiento.
+    Las que no necesitan scraping se emiten primero. Cerrar el generador (aclose) cancela
+    las descargas pendientes.
+    """
+    engine = engine or async_scraper
+    # aclosing: al cerrar este generador se cierra también el interno (cancela y difiere lo pendiente)
+    async with contextlib.aclosing(_enriquecer_por_llegada(empresas, engine, concurrency, timeout_por_empresa)) as gen:
+        async for _, empresa in gen:
+            yield empresa
+
+
+async def enriquecer_empresas_async_lista(
+    empresas: List[Dict],
+    engine: Optional["AsyncScraperEngine"] = None,
+    concurrency: int = SCRAPER_ASYNC_CONCURRENCY,
+    timeout_por_empresa: float = 20,
+    progress_callback: Optional[Callable[[int, int], None]] = None
+) -> List[Dict]:
+    """Versión que conserva el orden original (reemplazo de enriquecer_empresas_paralelo)"""
+    if not empresas:
+        return []
+    engine = engine or async_scraper
+    resultado = list(empresas)
+    pendientes = {idx for idx, e in enumerate(empresas) if _necesita_enriquecimiento(e)}
+    completadas = 0
+    start_time = time.time()
+
+    async with contextlib.aclosing(_enriquecer_por_llegada(empresas, engine, concurrency, timeout_por_empresa)) as gen:
+        async for idx, empresa in gen:
+            resultado[idx] = empresa
+            if idx in pendientes:
+                completadas += 1
+                if progress_callback:
+                    # El callback puede escribir en la base: se corre fuera del loop
+                    await asyncio.to_thread(progress_callback, completadas, len(pendientes))
+
+    logger.info(f" Fin Scraping async: {len(pendientes)} empresas en {time.time() - start_time:.2f}s")
+    return resultado
+
+
+# Motor compartido por todas las búsquedas del proceso (comparte pool y cache de DNS)
+async_scraper = AsyncScraperEngine()
@@ -0,0 +1,537 @@
+"""
+Benchmark offline del scraping: corpus sintético de sitios de empresas servido localmente.
+
+Genera un corpus determinista de sitios (tamaños variables, sub-páginas de contacto, enlaces
+mailto/tel/WhatsApp, JSON-LD, hosts lentos y caídos), lo sirve con un servidor HTTP local que hace
+de proxy para todos los hosts sintéticos y lo enriquece sin red. Por defecto con el motor asíncrono
+que usan las búsquedas (enriquecer_empresas_async_lista); con --mode threads, con el camino de
+threads (enriquecer_empresas_paralelo) para comparar.
+
+Reporta en JSON (para comparar ramas): leads/s, páginas/s, p50/p95 por lead, tiempo esperando
+red vs parseando, CPU del proceso y de los hijos del pool de parseo, RSS pico y recall de
+emails/teléfonos contra lo que el corpus sabe que hay.
+
+Uso:
+    python -m backend.scraper_benchmark --sites 300 --workers 30 --out bench.json
+    python -m backend.scraper_benchmark --sites 300 --compare bench_main.json
+    python -m backend.scraper_benchmark --sites 300 --mode threads
+
+Variables (o flags equivalentes):
+  BENCH_SITES                cantidad de sitios (default 200)
+  BENCH_SEED                 semilla del corpus (default 7)
+  BENCH_LATENCY_MS           mediana de latencia de los sitios normales (default 60)
+  BENCH_SLOW_FRACTION        fracción de sitios lentos, 1.5-4s por respuesta (default 0.05)
+  BENCH_DEAD_FRACTION        fracción de sitios caídos, conexión rechazada (default 0.05)
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import random
+import subprocess
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from unittest.mock import patch
+from urllib.parse import urlsplit
+
+import httpx
+import requests
+
+try:
+    import resource
+except ImportError:  # Windows: sin métricas de RSS/CPU de hijos
+    resource = None
+
+try:
+    from . import scraper, scraper_async, scraper_parallel
+    from .dead_hosts import dead_hosts
+    from .enrichment_queue import EnrichmentQueue
+    from .host_latency import host_latency
+    from .parse_pool import PARSE_PROCESSES, PoolParseo
+    from .robots_cache import robots_cache
+    from .scraper import ScraperSession
+    from .scraper_async import SCRAPER_ASYNC_CONCURRENCY, AsyncScraperEngine
+    from .scraping_cache import ScrapingCache
+except ImportError:
+    import scraper
+    import scraper_async
+    import scraper_parallel
+    from dead_hosts import dead_hosts
+    from enrichment_queue import EnrichmentQueue
+    from host_latency import host_latency
+    from parse_pool import PARSE_PROCESSES, PoolParseo
+    from robots_cache import robots_cache
+    from scraper import ScraperSession
+    from scraper_async import SCRAPER_ASYNC_CONCURRENCY, AsyncScraperEngine
+    from scraping_cache import ScrapingCache
+
+logger = logging.getLogger(__name__)
+
+BENCH_SITES = int(os.getenv('BENCH_SITES', '200'))
+BENCH_SEED = int(os.getenv('BENCH_SEED', '7'))
+BENCH_LATENCY_MS = float(os.getenv('BENCH_LATENCY_MS', '60'))
+BENCH_SLOW_FRACTION = float(os.getenv('BENCH_SLOW_FRACTION', '0.05'))
+BENCH_DEAD_FRACTION = float(os.getenv('BENCH_DEAD_FRACTION', '0.05'))
+
+MODO_ASYNC = 'async'      # AsyncScraperEngine, el camino de las búsquedas (leads.py)
+MODO_THREADS = 'threads'  # enriquecer_empresas_paralelo, para comparar
+MODOS = (MODO_ASYNC, MODO_THREADS)
+
+TLD_SINTETICO = 'test'  # Reservado (RFC 2606): un dominio registrable distinto por sitio, como en la realidad
+FORMATO_RESULTADOS = 1
+
+# Tipos de sitio sanos y su peso en el corpus (lentos y caídos se asignan aparte)
+_TIPOS = [
+    ('home_mailto', 0.30),   # mailto: y tel: en la home
+    ('subpagina', 0.25),     # la home enlaza /contacto, los datos están ahí
+    ('whatsapp', 0.15),      # wa.me en la home y email en el footer
+    ('jsonld', 0.15),        # sólo JSON-LD (Organization con email, telephone y sameAs)
+    ('sin_contacto', 0.15),  # sin datos: obliga a recorrer todas las sub-páginas
+]
+_PALABRAS = ("servicio calidad clientes empresa soluciones atención entrega productos garantía "
+             "experiencia equipo presupuesto industria proveedores logística zona").split()
+
+
+def _percentil(valores: List[float], q: float) -> float:
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, max(0, math.ceil(q * len(ordenados)) - 1))]
+
+
+class CorpusSintetico:
+    """Sitios deterministas por semilla: host -> {'tipo', 'latencia', 'paginas', 'esperado'}"""
+
+    def __init__(
+        self,
+        sitios: int = BENCH_SITES,
+        seed: int = BENCH_SEED,
+        latency_ms: float = BENCH_LATENCY_MS,
+        slow_fraction: float = BENCH_SLOW_FRACTION,
+        dead_fraction: float = BENCH_DEAD_FRACTION
+    ):
+        self.seed = seed
+        self.latency_ms = latency_ms
+        self.slow_fraction = slow_fraction
+        self.dead_fraction = dead_fraction
+        self.sitios: Dict[str, Dict[str, Any]] = {}
+        self.empresas: List[Dict[str, Any]] = []
+        rng = random.Random(seed)
+        for i in range(sitios):
+            self._generar(i, rng)
+
+    def _relleno(self, rng: random.Random, bytes_objetivo: int) -> str:
+        parrafos, total = [], 0
+        while total < bytes_objetivo:
+            parrafo = '<p>' + ' '.join(rng.choice(_PALABRAS) for _ in range(60)) + '</p>'
+            parrafos.append(parrafo)
+            total += len(parrafo)
+        return '\n'.join(parrafos)
+
+    def _generar(self, i: int, rng: random.Random):
+        sorteo = rng.random()
+        if sorteo < self.dead_fraction:
+            # 127.0.0.N:1 rechaza la conexión al instante, como un host caído real
+            website = f"http://127.0.0.{2 + i % 250}:1/"
+            self.empresas.append({'nombre': f"Caída {i}", 'website': website, '_tipo': 'caido', '_esperado': {}})
+            return
+
+        lento = sorteo < self.dead_fraction + self.slow_fraction
+        tipo = rng.choices([t for t, _ in _TIPOS], weights=[w for _, w in _TIPOS])[0]
+        host = f"empresa{i}.{TLD_SINTETICO}"
+        email, telefono = f"ventas@empresa{i}.com.ar", f"011 4{rng.randint(100, 999)}-{rng.randint(1000, 9999)}"
+        # Tamaños log-normales: la mayoría chicos, algunos de cientos de KB
+        tamano = int(min(1_200_000, rng.lognormvariate(math.log(40_000), 1.0)))
+        relleno = self._relleno(rng, tamano)
+        nav = '<nav><a href="/nosotros">Quiénes somos</a> <a href="/contacto">Contacto</a></nav>'
+        cabecera = f"<title>Empresa {i}</title><meta name=\"description\" content=\"Empresa sintética {i}\">"
+
+        esperado = {'email': email, 'telefono': telefono}
+        cuerpo_home, contacto, extra_head = '', '<p>Escribinos por el formulario.</p>', ''
+        if tipo == 'home_mailto':
+            cuerpo_home = f'<footer><a href="mailto:{email}">{email}</a> <a href="tel:{telefono}">{telefono}</a></footer>'
+        elif tipo == 'subpagina':
+            contacto = f'<p>Email: {email}</p><p>Tel: {telefono}</p>'
+        elif tipo == 'whatsapp':
+            numero = '54911' + str(rng.randint(10_000_000, 99_999_999))
+            esperado['telefono'] = numero
+            cuerpo_home = f'<a href="https://wa.me/{numero}">WhatsApp</a><footer>{email}</footer>'
+        elif tipo == 'jsonld':
+            extra_head = '<script type="application/ld+json">' + json.dumps({
+                '@context': 'https://schema.org', '@type': 'Organization', 'name': f"Empresa {i}",
+                'email': email, 'telephone': telefono,
+                'sameAs': [f"https://www.instagram.com/empresa{i}", f"https://www.linkedin.com/company/empresa{i}"]
+            }) + '</script>'
+        else:
+            esperado = {}
+
+        if lento:
+            latencia = rng.uniform(1.5, 4.0)
+        else:
+            latencia = rng.lognormvariate(math.log(max(self.latency_ms, 1) / 1000), 0.5)
+        self.sitios[host] = {
+            'tipo': 'lento' if lento else tipo,
+            'latencia': latencia,
+            'paginas': {
+                '/': f"<html><head>{cabecera}{extra_head}</head><body>{nav}<main>{relleno}</main>{cuerpo_home}</body></html>",
+                '/contacto': f"<html><head><title>Contacto</title></head><body>{nav}{contacto}</body></html>",
+                '/nosotros': f"<html><head><title>Nosotros</title></head><body>{nav}{self._relleno(rng, 4000)}</body></html>",
+            },
+        }
+        self.empresas.append({'nombre': f"Empresa {i}", 'website': f"http://{host}/",
+                              '_tipo': self.sitios[host]['tipo'], '_esperado': esperado})
+
+
+class _Servidor(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # El scraper corta descargas a propósito (presupuesto de bytes, corte temprano): no es un error
+        pass
+
+
+class ServidorSitios:
+    """Servidor HTTP local que actúa de proxy para los hosts del corpus (sin DNS ni red)"""
+
+    def __init__(self, corpus: CorpusSintetico):
+        self.corpus = corpus
+        self._lock = threading.Lock()
+        self.paginas_servidas = 0
+        self.bytes_servidos = 0
+        servidor = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                partes = urlsplit(self.path)  # Vía proxy la request trae la URL absoluta
+                sitio = servidor.corpus.sitios.get(partes.hostname or '')
+                cuerpo = sitio['paginas'].get(partes.path or '/') if sitio else None
+                if sitio is None or cuerpo is None:
+                    # robots.txt inexistente, páginas desconocidas y hosts ajenos al corpus
+                    self.send_response(404)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                time.sleep(sitio['latencia'])
+                datos = cuerpo.encode('utf-8')
+                with servidor._lock:
+                    servidor.paginas_servidas += 1
+                    servidor.bytes_servidos += len(datos)
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(datos)))
+                self.end_headers()
+                self.wfile.write(datos)
+
+        self._httpd = _Servidor(('127.0.0.1', 0), Handler)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def proxy_url(self) -> str:
+        return f"http://127.0.0.1:{self._httpd.server_address[1]}"
+
+    def proxies(self) -> Dict[str, str]:
+        """Proxy sólo para los hosts del corpus: los caídos (127.0.0.N:1) se conectan directo y fallan"""
+        return {f"http://{host}": self.proxy_url for host in self.corpus.sitios}
+
+    def start(self) -> 'ServidorSitios':
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name='bench-sites', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+class _SesionMedida(ScraperSession):
+    """ScraperSession que acumula el tiempo de pared esperando descargas"""
+
+    def __init__(self, proxies: Dict[str, str], workers: int):
+        super().__init__()
+        self.session.trust_env = False  # Sin proxies del entorno
+        self.session.proxies = proxies
+        # Todo pasa por un único proxy: el pool por host tiene que alcanzar para todos los workers
+        self.session.mount('http://', requests.adapters.HTTPAdapter(pool_maxsize=max(10, workers)))
+        self._lock_medicion = threading.Lock()
+        self.segundos_red = 0.0
+
+    def descargar_pagina(self, *args, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            return super().descargar_pagina(*args, **kwargs)
+        finally:
+            with self._lock_medicion:
+                self.segundos_red += time.perf_counter() - inicio
+
+
+class _TransporteBench(httpx.AsyncBaseTransport):
+    """Los hosts del corpus van por el proxy local; las IPs (sitios caídos) se conectan directo y fallan"""
+
+    def __init__(self, proxy_url: str, max_connections: int):
+        limits = httpx.Limits(max_connections=max_connections)
+        self._proxy = httpx.AsyncHTTPTransport(proxy=proxy_url, limits=limits)
+        self._directo = httpx.AsyncHTTPTransport(limits=limits)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        directo = request.url.host.replace('.', '').isdigit()
+        return await (self._directo if directo else self._proxy).handle_async_request(request)
+
+    async def aclose(self):
+        await self._proxy.aclose()
+        await self._directo.aclose()
+
+
+class _MotorMedido(AsyncScraperEngine):
+    """AsyncScraperEngine que acumula el tiempo esperando descargas y la duración de cada lead"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.segundos_red = 0.0
+        self.duraciones: List[float] = []
+
+    async def fetch_pagina(self, *args, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            return await super().fetch_pagina(*args, **kwargs)
+        finally:
+            self.segundos_red += time.perf_counter() - inicio
+
+    async def enriquecer(self, empresa: Dict) -> Dict:
+        inicio = time.perf_counter()
+        try:
+            return await super().enriquecer(empresa)
+        finally:
+            self.duraciones.append(time.perf_counter() - inicio)
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              timeout=5, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _rusage_mb(who) -> float:
+    if resource is None:
+        return 0.0
+    return round(resource.getrusage(who).ru_maxrss / 1024, 1)  # Linux reporta KB
+
+
+def _cpu_hijos() -> float:
+    if resource is None:
+        return 0.0
+    uso = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return uso.ru_utime + uso.ru_stime
+
+
+def _recall(empresas: List[Dict], originales: List[Dict]) -> Dict[str, Any]:
+    por_tipo: Dict[str, Dict[str, int]] = {}
+    total = {'email_esperados': 0, 'email_encontrados': 0, 'telefono_esperados': 0, 'telefono_encontrados': 0}
+    for empresa, original in zip(empresas, originales):
+        conteo = por_tipo.setdefault(original['_tipo'], {'leads': 0, 'con_email': 0, 'con_telefono': 0})
+        conteo['leads'] += 1
+        conteo['con_email'] += bool(empresa.get('email'))
+        conteo['con_telefono'] += bool(empresa.get('telefono'))
+        for campo in ('email', 'telefono'):
+            esperado = original['_esperado'].get(campo)
+            if not esperado:
+                continue
+            total[f'{campo}_esperados'] += 1
+            digitos = ''.join(c for c in esperado if c.isdigit())
+            obtenido = empresa.get(campo) or ''
+            if obtenido == esperado or (campo == 'telefono' and digitos and digitos in ''.join(c for c in obtenido if c.isdigit())):
+                total[f'{campo}_encontrados'] += 1
+    return {
+        'email_recall': round(total['email_encontrados'] / total['email_esperados'], 3) if total['email_esperados'] else 0.0,
+        'telefono_recall': round(total['telefono_encontrados'] / total['telefono_esperados'], 3)
+        if total['telefono_esperados'] else 0.0,
+        'por_tipo': por_tipo,
+    }
+
+
+def _correr_threads(servidor: ServidorSitios, empresas: List[Dict], cache: ScrapingCache, cola: EnrichmentQueue,
+                    workers: Optional[int], timeout_por_empresa: int) -> Tuple[List[Dict], float, List[float]]:
+    """enriquecer_empresas_paralelo con sesión medida. Retorna (empresas, segundos de red, duración por lead)"""
+    sesion = _SesionMedida(servidor.proxies(), workers or 30)
+    duraciones: List[float] = []
+    lock_duraciones = threading.Lock()
+    scrapear_original = scraper_parallel.scrapear_empresa_b2b
+
+    def scrapear_medido(*args, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            return scrapear_original(*args, **kwargs)
+        finally:
+            with lock_duraciones:
+                duraciones.append(time.perf_counter() - inicio)
+
+    with patch.object(scraper_parallel, 'scraping_cache', cache), \
+         patch.object(scraper_parallel, 'enrichment_queue', cola), \
+         patch.object(scraper_parallel, 'scrapear_empresa_b2b', scrapear_medido):
+        resultado = scraper_parallel.enriquecer_empresas_paralelo(
+            empresas, max_workers=workers, timeout_por_empresa=timeout_por_empresa, session=sesion
+        )
+    return resultado, sesion.segundos_red, duraciones
+
+
+def _correr_async(servidor: ServidorSitios, empresas: List[Dict], cache: ScrapingCache, cola: EnrichmentQueue,
+                  workers: Optional[int], timeout_por_empresa: int) -> Tuple[List[Dict], float, List[float]]:
+    """enriquecer_empresas_async_lista con motor medido. Retorna (empresas, segundos de red, duración por lead)"""
+    concurrencia = workers or SCRAPER_ASYNC_CONCURRENCY
+    motor = _MotorMedido(transport=_TransporteBench(servidor.proxy_url, max(10, concurrencia)), cache=cache)
+
+    async def correr() -> List[Dict]:
+        try:
+            return await scraper_async.enriquecer_empresas_async_lista(
+                empresas, engine=motor, concurrency=concurrencia, timeout_por_empresa=timeout_por_empresa
+            )
+        finally:
+            await motor.aclose()
+            await motor._transport.aclose()
+
+    # NO_PROXY=*: el cliente de httpx no monta los proxies del entorno por encima del transporte
+    with patch.object(scraper_async, 'enrichment_queue', cola), \
+         patch.dict(os.environ, {'NO_PROXY': '*', 'no_proxy': '*'}):
+        resultado = asyncio.run(correr())
+    return resultado, motor.segundos_red, motor.duraciones
+
+
+def ejecutar_benchmark(
+    corpus: CorpusSintetico,
+    workers: Optional[int] = None,
+    timeout_por_empresa: int = 20,
+    parse_processes: int = PARSE_PROCESSES,
+    modo: str = MODO_ASYNC
+) -> Dict[str, Any]:
+    """
+    Enriquece el corpus con estado aislado y retorna las métricas. workers es la concurrencia
+    (empresas en simultáneo en modo async, threads en modo threads).
+    network_wait_seconds y parse_seconds se suman entre leads (pueden superar al tiempo de pared).
+    """
+    if modo not in MODOS:
+        raise ValueError(f"Modo desconocido: {modo} (opciones: {', '.join(MODOS)})")
+    servidor = ServidorSitios(corpus).start()
+    pool = PoolParseo(procesos=parse_processes)
+    correr = _correr_async if modo == MODO_ASYNC else _correr_threads
+
+    for estado in (dead_hosts, robots_cache, host_latency):
+        estado.clear()
+    originales = corpus.empresas
+    empresas = [{k: v for k, v in e.items() if not k.startswith('_')} for e in originales]
+
+    with tempfile.TemporaryDirectory(prefix='scraper-bench-') as tmp:
+        cache = ScrapingCache(path=os.path.join(tmp, 'cache.sqlite3'))
+        cola = EnrichmentQueue(path=os.path.join(tmp, 'cola.sqlite3'), enabled=False)
+        try:
+            with patch.object(scraper, 'parse_pool', pool), patch.object(scraper_async, 'parse_pool', pool):
+                cpu_hijos_inicio = _cpu_hijos()
+                cpu_inicio = time.process_time()
+                inicio = time.perf_counter()
+                resultado, segundos_red, duraciones = correr(
+                    servidor, empresas, cache, cola, workers, timeout_por_empresa
+                )
+                pared = time.perf_counter() - inicio
+                cpu_proceso = time.process_time() - cpu_inicio
+                pool.shutdown()  # Los hijos tienen que terminar para que cuenten en RUSAGE_CHILDREN
+                cpu_hijos = _cpu_hijos() - cpu_hijos_inicio
+        finally:
+            pool.shutdown()
+            servidor.stop()
+            cache.close()
+
+    stats_pool = pool.stats()
+    recall = _recall(resultado, originales)
+    return {
+        'wall_seconds': round(pared, 3),
+        'leads': len(empresas),
+        'leads_per_sec': round(len(empresas) / pared, 2) if pared else 0.0,
+        'pages_served': servidor.paginas_servidas,
+        'pages_per_sec': round(servidor.paginas_servidas / pared, 2) if pared else 0.0,
+        'bytes_served': servidor.bytes_servidos,
+        'lead_p50_seconds': round(_percentil(duraciones, 0.50), 3),
+        'lead_p95_seconds': round(_percentil(duraciones, 0.95), 3),
+        'lead_max_seconds': round(max(duraciones, default=0.0), 3),
+        'network_wait_seconds': round(segundos_red, 3),
+        'parse_seconds': stats_pool['parse_seconds'],
+        'parse_queue_wait_seconds': stats_pool['queue_wait_seconds'],
+        'cpu_process_seconds': round(cpu_proceso, 3),
+        'cpu_parse_children_seconds': round(cpu_hijos, 3),
+        'peak_rss_mb': _rusage_mb(resource.RUSAGE_SELF) if resource else 0.0,
+        'peak_rss_children_mb': _rusage_mb(resource.RUSAGE_CHILDREN) if resource else 0.0,
+        'email_recall': recall['email_recall'],
+        'telefono_recall': recall['telefono_recall'],
+        'por_tipo': recall['por_tipo'],
+    }
+
+
+def armar_reporte(corpus: CorpusSintetico, resultados: Dict[str, Any], **config) -> Dict[str, Any]:
+    return {
+        'format': FORMATO_RESULTADOS,
+        'benchmark': 'scraper',
+        'git_commit': _git_commit(),
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'config': {'sites': len(corpus.empresas), 'seed': corpus.seed, 'latency_ms': corpus.latency_ms,
+                   'slow_fraction': corpus.slow_fraction, 'dead_fraction': corpus.dead_fraction, **config},
+        'results': resultados,
+    }
+
+
+def comparar(base: Dict[str, Any], actual: Dict[str, Any]) -> Dict[str, Dict[str, float]]:
+    """Métricas numéricas de ambos reportes con su cociente actual/base"""
+    comparacion = {}
+    for clave, valor in actual['results'].items():
+        previo = base.get('results', {}).get(clave)
+        if isinstance(valor, (int, float)) and isinstance(previo, (int, float)):
+            comparacion[clave] = {'base': previo, 'actual': valor, 'ratio': round(valor / previo, 3) if previo else None}
+    return comparacion
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark offline del scraping con un corpus sintético")
+    parser.add_argument('--sites', type=int, default=BENCH_SITES)
+    parser.add_argument('--seed', type=int, default=BENCH_SEED)
+    parser.add_argument('--latency-ms', type=float, default=BENCH_LATENCY_MS)
+    parser.add_argument('--slow-fraction', type=float, default=BENCH_SLOW_FRACTION)
+    parser.add_argument('--dead-fraction', type=float, default=BENCH_DEAD_FRACTION)
+    parser.add_argument('--mode', choices=MODOS, default=MODO_ASYNC,
+                        help="async: motor de las búsquedas; threads: enriquecer_empresas_paralelo")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Concurrencia: empresas en simultáneo (async) o threads (threads)")
+    parser.add_argument('--timeout-por-empresa', type=int, default=20)
+    parser.add_argument('--parse-processes', type=int, default=PARSE_PROCESSES, help="0 = parseo en el proceso")
+    parser.add_argument('--out', help="Archivo JSON de resultados (default: stdout)")
+    parser.add_argument('--compare', help="Reporte JSON previo contra el cual comparar")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)  # Los sitios caídos loguean a propósito; la salida es el JSON
+    corpus = CorpusSintetico(args.sites, args.seed, args.latency_ms, args.slow_fraction, args.dead_fraction)
+    resultados = ejecutar_benchmark(corpus, args.workers, args.timeout_por_empresa, args.parse_processes, args.mode)
+    reporte = armar_reporte(corpus, resultados, mode=args.mode, workers=args.workers,
+                            timeout_por_empresa=args.timeout_por_empresa, parse_processes=args.parse_processes)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            reporte['comparison'] = comparar(json.load(f), reporte)
+
+    salida = json.dumps(reporte, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            f.write(salida + '\n')
+    else:
+        print(salida)
+
+
+if __name__ == '__main__':
+    main()
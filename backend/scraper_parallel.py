@@ -1,35 +1,46 @@
 """
 Módulo de scraping paralelo para enriquecimiento masivo de empresas
 Utiliza ThreadPoolExecutor para procesar múltiples sitios web simultáneamente
-con rate limiting y manejo robusto de errores
+con rate limiting y manejo robusto de errores. Los threads sólo hacen I/O: el parseo
+del HTML corre en el pool de procesos de parse_pool.
 """
 
 import logging
 import os
+import threading
 import time
-from collections import defaultdict
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from datetime import datetime, timedelta
-from threading import Lock
 from typing import Dict, List, Optional
-from urllib.parse import urlparse
 
 try:
-    from .scraper import enriquecer_empresa_b2b, ScraperSession
-    from .social_scraper import enriquecer_con_redes_sociales
+    from .scraper import ScraperSession, scrapear_empresa_b2b, aplicar_datos_scrapeados
+    from .politeness import domain_scheduler
+    from .scraping_cache import (
+        scraping_cache, es_vigente, aplicar_entrada_cache, payload_cacheable, estado_de_resultado,
+        STATUS_SUCCESS, STATUS_FAILED
+    )
+    from .enrichment_queue import (
+        enrichment_queue, PRIORIDAD_BACKFILL, PRIORIDAD_INTERACTIVA
+    )
 except ImportError:
-    from scraper import enriquecer_empresa_b2b, ScraperSession
-    from social_scraper import enriquecer_con_redes_sociales
-# from db import guardar_cache_scraping, obtener_cache_scraping, insertar_empresa
+    from scraper import ScraperSession, scrapear_empresa_b2b, aplicar_datos_scrapeados
+    from politeness import domain_scheduler
+    from scraping_cache import (
+        scraping_cache, es_vigente, aplicar_entrada_cache, payload_cacheable, estado_de_resultado,
+        STATUS_SUCCESS, STATUS_FAILED
+    )
+    from enrichment_queue import (
+        enrichment_queue, PRIORIDAD_BACKFILL, PRIORIDAD_INTERACTIVA
+    )
+# from db import insertar_empresa
 
-# Stubs temporales
 def guardar_cache_scraping(website, data, status="success", http_status=None):
-    """Stub temporal - no guarda cache"""
-    return True
+    """Guarda el resultado del scraping del dominio (local + compartida)"""
+    return scraping_cache.put(website, data, status=status, http_status=http_status)
 
 def obtener_cache_scraping(website):
-    """Stub temporal - no retorna cache"""
-    return None
+    """Entrada vigente de la cache para el dominio del sitio, o None"""
+    return scraping_cache.get(website)
 
 def insertar_empresa(empresa):
     """Stub temporal - no guarda empresa"""
@@ -38,24 +49,8 @@ def insertar_empresa(empresa):
 logger = logging.getLogger(__name__)
 
 # Configuración ajustable mediante variables de entorno
-MIN_DELAY_PER_DOMAIN = float(os.getenv('SCRAPER_MIN_DELAY_SECONDS', '0.25'))
-CACHE_TTL_HOURS = int(os.getenv('SCRAPER_CACHE_TTL_HOURS', '168'))  # 7 días por defecto
 SYNC_BATCH_LIMIT = int(os.getenv('SCRAPER_SYNC_LIMIT', '25'))
 ENV_MAX_WORKERS = int(os.getenv('SCRAPER_MAX_WORKERS', '0'))
-DEFERRED_ENABLED = os.getenv('SCRAPER_ENABLE_DEFERRED', '1') == '1'
-DEFERRED_WORKERS = max(1, int(os.getenv('SCRAPER_DEFERRED_WORKERS', '3')))
-
-CACHEABLE_FIELDS = [
-    'email', 'telefono', 'linkedin', 'facebook', 'twitter', 'instagram',
-    'youtube', 'tiktok', 'descripcion', 'horario'
-]
-
-# Locks y estado para rate limiting y cache
-rate_limit_lock = Lock()
-last_request_by_domain: Dict[str, float] = defaultdict(float)
-
-# Executor global para enriquecimiento diferido
-BACKGROUND_EXECUTOR = ThreadPoolExecutor(max_workers=DEFERRED_WORKERS) if DEFERRED_ENABLED else None
 
 
 def _resolver_max_workers(candidatos: int, max_workers: Optional[int]) -> int:
@@ -73,95 +68,74 @@ def _resolver_max_workers(candidatos: int, max_workers: Optional[int]) -> int:
 
 
 def _rate_limited_request(url: Optional[str]):
-    """Aplica rate limiting por dominio"""
-    if not url or MIN_DELAY_PER_DOMAIN <= 0:
+    """Espera el turno de cortesía del dominio (sin bloquear a los demás dominios)"""
+    if not url:
         return
-    
-    try:
-        parsed = urlparse(url)
-        domain = parsed.netloc or "default"
-        if not domain or domain == "default":
-            logger.warning(f"URL inválida para rate limiting: {url}")
-            return
-    except Exception as e:
-        logger.warning(f"Error parseando URL para rate limiting: {url}, error: {e}")
-        return
-    
-    with rate_limit_lock:
-        current_time = time.time()
-        last_time = last_request_by_domain.get(domain, 0)
-        elapsed = current_time - last_time
-        
-        if elapsed < MIN_DELAY_PER_DOMAIN:
-            time.sleep(MIN_DELAY_PER_DOMAIN - elapsed)
-        
-        last_request_by_domain[domain] = time.time()
+    domain_scheduler.wait_sync(url)
 
 
 def _cache_es_valida(cache_entry: Dict) -> bool:
-    """Determina si una entrada de cache está vigente"""
-    if not cache_entry or not cache_entry.get('last_scraped_at'):
-        return False
-    
-    try:
-        last_time = datetime.fromisoformat(cache_entry['last_scraped_at'])
-    except ValueError:
-        return False
-    
-    return datetime.utcnow() - last_time <= timedelta(hours=CACHE_TTL_HOURS)
+    """Determina si una entrada de cache está vigente (las negativas vencen antes)"""
+    return es_vigente(cache_entry)
 
 
 def _aplicar_cache_a_empresa(empresa: Dict, cache_entry: Dict) -> Dict:
     """Fusiona datos cacheados en la empresa"""
-    empresa_actualizada = empresa.copy()
-    datos_cache = cache_entry.get('data') or {}
-    
-    for campo, valor in datos_cache.items():
-        if valor:
-            empresa_actualizada[campo] = valor
-    
-    return empresa_actualizada
+    return aplicar_entrada_cache(empresa, cache_entry)
 
 
-def _guardar_cache_para_empresa(empresa: Dict):
-    """Persiste en cache los campos relevantes"""
+def _guardar_cache_para_empresa(empresa: Dict, status: str = STATUS_SUCCESS):
+    """Persiste en cache los campos relevantes (o una entrada negativa si el sitio falló)"""
     website = empresa.get('website')
     if not website:
         return
     
-    cache_payload = {
-        campo: empresa.get(campo)
-        for campo in CACHEABLE_FIELDS
-        if empresa.get(campo)
-    }
-    
-    if cache_payload:
-        guardar_cache_scraping(website, cache_payload)
+    cache_payload = payload_cacheable(empresa) if status == STATUS_SUCCESS else {}
+    if cache_payload or status != STATUS_SUCCESS:
+        guardar_cache_scraping(website, cache_payload, status=status)
 
 
-def _programar_enriquecimiento_diferido(empresas: List[Dict]):
-    """Encola empresas para enriquecimiento en background"""
-    if not DEFERRED_ENABLED or not BACKGROUND_EXECUTOR or not empresas:
-        return
-    
+def _programar_enriquecimiento_diferido(empresas: List[Dict], prioridad: int = PRIORIDAD_BACKFILL) -> int:
+    """Encola empresas para enriquecimiento en background (cola persistente, una por dominio)"""
     if not isinstance(empresas, list):
         logger.error(f"empresas debe ser una lista en _programar_enriquecimiento_diferido")
-        return
-    
-    for empresa in empresas:
-        if not isinstance(empresa, dict):
-            logger.warning(f"Empresa inválida en enriquecimiento diferido: {type(empresa)}")
-            continue
+        return 0
     try:
-        BACKGROUND_EXECUTOR.submit(
-            _enriquecer_empresa_individual,
-            empresa,
-            usar_cache=True,
-            guardar_en_cache=True,
-            guardar_en_db=True
-        )
+        return enrichment_queue.encolar(empresas, prioridad=prioridad)
     except Exception as e:
-        logger.error(f"Error encolando empresa para enriquecimiento diferido: {e}")
+        logger.error(f"Error encolando empresas para enriquecimiento diferido: {e}")
+        return 0
+
+
+_sesion_diferida: Optional[ScraperSession] = None
+_sesion_diferida_lock = threading.Lock()  # Los workers de la cola la crean en paralelo
+
+def procesar_job_diferido(empresa: Dict) -> bool:
+    """
+    Handler de la cola diferida. True cierra el job (sitio resuelto o bloqueado por robots);
+    False lo reprograma con backoff (sitio caído o con error).
+    """
+    global _sesion_diferida
+    website = empresa.get('website')
+    if not website:
+        return True
+    
+    cache_entry = obtener_cache_scraping(website)
+    if _cache_es_valida(cache_entry):
+        # Ya resuelto por otra búsqueda; una entrada negativa vigente se reintenta cuando venza
+        return cache_entry.get('status') != STATUS_FAILED
+    
+    if _sesion_diferida is None:
+        with _sesion_diferida_lock:
+            if _sesion_diferida is None:
+                _sesion_diferida = ScraperSession(cache=scraping_cache)
+    datos_scraped = scrapear_empresa_b2b(website, _sesion_diferida, rubro=empresa.get('rubro_key', ''))
+    status = estado_de_resultado(datos_scraped)
+    empresa_enriquecida = aplicar_datos_scrapeados(dict(empresa), datos_scraped)
+    _guardar_cache_para_empresa(empresa_enriquecida, status=status)
+    if status == STATUS_SUCCESS:
+        insertar_empresa(empresa_enriquecida)
+    return status != STATUS_FAILED
 
 
 def enriquecer_empresas_paralelo(
@@ -173,6 +147,8 @@ def enriquecer_empresas_paralelo(
 ) -> List[Dict]:
     """
     Enriquece múltiples empresas con paralelismo optimizado y conexión persistente via ScraperSession.
+    Cada empresa tiene a lo sumo timeout_por_empresa segundos desde que un worker la toma; las que
+    se quedan sin tiempo conservan sus datos originales y pasan a la cola diferida.
     """
     if not empresas:
         return []
@@ -190,7 +166,13 @@ def enriquecer_empresas_paralelo(
     
     # Usar sesión provista o crear una nueva para pooling
     if not session:
-        session = ScraperSession()
+        session = ScraperSession(cache=scraping_cache)
+    
+    # Los robots.txt del lote se descargan en paralelo mientras arrancan los workers
+    # (salvo los de sitios que ya están en cache y no se van a scrapear)
+    session.prefetch_robots([
+        empresa['website'] for _, empresa in pendientes if not scraping_cache.tiene_local(empresa['website'])
+    ])
     
     empresas_enriquecidas = list(empresas)
     start_time = time.time()
@@ -198,7 +180,10 @@ def enriquecer_empresas_paralelo(
     
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
         future_to_idx = {
-            executor.submit(_enriquecer_empresa_individual, empresa, usar_cache=True, session=session): idx
+            executor.submit(
+                _enriquecer_empresa_individual, empresa, usar_cache=True, session=session,
+                timeout_por_empresa=timeout_por_empresa
+            ): idx
             for idx, empresa in pendientes
         }
         
@@ -223,21 +208,41 @@ def _enriquecer_empresa_individual(
     usar_cache: bool = True,
     guardar_en_cache: bool = True,
     guardar_en_db: bool = False,
-    session: Optional[ScraperSession] = None
+    session: Optional[ScraperSession] = None,
+    timeout_por_empresa: Optional[float] = None
 ) -> Dict:
-    """Refactorizado para usar ScraperSession opcional"""
-    if not session: session = ScraperSession()
+    """Enriquece una empresa consultando primero la cache por dominio (sin I/O de red si hay hit)"""
     nombre = empresa.get('nombre', 'Empresa')
     
     try:
         website = empresa.get('website')
         if not website: return empresa
         
-        # Cache check omitida para brevedad pero idealmente integrada con session
+        if empresa.get('email') and empresa.get('telefono'):
+            return empresa
+        
+        if usar_cache:
+            cache_entry = obtener_cache_scraping(website)
+            if _cache_es_valida(cache_entry):
+                if cache_entry.get('status') != STATUS_SUCCESS:
+                    # Cache negativa: el sitio falló o está bloqueado por robots hace poco
+                    return empresa
+                return _aplicar_cache_a_empresa(empresa, cache_entry)
         
-        empresa_enriquecida = enriquecer_empresa_b2b(empresa, session=session)
+        if not session: session = ScraperSession(cache=scraping_cache)
+        deadline = time.monotonic() + timeout_por_empresa if timeout_por_empresa else None
+        datos_scraped = scrapear_empresa_b2b(website, session, rubro=empresa.get('rubro_key', ''), deadline=deadline)
+        if datos_scraped.get('plazo_vencido'):
+            # Sin tiempo no es lo mismo que sitio caído: no se cachea como negativo, se reintenta en background
+            logger.warning(f"Timeout enriqueciendo {nombre} ({timeout_por_empresa}s)")
+            _programar_enriquecimiento_diferido([empresa], prioridad=PRIORIDAD_INTERACTIVA)
+            return empresa
+        empresa_enriquecida = aplicar_datos_scrapeados(empresa, datos_scraped)
         # Redes sociales (opcional, igual usando session si enrichment lo soporta)
         
+        if guardar_en_cache:
+            _guardar_cache_para_empresa(empresa_enriquecida, status=estado_de_resultado(datos_scraped))
+        
         if guardar_en_db:
             insertar_empresa(empresa_enriquecida)
             
@@ -245,4 +250,3 @@ def _enriquecer_empresa_individual(
     except Exception as e:
         logger.error(f"Error enriqueciendo {nombre}: {e}")
         return empresa
-
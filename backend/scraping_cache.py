@@ -0,0 +1,487 @@
+"""
+Cache persistente de resultados de scraping, indexada por dominio registrable (clave_cache).
+En plataformas donde cada negocio es una ruta del mismo host (sites.google.com/view/x,
+linktr.ee/x, facebook.com/x) la clave incluye esa ruta, para no mezclar datos de empresas distintas.
+
+Dos niveles:
+  - local: SQLite embebido (rápido, por instancia), acotado por cantidad y tamaño con desalojo LRU
+  - compartido: tabla scraping_cache en Supabase, consultada sólo ante un miss local
+Los sitios caídos o bloqueados por robots se guardan como entradas negativas con un TTL
+más corto, para no volver a intentarlos en cada búsqueda.
+
+Además, por cada página descargada se guardan sus validadores (ETag, Last-Modified, hash del
+contenido) junto con lo extraído de ella. Sobreviven al TTL del dominio: al re-scrapear se pide
+la página de forma condicional y, ante un 304 o el mismo hash, se reutiliza lo extraído sin parsear.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import time
+from datetime import datetime, timezone
+from threading import Lock
+from typing import Any, Callable, Dict, Optional
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+CACHE_TTL_HOURS = int(os.getenv('SCRAPER_CACHE_TTL_HOURS', '168'))  # 7 días por defecto
+NEGATIVE_CACHE_TTL_HOURS = float(os.getenv('SCRAPER_NEGATIVE_CACHE_TTL_HOURS', '24'))
+CACHE_MAX_ENTRIES = max(100, int(os.getenv('SCRAPER_CACHE_MAX_ENTRIES', '50000')))
+CACHE_MAX_MB = max(1, int(os.getenv('SCRAPER_CACHE_MAX_MB', '256')))
+
+CACHEABLE_FIELDS = [
+    'email', 'telefono', 'linkedin', 'facebook', 'twitter', 'instagram',
+    'youtube', 'tiktok', 'descripcion', 'horario',
+    'website_title', 'website_description', 'website_content'
+]
+
+STATUS_SUCCESS = 'success'
+STATUS_FAILED = 'failed'
+STATUS_BLOCKED = 'blocked'
+
+# Segundos niveles genéricos bajo un ccTLD (com.ar, gob.ar, co.uk, com.br...)
+_SEGUNDO_NIVEL_GENERICO = {'com', 'net', 'org', 'gob', 'gov', 'edu', 'co', 'ac', 'mil', 'int', 'nom', 'tur'}
+
+# Plataformas donde cada subdominio es un negocio distinto (se comportan como sufijo público)
+_SUFIJOS_DE_HOSTING = {
+    'wixsite.com', 'blogspot.com', 'wordpress.com', 'business.site', 'negocio.site',
+    'github.io', 'netlify.app', 'vercel.app', 'mitiendanube.com', 'mercadoshops.com.ar'
+}
+
+# Plataformas donde cada negocio es una ruta del mismo host; la clave sigue hasta el primer
+# segmento que identifica al negocio, salteando los genéricos (/view/, /company/, /pages/...)
+_PLATAFORMAS_POR_RUTA = {
+    'sites.google.com', 'linktr.ee', 'facebook.com', 'instagram.com', 'linkedin.com', 'twitter.com',
+    'x.com', 'tiktok.com', 'youtube.com', 'wa.me', 'taplink.cc', 'beacons.ai', 'bio.link', 'linkin.bio'
+}
+_SEGMENTOS_GENERICOS = {'view', 'company', 'pages', 'pg', 'channel', 'c', 'user', 'in', 'p', 'groups', 'people'}
+
+_DEFAULT_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data')
+
+
+def normalizar_dominio(url: Optional[str]) -> Optional[str]:
+    """'https://WWW.Sucursal.Empresa.com.ar:443/contacto' -> 'empresa.com.ar'"""
+    if not url:
+        return None
+    url = url.strip()
+    if '://' not in url:
+        url = 'https://' + url
+    try:
+        host = (urlparse(url).hostname or '').lower().rstrip('.')
+    except ValueError:
+        return None
+    if not host or '.' not in host:
+        return None
+    if host.replace('.', '').isdigit():
+        return host  # IP literal
+
+    labels = host.split('.')
+    for n in (3, 2):
+        if len(labels) > n and '.'.join(labels[-n:]) in _SUFIJOS_DE_HOSTING:
+            return '.'.join(labels[-(n + 1):])
+    if len(labels) >= 3 and len(labels[-1]) == 2 and labels[-2] in _SEGUNDO_NIVEL_GENERICO:
+        return '.'.join(labels[-3:])
+    return '.'.join(labels[-2:])
+
+
+def clave_cache(url: Optional[str]) -> Optional[str]:
+    """
+    Clave de la cache y de la cola diferida para el sitio de una empresa: el dominio registrable, o
+    en plataformas por ruta el host más la ruta del negocio ('sites.google.com/view/ferreteria').
+    None si no identifica a un negocio (la raíz de una plataforma): no se cachea.
+    """
+    domain = normalizar_dominio(url)
+    if not domain:
+        return None
+    url = url.strip()
+    if '://' not in url:
+        url = 'https://' + url
+    try:
+        parsed = urlparse(url)
+    except ValueError:
+        return None
+    host = (parsed.hostname or '').lower().rstrip('.')
+    for prefijo in ('www.', 'm.', 'mobile.'):
+        if host.startswith(prefijo):
+            host = host[len(prefijo):]
+            break
+    if host not in _PLATAFORMAS_POR_RUTA:
+        return domain
+
+    segmentos = []
+    for segmento in (s for s in parsed.path.lower().split('/') if s):
+        segmentos.append(segmento)
+        if segmento not in _SEGMENTOS_GENERICOS:
+            return host + '/' + '/'.join(segmentos)
+    return None
+
+
+def encabezados_condicionales(previa: Optional[Dict[str, Any]]) -> Dict[str, str]:
+    """If-None-Match / If-Modified-Since a partir de los validadores guardados de la página"""
+    headers = {}
+    if previa:
+        if previa.get('etag'):
+            headers['If-None-Match'] = previa['etag']
+        if previa.get('last_modified'):
+            headers['If-Modified-Since'] = previa['last_modified']
+    return headers
+
+
+def es_vigente(entry: Optional[Dict[str, Any]], ttl_hours: float = CACHE_TTL_HOURS,
+               negative_ttl_hours: float = NEGATIVE_CACHE_TTL_HOURS) -> bool:
+    """Una entrada es válida si no venció su TTL (más corto para las negativas)"""
+    if not entry or not entry.get('last_scraped_at'):
+        return False
+    try:
+        last_time = datetime.fromisoformat(entry['last_scraped_at'])
+    except (TypeError, ValueError):
+        return False
+    if last_time.tzinfo is None:
+        last_time = last_time.replace(tzinfo=timezone.utc)
+    ttl = ttl_hours if entry.get('status', STATUS_SUCCESS) == STATUS_SUCCESS else negative_ttl_hours
+    return (datetime.now(timezone.utc) - last_time).total_seconds() <= ttl * 3600
+
+
+def estado_de_resultado(datos_scraped: Dict[str, Any]) -> str:
+    """Estado a cachear según el resultado de scrapear_empresa_b2b"""
+    if datos_scraped.get('bloqueado'):
+        return STATUS_BLOCKED
+    return STATUS_SUCCESS if datos_scraped.get('exito') else STATUS_FAILED
+
+
+def payload_cacheable(empresa: Dict[str, Any]) -> Dict[str, Any]:
+    return {campo: empresa.get(campo) for campo in CACHEABLE_FIELDS if empresa.get(campo)}
+
+
+def aplicar_entrada_cache(empresa: Dict[str, Any], entry: Dict[str, Any]) -> Dict[str, Any]:
+    """Fusiona datos cacheados en una copia de la empresa (email/teléfono propios no se pisan)"""
+    empresa_actualizada = empresa.copy()
+    for campo, valor in (entry.get('data') or {}).items():
+        if not valor or (campo in ('email', 'telefono') and empresa.get(campo)):
+            continue
+        empresa_actualizada[campo] = valor
+    return empresa_actualizada
+
+
+class ScrapingCache:
+    """Cache de dos niveles (SQLite local + tabla compartida) de datos scrapeados por dominio"""
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        ttl_hours: float = CACHE_TTL_HOURS,
+        negative_ttl_hours: float = NEGATIVE_CACHE_TTL_HOURS,
+        max_entries: int = CACHE_MAX_ENTRIES,
+        max_bytes: int = CACHE_MAX_MB * 1024 * 1024,
+        remote_get: Optional[Callable[[str], Optional[Dict[str, Any]]]] = None,
+        remote_put: Optional[Callable[..., bool]] = None
+    ):
+        self.path = path or os.getenv('SCRAPER_CACHE_PATH') or os.path.join(_DEFAULT_DATA_DIR, 'scraping_cache.sqlite3')
+        self.ttl_hours = ttl_hours
+        self.negative_ttl_hours = negative_ttl_hours
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._remote_get = remote_get
+        self._remote_put = remote_put
+        self._lock = Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.negative_hits = 0
+        self.remote_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.pages_not_modified = 0
+        self.pages_unchanged = 0
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        if self._conn is not None:
+            return self._conn
+        for path in (self.path, os.path.join('/tmp/b2b_data', os.path.basename(self.path))):
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+                conn = sqlite3.connect(path, check_same_thread=False)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS scraping_cache (
+                        domain TEXT PRIMARY KEY,
+                        status TEXT NOT NULL,
+                        data TEXT NOT NULL,
+                        http_status INTEGER,
+                        last_scraped_at TEXT NOT NULL,
+                        size_bytes INTEGER NOT NULL,
+                        last_access REAL NOT NULL
+                    )
+                """)
+                conn.execute("CREATE INDEX IF NOT EXISTS scraping_cache_last_access ON scraping_cache (last_access)")
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS page_validators (
+                        url TEXT PRIMARY KEY,
+                        domain TEXT NOT NULL,
+                        etag TEXT,
+                        last_modified TEXT,
+                        content_hash TEXT NOT NULL,
+                        data TEXT NOT NULL,
+                        size_bytes INTEGER NOT NULL,
+                        updated_at REAL NOT NULL
+                    )
+                """)
+                conn.execute("CREATE INDEX IF NOT EXISTS page_validators_domain ON page_validators (domain)")
+                conn.commit()
+                self._conn = conn
+                self.path = path
+                return conn
+            except (OSError, sqlite3.Error) as e:
+                logger.warning(f"No se pudo abrir la cache de scraping en {path}: {e}")
+        return None
+
+    def _vigente(self, entry: Optional[Dict[str, Any]]) -> bool:
+        return es_vigente(entry, self.ttl_hours, self.negative_ttl_hours)
+
+    def _get_local(self, domain: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            conn = self._connect()
+            if not conn:
+                return None
+            try:
+                row = conn.execute(
+                    "SELECT status, data, http_status, last_scraped_at FROM scraping_cache WHERE domain = ?", (domain,)
+                ).fetchone()
+                if row:
+                    conn.execute("UPDATE scraping_cache SET last_access = ? WHERE domain = ?", (time.time(), domain))
+                    conn.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Error leyendo cache de scraping para {domain}: {e}")
+                return None
+        if not row:
+            return None
+        return {
+            'domain': domain, 'status': row[0], 'data': json.loads(row[1]),
+            'http_status': row[2], 'last_scraped_at': row[3]
+        }
+
+    def _put_local(self, entry: Dict[str, Any]):
+        data = json.dumps(entry.get('data') or {}, ensure_ascii=False)
+        size = len(data.encode('utf-8'))
+        with self._lock:
+            conn = self._connect()
+            if not conn:
+                return
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO scraping_cache "
+                    "(domain, status, data, http_status, last_scraped_at, size_bytes, last_access) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (entry['domain'], entry['status'], data, entry.get('http_status'), entry['last_scraped_at'], size, time.time())
+                )
+                self._evict(conn)
+                conn.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Error guardando cache de scraping para {entry['domain']}: {e}")
+
+    def _evict(self, conn: sqlite3.Connection):
+        """Desaloja las entradas menos usadas hasta volver a los límites (con el lock tomado)"""
+        count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM scraping_cache").fetchone()
+        total += conn.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM page_validators").fetchone()[0]
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        # Primero los validadores de páginas cuyo dominio ya no está
+        total -= conn.execute(
+            "SELECT COALESCE(SUM(size_bytes), 0) FROM page_validators WHERE domain NOT IN (SELECT domain FROM scraping_cache)"
+        ).fetchone()[0]
+        conn.execute("DELETE FROM page_validators WHERE domain NOT IN (SELECT domain FROM scraping_cache)")
+        # Desalojar de a bloques (10% extra) para no hacerlo en cada escritura
+        target_count = int(self.max_entries * 0.9)
+        target_bytes = int(self.max_bytes * 0.9)
+        removed = 0
+        for domain, size in conn.execute("SELECT domain, size_bytes FROM scraping_cache ORDER BY last_access ASC").fetchall():
+            if count <= target_count and total <= target_bytes:
+                break
+            conn.execute("DELETE FROM scraping_cache WHERE domain = ?", (domain,))
+            size += conn.execute(
+                "SELECT COALESCE(SUM(size_bytes), 0) FROM page_validators WHERE domain = ?", (domain,)
+            ).fetchone()[0]
+            conn.execute("DELETE FROM page_validators WHERE domain = ?", (domain,))
+            count -= 1
+            total -= size
+            removed += 1
+        self.evictions += removed
+
+    # --- Validadores por página (revalidación condicional) ---
+
+    def get_pagina(self, url: str) -> Optional[Dict[str, Any]]:
+        """Validadores y datos extraídos de la última descarga de la página: {'etag', 'last_modified', 'content_hash', 'data'}"""
+        with self._lock:
+            conn = self._connect()
+            if not conn:
+                return None
+            try:
+                row = conn.execute(
+                    "SELECT etag, last_modified, content_hash, data FROM page_validators WHERE url = ?", (url,)
+                ).fetchone()
+            except sqlite3.Error as e:
+                logger.error(f"Error leyendo validadores de {url}: {e}")
+                return None
+        if not row:
+            return None
+        return {'etag': row[0], 'last_modified': row[1], 'content_hash': row[2], 'data': json.loads(row[3])}
+
+    def put_pagina(self, url: str, pagina: Dict[str, Any], datos: Dict[str, Any]):
+        """Guarda los validadores de una descarga completa (200 con HTML) junto con lo extraído"""
+        domain = clave_cache(url)
+        if not domain or not pagina.get('hash'):
+            return
+        data = json.dumps(datos, ensure_ascii=False)
+        with self._lock:
+            conn = self._connect()
+            if not conn:
+                return
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO page_validators "
+                    "(url, domain, etag, last_modified, content_hash, data, size_bytes, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (url, domain, pagina.get('etag'), pagina.get('last_modified'), pagina['hash'], data,
+                     len(data.encode('utf-8')), time.time())
+                )
+                conn.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Error guardando validadores de {url}: {e}")
+
+    def reutilizar_pagina(self, previa: Optional[Dict[str, Any]], pagina: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Lo extraído la vez anterior si la página no cambió (304 o mismo hash); None si hay que parsear"""
+        if not previa:
+            return None
+        if pagina.get('no_modificada'):
+            self.pages_not_modified += 1
+            return dict(previa['data'])
+        if pagina.get('hash') and pagina['hash'] == previa['content_hash']:
+            self.pages_unchanged += 1
+            return dict(previa['data'])
+        return None
+
+    def tiene_local(self, website: Optional[str]) -> bool:
+        """Si hay entrada vigente en el tier local, sin tocar recencia ni contadores (para planificar descargas)"""
+        domain = clave_cache(website)
+        if not domain:
+            return False
+        with self._lock:
+            conn = self._connect()
+            if not conn:
+                return False
+            try:
+                row = conn.execute(
+                    "SELECT status, last_scraped_at FROM scraping_cache WHERE domain = ?", (domain,)
+                ).fetchone()
+            except sqlite3.Error:
+                return False
+        return bool(row) and self._vigente({'status': row[0], 'last_scraped_at': row[1]})
+
+    def get(self, website: Optional[str]) -> Optional[Dict[str, Any]]:
+        """
+        Entrada vigente para el dominio del sitio, o None.
+        Formato: {'domain', 'status', 'data', 'http_status', 'last_scraped_at'}
+        """
+        domain = clave_cache(website)
+        if not domain:
+            return None
+
+        entry = self._get_local(domain)
+        if not self._vigente(entry) and self._remote_get is not None:
+            try:
+                remote = self._remote_get(domain)
+            except Exception as e:
+                logger.warning(f"Error consultando cache compartida de scraping para {domain}: {e}")
+                remote = None
+            if self._vigente(remote):
+                entry = remote
+                entry['domain'] = domain
+                self._put_local(entry)
+                self.remote_hits += 1
+
+        if not self._vigente(entry):
+            self.misses += 1
+            return None
+        if entry['status'] == STATUS_SUCCESS:
+            self.hits += 1
+        else:
+            self.negative_hits += 1
+        return entry
+
+    def put(self, website: Optional[str], data: Optional[Dict[str, Any]], status: str = STATUS_SUCCESS,
+            http_status: Optional[int] = None) -> bool:
+        domain = clave_cache(website)
+        if not domain:
+            return False
+        entry = {
+            'domain': domain,
+            'status': status,
+            'data': data or {},
+            'http_status': http_status,
+            'last_scraped_at': datetime.now(timezone.utc).isoformat()
+        }
+        self._put_local(entry)
+        if self._remote_put is not None:
+            try:
+                self._remote_put(domain, entry['data'], status=status, http_status=http_status,
+                                 last_scraped_at=entry['last_scraped_at'])
+            except Exception as e:
+                logger.warning(f"Error guardando cache compartida de scraping para {domain}: {e}")
+        return True
+
+    def purge_expired(self) -> int:
+        """Elimina entradas vencidas del nivel local. Retorna la cantidad eliminada."""
+        now = datetime.now(timezone.utc).timestamp()
+        ok_limit = datetime.fromtimestamp(now - self.ttl_hours * 3600, timezone.utc).isoformat()
+        neg_limit = datetime.fromtimestamp(now - self.negative_ttl_hours * 3600, timezone.utc).isoformat()
+        with self._lock:
+            conn = self._connect()
+            if not conn:
+                return 0
+            try:
+                cur = conn.execute(
+                    "DELETE FROM scraping_cache WHERE (status = ? AND last_scraped_at < ?) OR (status != ? AND last_scraped_at < ?)",
+                    (STATUS_SUCCESS, ok_limit, STATUS_SUCCESS, neg_limit)
+                )
+                conn.commit()
+                return cur.rowcount
+            except sqlite3.Error as e:
+                logger.error(f"Error purgando cache de scraping: {e}")
+                return 0
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.negative_hits + self.misses
+        return {
+            "path": self.path,
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "remote_hits": self.remote_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "pages_not_modified": self.pages_not_modified,
+            "pages_unchanged": self.pages_unchanged,
+            "hit_ratio": round((self.hits + self.negative_hits) / total, 3) if total else 0.0
+        }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def _cache_compartida_habilitada() -> bool:
+    return os.getenv('SCRAPER_SHARED_CACHE', '1') == '1'
+
+
+def _crear_cache_por_defecto() -> ScrapingCache:
+    if not _cache_compartida_habilitada():
+        return ScrapingCache()
+    try:
+        from .db_supabase import get_scraping_cache_entry, upsert_scraping_cache_entry
+    except ImportError:
+        from db_supabase import get_scraping_cache_entry, upsert_scraping_cache_entry
+    return ScrapingCache(remote_get=get_scraping_cache_entry, remote_put=upsert_scraping_cache_entry)
+
+
+# Cache compartida por el scraper sincrónico y el asíncrono
+scraping_cache = _crear_cache_por_defecto()
@@ -0,0 +1,172 @@
+"""
+Cache en memoria con expiración (TTL) y desalojo LRU para resultados de búsquedas.
+Limita la cantidad de entradas y el tamaño aproximado en bytes, y expone contadores
+de hits/misses/desalojos para monitoreo.
+"""
+
+import json
+import logging
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def _estimar_bytes(value: Any) -> int:
+    """Estima el tamaño de un valor serializable (aproximación vía JSON)"""
+    try:
+        return len(json.dumps(value, ensure_ascii=False, default=str).encode('utf-8'))
+    except (TypeError, ValueError):
+        return len(repr(value))
+
+
+def normalizar_query(query: Optional[str]) -> str:
+    """Minúsculas y espacios colapsados para que variantes triviales compartan entrada"""
+    return ' '.join((query or '').lower().split())
+
+
+def _cuantizar(valor: Optional[float], decimales: int = 4) -> Optional[float]:
+    """Redondea coordenadas (4 decimales ~ 11m) para no fragmentar el cache"""
+    if valor is None:
+        return None
+    return round(float(valor), decimales)
+
+
+def build_search_cache_key(
+    query: str,
+    lat: Optional[float] = None,
+    lng: Optional[float] = None,
+    radius: Optional[float] = None,
+    bbox: Optional[Dict[str, float]] = None,
+    page_token: Optional[str] = None,
+    field_mask: str = ""
+) -> Tuple:
+    """
+    Construye la clave normalizada del cache de búsquedas:
+    (query, lat, lng, radio, bbox, page_token, field_mask)
+    """
+    bbox_key = None
+    if bbox and isinstance(bbox, dict):
+        bbox_key = tuple(_cuantizar(bbox.get(k)) for k in ("south", "west", "north", "east"))
+
+    radius_key = int(round(float(radius))) if radius else None
+
+    return (
+        normalizar_query(query),
+        _cuantizar(lat),
+        _cuantizar(lng),
+        radius_key,
+        bbox_key,
+        page_token or None,
+        field_mask
+    )
+
+
+class TTLLRUCache:
+    """
+    Cache acotado por cantidad de entradas y bytes, con TTL por entrada y desalojo LRU.
+    Thread-safe: puede usarse desde el event loop y desde workers en threads.
+    """
+
+    def __init__(self, max_entries: int = 1000, max_bytes: int = 50 * 1024 * 1024, ttl_seconds: float = 3600):
+        self.max_entries = max(1, max_entries)
+        self.max_bytes = max(1, max_bytes)
+        self.ttl_seconds = ttl_seconds
+        self._data: "OrderedDict[Any, Tuple[Any, float, int]]" = OrderedDict()
+        self._lock = Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Any) -> Optional[Any]:
+        """Retorna el valor vigente o None. Marca la entrada como usada recientemente."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, expires_at, size = entry
+            if time.time() >= expires_at:
+                self._remove(key, size)
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Any, value: Any, ttl_seconds: Optional[float] = None):
+        """Guarda un valor, desalojando las entradas menos usadas si se superan los límites"""
+        size = _estimar_bytes(value)
+        if size > self.max_bytes:
+            logger.debug(f"Valor de {size} bytes excede el límite del cache, no se guarda")
+            return
+
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        with self._lock:
+            previo = self._data.get(key)
+            if previo is not None:
+                self._remove(key, previo[2])
+
+            self._data[key] = (value, time.time() + ttl, size)
+            self._bytes += size
+            self._evict()
+
+    def purge_expired(self) -> int:
+        """Elimina todas las entradas vencidas. Retorna cuántas se eliminaron."""
+        now = time.time()
+        with self._lock:
+            vencidas = [(k, e[2]) for k, e in self._data.items() if now >= e[1]]
+            for k, size in vencidas:
+                self._remove(k, size)
+            self.expirations += len(vencidas)
+            return len(vencidas)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores para exponer en endpoints de métricas"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_ratio": round(self.hits / total, 3) if total else 0.0
+            }
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def _remove(self, key: Any, size: int):
+        del self._data[key]
+        self._bytes -= size
+
+    def _evict(self):
+        """Desaloja primero vencidas y luego por LRU hasta cumplir los límites (con lock tomado)"""
+        if len(self._data) <= self.max_entries and self._bytes <= self.max_bytes:
+            return
+
+        now = time.time()
+        for k in [k for k, e in self._data.items() if now >= e[1]]:
+            self._remove(k, self._data[k][2])
+            self.expirations += 1
+
+        while self._data and (len(self._data) > self.max_entries or self._bytes > self.max_bytes):
+            key, (_, _, size) = self._data.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
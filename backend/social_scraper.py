@@ -1,14 +1,19 @@
 """
 Módulo de extracción de redes sociales desde sitios web
-Utiliza regex y BeautifulSoup para encontrar perfiles de redes sociales
+Utiliza regex y BeautifulSoup para encontrar perfiles de redes sociales.
+El scraper principal llama a extraer_redes_sociales sobre la página que ya descargó y parseó.
 """
 
 import re
-import json
 import logging
-from typing import Dict, Optional
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+from urllib.parse import urlparse
 from bs4 import BeautifulSoup
-import requests
+
+try:
+    from .structured_data import bloques_json_ld
+except ImportError:
+    from structured_data import bloques_json_ld
 
 logger = logging.getLogger(__name__)
 
@@ -30,18 +35,35 @@ SOCIAL_PATTERNS = {
         r'(?:https?://)?(?:www\.)?linkedin\.com/(?:company|in)/([A-Za-z0-9_\-]+)/?',
     ],
     'youtube': [
-        r'(?:https?://)?(?:www\.)?youtube\.com/(?:c|channel|user|@)/([A-Za-z0-9_\-]+)/?',
+        r'(?:https?://)?(?:www\.)?youtube\.com/(?:(?:c|channel|user)/|@)([A-Za-z0-9_\-\.]+)/?',
     ],
     'tiktok': [
         r'(?:https?://)?(?:www\.)?tiktok\.com/@([A-Za-z0-9_\.]+)/?'
     ]
 }
 
+# Patrones precompilados una sola vez (re.match sobre URLs completas o relativas al esquema)
+SOCIAL_REGEXES = {
+    red_social: [re.compile(pattern, re.IGNORECASE) for pattern in patterns]
+    for red_social, patterns in SOCIAL_PATTERNS.items()
+}
+
+# Filtro barato antes de probar los patrones de cada red
+_SOCIAL_HOST_RE = re.compile(
+    r'(?:instagram\.com|instagr\.am|facebook\.com|fb\.com|twitter\.com|x\.com|linkedin\.com|youtube\.com|tiktok\.com)',
+    re.IGNORECASE
+)
+
+_META_SOCIAL_RE = re.compile(r'og:|twitter:|fb:')
+
 # Dominios de redes sociales (para excluir botones de compartir)
 SHARE_PATTERNS = [
     '/sharer/', '/intent/', '/share?', 'whatsapp.com', 'telegram.me'
 ]
 
+# Rutas que no son perfiles (píxeles, plugins, compartir)
+_RUTAS_NO_PERFIL = {'sharer', 'sharer.php', 'share', 'intent', 'tr', 'plugins', 'dialog', 'hashtag', 'login', 'home.php'}
+
 def limpiar_url(url: str, red_social: str) -> Optional[str]:
     """Limpia y normaliza la URL de red social"""
     if not url or not isinstance(url, str):
@@ -67,17 +89,41 @@ def limpiar_url(url: str, red_social: str) -> Optional[str]:
     
     return url
 
+def clasificar_url_social(url: str) -> Optional[Tuple[str, str]]:
+    """Si la URL es un perfil de red social retorna (red, url limpia); si no, None"""
+    if not url or not isinstance(url, str) or not _SOCIAL_HOST_RE.search(url):
+        return None
+    url = url.strip()
+    if url.startswith('//'):
+        url = 'https:' + url
+    url_lower = url.lower()
+    if any(share in url_lower for share in SHARE_PATTERNS):
+        return None
+
+    for red_social, regexes in SOCIAL_REGEXES.items():
+        for regex in regexes:
+            match = regex.match(url)
+            if match:
+                if match.group(1).lower() in _RUTAS_NO_PERFIL:
+                    return None
+                return red_social, limpiar_url(url, red_social)
+    return None
+
+def _agregar(redes: Dict[str, str], url: str):
+    """Registra el primer perfil válido de cada red"""
+    clasificada = clasificar_url_social(url)
+    if clasificada and clasificada[0] not in redes:
+        redes[clasificada[0]] = clasificada[1]
+
 def extraer_desde_regex(html: str) -> Dict[str, Optional[str]]:
-    """Extrae URLs de redes sociales usando regex"""
+    """Extrae URLs de redes sociales usando regex sobre el HTML crudo"""
     redes = {}
     
-    for red_social, patterns in SOCIAL_PATTERNS.items():
-        for pattern in patterns:
-            matches = re.findall(pattern, html, re.IGNORECASE)
-            if matches:
-                # Tomar el primer match válido
-                username = matches[0]
-                url_completa = limpiar_url(username, red_social)
+    for red_social, regexes in SOCIAL_REGEXES.items():
+        for regex in regexes:
+            match = regex.search(html)
+            if match:
+                url_completa = limpiar_url(match.group(1), red_social)
                 
                 # Verificar que no sea un botón de compartir
                 if not any(share in url_completa.lower() for share in SHARE_PATTERNS):
@@ -89,84 +135,78 @@ def extraer_desde_regex(html: str) -> Dict[str, Optional[str]]:
 def extraer_desde_meta_tags(soup: BeautifulSoup) -> Dict[str, Optional[str]]:
     """Extrae redes sociales desde meta tags Open Graph y similares"""
     redes = {}
-    
-    # Open Graph tags
-    meta_tags = soup.find_all('meta', property=re.compile(r'og:|twitter:|fb:'))
-    for tag in meta_tags:
-        content = tag.get('content', '')
-        if not content:
-            continue
-            
-        for red_social, patterns in SOCIAL_PATTERNS.items():
-            for pattern in patterns:
-                if re.match(pattern, content, re.IGNORECASE):
-                    if red_social not in redes:
-                        redes[red_social] = limpiar_url(content, red_social)
-                    break
-    
+    for tag in soup.find_all('meta', property=_META_SOCIAL_RE):
+        _agregar(redes, tag.get('content', ''))
     return redes
 
+def _same_as(data: Any) -> Iterator[str]:
+    """Recorre sameAs en objetos JSON-LD sueltos, listas y @graph"""
+    if isinstance(data, list):
+        for item in data:
+            yield from _same_as(item)
+    elif isinstance(data, dict):
+        same_as = data.get('sameAs', [])
+        if isinstance(same_as, str):
+            same_as = [same_as]
+        for url in same_as if isinstance(same_as, list) else []:
+            if isinstance(url, str):
+                yield url
+        if '@graph' in data:
+            yield from _same_as(data['@graph'])
+
 def extraer_desde_json_ld(soup: BeautifulSoup) -> Dict[str, Optional[str]]:
     """Extrae redes sociales desde JSON-LD Schema.org"""
     redes = {}
-    
-    scripts = soup.find_all('script', type='application/ld+json')
-    for script in scripts:
-        try:
-            script_content = script.string
-            if not script_content:
-                continue
-            data = json.loads(script_content)
-            
-            # Buscar en sameAs (array de URLs de redes sociales)
-            same_as = data.get('sameAs', [])
-            if isinstance(same_as, str):
-                same_as = [same_as]
-            
-            for url in same_as:
-                for red_social, patterns in SOCIAL_PATTERNS.items():
-                    for pattern in patterns:
-                        if re.match(pattern, url, re.IGNORECASE):
-                            if red_social not in redes:
-                                redes[red_social] = limpiar_url(url, red_social)
-                            break
-                            
-        except (json.JSONDecodeError, AttributeError):
-            continue
-    
+    for bloque in bloques_json_ld(soup):
+        for url in _same_as(bloque):
+            _agregar(redes, url)
     return redes
 
 def extraer_desde_enlaces(soup: BeautifulSoup) -> Dict[str, Optional[str]]:
     """Extrae redes sociales desde todos los enlaces <a>"""
     redes = {}
-    
-    links = soup.find_all('a', href=True)
-    
-    for link in links:
-        href = link['href']
-        
-        # Verificar que no sea botón de compartir
-        if any(share in href.lower() for share in SHARE_PATTERNS):
-            continue
-        
-        for red_social, patterns in SOCIAL_PATTERNS.items():
-            if red_social in redes:
-                continue
-                
-            for pattern in patterns:
-                if re.match(pattern, href, re.IGNORECASE):
-                    redes[red_social] = limpiar_url(href, red_social)
-                    break
-    
+    for link in soup.find_all('a', href=True):
+        _agregar(redes, link['href'])
     return redes
 
-def enriquecer_con_redes_sociales(sitio_web: str, timeout: int = 10) -> Dict[str, Optional[str]]:
+def fusionar_redes(*fuentes: Dict[str, Optional[str]]) -> Dict[str, str]:
+    """Fusiona resultados de menor a mayor prioridad, descartando vacíos"""
+    redes_final: Dict[str, str] = {}
+    for fuente in fuentes:
+        redes_final.update({k: v for k, v in fuente.items() if v})
+    return redes_final
+
+def extraer_redes_sociales(soup: BeautifulSoup, hrefs: Optional[Iterable[str]] = None,
+                           same_as: Optional[Iterable[str]] = None) -> Dict[str, str]:
+    """
+    Redes sociales de un documento ya parseado, sin descargar nada.
+    Si quien llama ya recorrió los enlaces puede pasar sus hrefs para no recorrerlos otra vez,
+    y si ya leyó el JSON-LD (structured_data), sus sameAs para no decodificarlo de nuevo.
+    Debe llamarse antes de quitar los <script> (el JSON-LD vive ahí).
+    Prioridad: JSON-LD > meta tags > enlaces.
+    """
+    if hrefs is None:
+        redes_links = extraer_desde_enlaces(soup)
+    else:
+        redes_links = {}
+        for href in hrefs:
+            _agregar(redes_links, href)
+    if same_as is None:
+        redes_json_ld = extraer_desde_json_ld(soup)
+    else:
+        redes_json_ld = {}
+        for url in same_as:
+            _agregar(redes_json_ld, url)
+    return fusionar_redes(redes_links, extraer_desde_meta_tags(soup), redes_json_ld)
+
+def enriquecer_con_redes_sociales(sitio_web: str, timeout: int = 10, soup: Optional[BeautifulSoup] = None) -> Dict[str, Optional[str]]:
     """
     Función principal: Extrae redes sociales de un sitio web
     
     Args:
         sitio_web: URL del sitio web a scrapear
         timeout: Tiempo máximo de espera en segundos
+        soup: Documento ya descargado y parseado (evita la request)
         
     Returns:
         Diccionario con las redes sociales encontradas
@@ -178,10 +218,9 @@ def enriquecer_con_redes_sociales(sitio_web: str, timeout: int = 10) -> Dict[str
         return {}
     
     # Validar que sea una URL válida
-    from urllib.parse import urlparse
     try:
-        parsed = urlparse(sitio_web if sitio_web.startswith('http') else f'https://{sitio_web}')
-        if not parsed.netloc:
+        url = sitio_web if sitio_web.startswith('http') else f'https://{sitio_web}'
+        if not urlparse(url).netloc:
             logger.warning(f"URL inválida: {sitio_web}")
             return {}
     except Exception as e:
@@ -189,36 +228,18 @@ def enriquecer_con_redes_sociales(sitio_web: str, timeout: int = 10) -> Dict[str
         return {}
     
     try:
-        # Headers para simular navegador real
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-            'Accept-Language': 'es-ES,es;q=0.9,en;q=0.8',
-        }
-        
-        response = requests.get(sitio_web, timeout=timeout, headers=headers, allow_redirects=True)
-        response.raise_for_status()
+        if soup is None:
+            # Import diferido: scraper importa este módulo
+            try:
+                from .scraper import ScraperSession
+            except ImportError:
+                from scraper import ScraperSession
+            soup = ScraperSession().get_soup(url, timeout=timeout)
+            if soup is None:
+                logger.info(f"ℹ  No se pudo descargar {sitio_web}")
+                return {}
         
-        html = response.text
-        soup = BeautifulSoup(html, 'html.parser')
-        
-        # Método 1: Regex en todo el HTML (más rápido y efectivo)
-        redes_regex = extraer_desde_regex(html)
-        
-        # Método 2: Meta tags
-        redes_meta = extraer_desde_meta_tags(soup)
-        
-        # Método 3: JSON-LD
-        redes_json = extraer_desde_json_ld(soup)
-        
-        # Método 4: Enlaces
-        redes_links = extraer_desde_enlaces(soup)
-        
-        # Fusionar resultados (prioridad: regex > json-ld > meta > links)
-        redes_final = {**redes_links, **redes_meta, **redes_json, **redes_regex}
-        
-        # Limpiar valores None
-        redes_final = {k: v for k, v in redes_final.items() if v}
+        redes_final = extraer_redes_sociales(soup)
         
         if redes_final:
             logger.info(f" Redes sociales encontradas en {sitio_web}: {list(redes_final.keys())}")
@@ -227,12 +248,6 @@ def enriquecer_con_redes_sociales(sitio_web: str, timeout: int = 10) -> Dict[str
         
         return redes_final
         
-    except requests.Timeout:
-        logger.warning(f"⏱  Timeout al intentar acceder a {sitio_web}")
-        return {}
-    except requests.RequestException as e:
-        logger.error(f" Error scrapeando {sitio_web}: {e}")
-        return {}
     except Exception as e:
         logger.error(f" Error inesperado en {sitio_web}: {e}")
         return {}
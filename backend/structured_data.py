@@ -0,0 +1,84 @@
+"""
+Datos estructurados de contacto: JSON-LD (schema.org) y microdata.
+
+Muchos sitios de empresas publican un Organization / LocalBusiness con email, telephone y sameAs,
+a veces anidados en contactPoint, department, location o @graph. Se leen antes que el texto de la
+página: si ya traen email y teléfono, el scraper no necesita escanear el texto con regex ni
+recorrer sub-páginas.
+
+Se retornan los valores tal como vienen (con 'mailto:', espacios, guiones); la normalización y los
+filtros de emails y teléfonos quedan en scraper.py, iguales a los del resto de las fuentes.
+"""
+
+import json
+import logging
+from typing import Any, Dict, Iterator, List
+
+from bs4 import BeautifulSoup
+
+logger = logging.getLogger(__name__)
+
+_MAX_PROFUNDIDAD = 8  # Los JSON-LD reales anidan 3-4 niveles; evita recorrer blobs gigantes
+
+
+def bloques_json_ld(soup: BeautifulSoup) -> Iterator[Any]:
+    """Cada <script type="application/ld+json"> decodificado; los inválidos se ignoran"""
+    for script in soup.find_all('script', type='application/ld+json'):
+        contenido = script.string
+        if not contenido:
+            continue
+        try:
+            yield json.loads(contenido)
+        except (json.JSONDecodeError, ValueError):
+            logger.debug("JSON-LD inválido, se ignora")
+
+
+def _valores(valor: Any) -> Iterator[str]:
+    """Un campo schema.org puede ser string o lista de strings"""
+    for item in valor if isinstance(valor, list) else [valor]:
+        if isinstance(item, str) and item.strip():
+            yield item.strip()
+
+
+def _recorrer(data: Any, datos: Dict[str, List[str]], profundidad: int = 0):
+    """Junta email, telephone y sameAs de todos los nodos (listas, @graph, contactPoint, location...)"""
+    if profundidad > _MAX_PROFUNDIDAD:
+        return
+    if isinstance(data, list):
+        for item in data:
+            _recorrer(item, datos, profundidad + 1)
+        return
+    if not isinstance(data, dict):
+        return
+    for campo, valor in data.items():
+        if campo == 'email':
+            datos['emails'].extend(_valores(valor))
+        elif campo == 'telephone':
+            datos['telefonos'].extend(_valores(valor))
+        elif campo == 'sameAs':
+            datos['same_as'].extend(_valores(valor))
+        elif isinstance(valor, (dict, list)):
+            _recorrer(valor, datos, profundidad + 1)
+
+
+def _valor_microdata(tag) -> str:
+    """content (meta), href (a/link) o el texto del elemento, en ese orden"""
+    valor = tag.get('content') or tag.get('href') or tag.get_text(separator=' ')
+    return valor.strip() if isinstance(valor, str) else ''
+
+
+def extraer_datos_estructurados(soup: BeautifulSoup) -> Dict[str, List[str]]:
+    """
+    Emails, teléfonos y sameAs declarados en JSON-LD y microdata (itemprop="email" / "telephone").
+    Debe llamarse antes de quitar los <script>.
+    """
+    datos: Dict[str, List[str]] = {'emails': [], 'telefonos': [], 'same_as': []}
+    for bloque in bloques_json_ld(soup):
+        _recorrer(bloque, datos)
+    for tag in soup.find_all(attrs={'itemprop': True}):
+        props = tag['itemprop'] if isinstance(tag['itemprop'], list) else tag['itemprop'].split()
+        if 'email' in props or 'telephone' in props:
+            valor = _valor_microdata(tag)
+            if valor:
+                datos['emails' if 'email' in props else 'telefonos'].append(valor)
+    return datos
@@ -0,0 +1,201 @@
+"""
+Sink de telemetría con escritura diferida (write-behind) para uso y logs de APIs pagas.
+
+En lugar de dos escrituras a Supabase por cada llamada a Google Places, los eventos
+se acumulan en memoria y se vuelcan por tiempo o por tamaño:
+  - uso: un upsert agregado por (mes, provider, sku)
+  - logs: un único insert multi-fila en api_call_logs
+La cola de logs es acotada: si se llena se descartan los más viejos (se cuentan en 'dropped').
+"""
+
+import asyncio
+import logging
+import os
+from collections import deque
+from datetime import datetime
+from threading import Lock
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL_SECONDS = float(os.getenv('TELEMETRY_FLUSH_SECONDS', '5'))
+FLUSH_BATCH_SIZE = max(1, int(os.getenv('TELEMETRY_FLUSH_BATCH', '100')))
+MAX_QUEUE_SIZE = max(FLUSH_BATCH_SIZE, int(os.getenv('TELEMETRY_MAX_QUEUE', '5000')))
+
+
+class ApiTelemetrySink:
+    """Buffer de eventos de uso/logs con volcado periódico a la base"""
+
+    def __init__(
+        self,
+        usage_writer: Callable[..., Optional[bool]],
+        logs_writer: Callable[[List[Dict[str, Any]]], bool],
+        flush_interval: float = FLUSH_INTERVAL_SECONDS,
+        batch_size: int = FLUSH_BATCH_SIZE,
+        max_queue: int = MAX_QUEUE_SIZE
+    ):
+        self._usage_writer = usage_writer
+        self._logs_writer = logs_writer
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._lock = Lock()
+        self._usage: Dict[Tuple[str, str, str], List[float]] = {} # (mes, provider, sku) -> [calls, cost]
+        self._logs: deque = deque(maxlen=max_queue)
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self.dropped = 0
+        self.flushed_logs = 0
+        self.flushed_usage_rows = 0
+        self.flush_failures = 0
+
+    # --- Registro de eventos (no bloqueante) ---
+
+    def record_usage(self, provider: str, sku: str, cost_usd: float, calls: int = 1):
+        month = datetime.now().replace(day=1).date().isoformat()
+        with self._lock:
+            acc = self._usage.setdefault((month, provider, sku), [0, 0.0])
+            acc[0] += calls
+            acc[1] += cost_usd
+        self._ensure_started()
+
+    def record_call(
+        self,
+        provider: str,
+        endpoint: str,
+        cost_usd: float,
+        metadata: Optional[Dict[str, Any]] = None,
+        status_code: int = 200,
+        duration_ms: int = 0,
+        sku: Optional[str] = None
+    ):
+        metadata = metadata or {}
+        row = {
+            'provider': provider,
+            'endpoint': endpoint,
+            'cost_usd': cost_usd,
+            'metadata': metadata,
+            'status_code': status_code,
+            'duration_ms': duration_ms,
+            'sku': sku,
+            'created_at': datetime.now().isoformat()
+        }
+        if metadata.get('user_id'):
+            row['user_id'] = metadata['user_id']
+
+        with self._lock:
+            if len(self._logs) == self._logs.maxlen:
+                self.dropped += 1 # deque descarta el más viejo
+            self._logs.append(row)
+            pendientes = len(self._logs)
+
+        self._ensure_started()
+        if pendientes >= self.batch_size and self._wakeup is not None:
+            self._wakeup.set() # Backpressure: volcar antes de que venza el intervalo
+
+    # --- Ciclo de volcado ---
+
+    def _ensure_started(self):
+        """Arranca el flusher en el loop actual si no está corriendo (p.ej. sin evento de startup)"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return # Sin loop (scripts sincrónicos): se vuelca con flush_sync()
+        if self._task is not None and not self._task.done() and self._loop is loop:
+            return
+        self.start()
+
+    def start(self):
+        loop = asyncio.get_running_loop()
+        self._loop = loop
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = loop.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Error en flush de telemetría: {e}")
+
+    def _drain(self) -> Tuple[Dict[Tuple[str, str, str], List[float]], List[Dict[str, Any]]]:
+        with self._lock:
+            usage, self._usage = self._usage, {}
+            logs = list(self._logs)
+            self._logs.clear()
+        return usage, logs
+
+    def _write(self, usage: Dict[Tuple[str, str, str], List[float]], logs: List[Dict[str, Any]]):
+        """
+        Escritura sincrónica de un lote. Lo que falla se reencola para el próximo volcado, salvo el uso
+        cuyo writer retorna None (resultado incierto: reintentarlo podría contarlo dos veces).
+        """
+        for (month, provider, sku), (calls, cost) in usage.items():
+            ok = self._usage_writer(provider=provider, sku=sku, cost_usd=cost, calls=int(calls), month=month)
+            if ok:
+                self.flushed_usage_rows += 1
+            elif ok is None:
+                self.flush_failures += 1
+            else:
+                self.flush_failures += 1
+                with self._lock:
+                    acc = self._usage.setdefault((month, provider, sku), [0, 0.0])
+                    acc[0] += calls
+                    acc[1] += cost
+
+        for i in range(0, len(logs), self.batch_size):
+            chunk = logs[i:i + self.batch_size]
+            if self._logs_writer(chunk):
+                self.flushed_logs += len(chunk)
+            else:
+                self.flush_failures += 1
+                with self._lock:
+                    for row in chunk:
+                        if len(self._logs) == self._logs.maxlen:
+                            self.dropped += 1
+                            break
+                        self._logs.append(row)
+
+    async def flush(self):
+        """Vuelca el buffer a la base sin bloquear el event loop"""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            usage, logs = self._drain()
+            if usage or logs:
+                await asyncio.to_thread(self._write, usage, logs)
+
+    def flush_sync(self):
+        usage, logs = self._drain()
+        if usage or logs:
+            self._write(usage, logs)
+
+    async def aclose(self):
+        """Detiene el flusher y vuelca lo pendiente (llamar en el shutdown de la app)"""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        await self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "pending_logs": len(self._logs),
+                "pending_usage_keys": len(self._usage),
+                "max_queue": self._logs.maxlen,
+                "dropped": self.dropped,
+                "flushed_logs": self.flushed_logs,
+                "flushed_usage_rows": self.flushed_usage_rows,
+                "flush_failures": self.flush_failures
+            }
@@ -0,0 +1,51 @@
+import asyncio
+from unittest.mock import patch
+
+from backend.budget_ledger import BudgetLedger
+
+
+def test_reservations_cannot_overshoot_limit():
+    ledger = BudgetLedger(usage_loader=lambda: 0.0)
+    granted = [ledger.reserve(0.032, limit=0.1) for _ in range(10)]
+
+    assert sum(1 for r in granted if r is not None) == 3
+    assert ledger.reserved == 0.096
+
+    ledger.commit(granted[0])
+    ledger.release(granted[1])
+    assert round(ledger.spent, 3) == 0.032
+    assert round(ledger.reserved, 3) == 0.032
+
+
+def test_seed_and_reconcile_only_once_per_interval():
+    calls = 0
+
+    def loader():
+        nonlocal calls
+        calls += 1
+        return 149.99
+
+    ledger = BudgetLedger(usage_loader=loader, reconcile_interval=300)
+
+    async def run():
+        await asyncio.gather(*(ledger.ensure_fresh() for _ in range(5)))
+        await ledger.ensure_fresh()
+
+    asyncio.run(run())
+    assert calls == 1
+    assert ledger.reserve(0.032, limit=150.0) is None
+
+
+def test_reconcile_keeps_unflushed_local_spend():
+    ledger = BudgetLedger(usage_loader=lambda: 1.0)
+    ledger.commit(ledger.reserve(5.0, limit=150.0))
+    asyncio.run(ledger.reconcile())
+    assert ledger.spent == 5.0
+    assert ledger.db_total == 1.0
+
+
+def test_month_rollover_resets_spend():
+    ledger = BudgetLedger(usage_loader=lambda: 0.0)
+    ledger.commit(ledger.reserve(100.0, limit=150.0))
+    with patch("backend.budget_ledger._mes_actual", return_value="2099-01-01"):
+        assert ledger.available(150.0) == 150.0
@@ -0,0 +1,116 @@
+import asyncio
+import socket
+import ssl
+
+import httpcore
+import httpx
+import pytest
+import requests
+
+from backend.dead_hosts import DeadHostCache, dead_hosts, motivo_de_error
+from backend.scraper_async import AsyncScraperEngine, enriquecer_empresas_async_lista
+
+
+@pytest.fixture(autouse=True)
+def _cache_limpia():
+    dead_hosts.clear()
+    yield
+    dead_hosts.clear()
+
+
+def _error_dns():
+    try:
+        raise socket.gaierror(socket.EAI_NONAME, "Name or service not known")
+    except socket.gaierror as e:
+        try:
+            raise httpx.ConnectError("DNS: vencido.com.ar") from e
+        except httpx.ConnectError as wrapped:
+            return wrapped
+
+
+def test_clasifica_errores_de_red():
+    assert motivo_de_error(_error_dns()) == "nxdomain"
+    assert motivo_de_error(socket.gaierror(socket.EAI_AGAIN, "temporary")) is None
+    assert motivo_de_error(httpx.ConnectTimeout("connect")) == "connect_timeout"
+    assert motivo_de_error(httpx.ReadTimeout("read")) is None
+    assert motivo_de_error(ssl.SSLCertVerificationError("bad cert")) == "tls"
+
+    with pytest.raises(requests.ConnectionError) as info:
+        requests.get("http://127.0.0.1:1/", timeout=2)
+    assert motivo_de_error(info.value) == "unreachable"
+
+
+def test_connect_timeout_acotado_no_marca_caido():
+    cache = DeadHostCache(base_seconds=10)
+    assert cache.record_error("https://lento.com.ar/", httpx.ConnectTimeout("connect"), connect_acotado=True) is None
+    assert not cache.is_dead("lento.com.ar")
+    assert cache.record_error("https://lento.com.ar/", httpx.ConnectTimeout("connect")) == "connect_timeout"
+    assert cache.is_dead("lento.com.ar")
+
+
+def test_connect_timeout_de_robots_no_marca_caido():
+    def handler(request: httpx.Request):
+        raise httpx.ConnectTimeout("connect", request=request)
+
+    engine = AsyncScraperEngine(transport=httpx.MockTransport(handler), cache=None)
+
+    async def run():
+        # robots.txt usa un timeout de 3s, menor al connect normal: un host lento no queda marcado
+        await engine._fetch_robots("https://lento.com.ar/robots.txt")
+        assert not dead_hosts.is_dead("lento.com.ar")
+        await engine.fetch_pagina("https://lento.com.ar/", timeout=2)
+        assert not dead_hosts.is_dead("lento.com.ar")
+        await engine.fetch_pagina("https://lento.com.ar/")
+        assert dead_hosts.is_dead("lento.com.ar")
+        await engine.aclose()
+
+    asyncio.run(run())
+
+
+def test_backoff_exponencial_y_recuperacion():
+    cache = DeadHostCache(base_seconds=10, max_seconds=25)
+    assert cache.record_failure("https://www.caido.com/x", "nxdomain") == 10
+    assert cache.is_dead("www.caido.com") and not cache.is_dead("caido.com")
+    assert cache.record_failure("www.caido.com", "nxdomain") == 20
+    assert cache.record_failure("www.caido.com", "nxdomain") == 25
+
+    cache.record_success("http://www.caido.com/")
+    assert not cache.is_dead("www.caido.com")
+    assert cache.stats()["recoveries"] == 1
+
+
+def test_host_caido_no_se_vuelve_a_pedir():
+    pedidos = []
+
+    def handler(request: httpx.Request):
+        pedidos.append(str(request.url))
+        raise _error_dns()
+
+    engine = AsyncScraperEngine(transport=httpx.MockTransport(handler), cache=None)
+    empresa = {"nombre": "Vencida", "website": "https://vencido.com.ar/"}
+
+    asyncio.run(enriquecer_empresas_async_lista([dict(empresa)], engine=engine))
+    primeros = len(pedidos)
+    resultado = asyncio.run(enriquecer_empresas_async_lista([dict(empresa)], engine=engine))
+
+    assert primeros == 1  # El robots.txt falla y ya no se pide la home
+    assert len(pedidos) == primeros
+    assert resultado[0] == empresa
+    assert engine.stats()["dead_hosts_detected"] == 1
+
+
+def test_preresolucion_descarta_nxdomain_antes_de_programar_descargas():
+    engine = AsyncScraperEngine(cache=None)
+
+    async def resolver_falso(host, port):
+        if host == "vencido.com.ar":
+            raise httpcore.ConnectError("DNS") from socket.gaierror(socket.EAI_NONAME, "unknown")
+        return ["127.0.0.1"]
+
+    async def run():
+        engine._get_client()
+        engine._dns._resolve = resolver_falso
+        return await engine.preresolver(["https://vencido.com.ar/", "http://vivo.com.ar", "https://vivo.com.ar/x"])
+
+    assert asyncio.run(run()) == {"vencido.com.ar"}
+    assert dead_hosts.is_dead("vencido.com.ar")
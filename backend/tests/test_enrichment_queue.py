@@ -0,0 +1,96 @@
+import time
+
+from backend import scraper_parallel
+from backend.enrichment_queue import PRIORIDAD_BACKFILL, PRIORIDAD_INTERACTIVA, EnrichmentQueue
+
+
+def _empresa(dominio, **extra):
+    return {"nombre": dominio, "website": f"https://www.{dominio}/", **extra}
+
+
+def test_dedupe_by_domain_and_priority_order(tmp_path):
+    cola = EnrichmentQueue(path=str(tmp_path / "q.sqlite3"))
+    assert cola.encolar([_empresa("backfill.com"), _empresa("subir.com")], prioridad=PRIORIDAD_BACKFILL) == 2
+    # Mismo dominio con otra URL: no se duplica, pero sube de prioridad
+    assert cola.encolar([{"website": "http://subir.com/contacto"}, _empresa("nueva.com")], PRIORIDAD_INTERACTIVA) == 1
+    assert cola.encolar([_empresa("completa.com", email="a@b.com", telefono="1")]) == 0
+
+    orden = []
+    while cola.procesar_uno(lambda e: orden.append(e["nombre"]) or True):
+        pass
+
+    assert orden == ["subir.com", "nueva.com", "backfill.com"]
+    assert cola.stats()["by_status"] == {"done": 3}
+    assert cola.stats()["deduplicated"] == 1
+
+
+def test_retry_with_backoff_then_fail(tmp_path):
+    cola = EnrichmentQueue(path=str(tmp_path / "q.sqlite3"), max_attempts=2, retry_base_seconds=0.05)
+    cola.encolar([_empresa("caido.com")])
+
+    assert cola.procesar_uno(lambda e: False)
+    assert not cola.procesar_uno(lambda e: True)  # Todavía en backoff
+    time.sleep(0.08)
+    assert cola.procesar_uno(lambda e: 1 / 0)
+
+    stats = cola.stats()
+    assert stats["by_status"] == {"failed": 1}
+    assert stats["retried"] == 1 and stats["failed"] == 1
+
+
+def test_reencolar_failed_conserva_intentos_y_backoff(tmp_path):
+    cola = EnrichmentQueue(path=str(tmp_path / "q.sqlite3"), max_attempts=1, retry_base_seconds=0.05)
+    cola.encolar([_empresa("caido.com")])
+    assert cola.procesar_uno(lambda e: False)
+
+    # Otra búsqueda lo vuelve a traer: queda pendiente pero no se adelanta el backoff
+    assert cola.encolar([_empresa("caido.com")]) == 1
+    assert cola.reclamar() is None
+    time.sleep(0.08)
+    assert cola.reclamar()[2] == 2  # El contador de intentos sigue, no vuelve a 1
+
+
+def test_dedupe_respeta_plataformas_por_ruta(tmp_path):
+    cola = EnrichmentQueue(path=str(tmp_path / "q.sqlite3"))
+    empresas = [
+        {"website": "https://sites.google.com/view/ferreteria"},
+        {"website": "https://sites.google.com/view/panaderia/contacto"},
+        {"website": "https://sites.google.com/"},
+    ]
+    assert cola.encolar(empresas) == 2
+
+
+def test_jobs_survive_restart_and_expired_leases_are_reclaimed(tmp_path):
+    path = str(tmp_path / "q.sqlite3")
+    cola = EnrichmentQueue(path=path, lease_seconds=0.05)
+    cola.encolar([_empresa("a.com"), _empresa("b.com")])
+    assert cola.reclamar()[0] == "a.com"  # El worker "muere" con el job tomado
+    cola.close()
+
+    reiniciada = EnrichmentQueue(path=path, lease_seconds=0.05)
+    time.sleep(0.06)
+    procesados = []
+    while reiniciada.procesar_uno(lambda e: procesados.append(e["nombre"]) or True):
+        pass
+    assert sorted(procesados) == ["a.com", "b.com"]
+
+
+def test_workers_process_jobs_in_background(tmp_path):
+    cola = EnrichmentQueue(path=str(tmp_path / "q.sqlite3"), workers=2, poll_seconds=0.05)
+    cola.start(lambda e: True)
+    try:
+        cola.encolar([_empresa(f"sitio{i}.com") for i in range(5)])
+        limite = time.time() + 3
+        while cola.stats()["succeeded"] < 5 and time.time() < limite:
+            time.sleep(0.02)
+    finally:
+        cola.stop()
+    assert cola.stats()["succeeded"] == 5
+
+
+def test_programar_enriquecimiento_diferido_encola_todas(tmp_path, monkeypatch):
+    cola = EnrichmentQueue(path=str(tmp_path / "q.sqlite3"))
+    monkeypatch.setattr(scraper_parallel, "enrichment_queue", cola)
+
+    assert scraper_parallel._programar_enriquecimiento_diferido([_empresa(f"e{i}.com") for i in range(4)]) == 4
+    assert cola.stats()["by_status"] == {"pending": 4}
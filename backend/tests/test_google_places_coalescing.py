@@ -0,0 +1,84 @@
+import asyncio
+from unittest.mock import MagicMock
+
+from backend.google_places_client import GooglePlacesClient
+
+
+def _client_with_fake_post(status_code=200, body=None, delay=0.05):
+    client = GooglePlacesClient(api_key="test")
+    client.telemetry = MagicMock()
+    calls = []
+
+    async def fake_post(url, headers, payload, user_id=None):
+        calls.append(payload)
+        await asyncio.sleep(delay)
+        response = MagicMock()
+        response.status_code = status_code
+        response.text = "boom"
+        response.http_version = "HTTP/2"
+        response.json.return_value = body if body is not None else {"places": [{"id": "p1"}]}
+        return response, True
+
+    client._post = fake_post
+    return client, calls
+
+
+def test_identical_concurrent_requests_share_one_call():
+    client, calls = _client_with_fake_post()
+
+    async def run():
+        return await asyncio.gather(*(
+            client.search_places(query="Coalescing Ferreterias", lat=-34.6, lng=-58.4, radius=1000)
+            for _ in range(5)
+        ))
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(r == {"places": [{"id": "p1"}]} for r in results)
+    assert client.get_transport_stats()["coalesced_requests"] == 4
+
+
+def test_failures_propagate_to_all_waiters_and_are_not_cached():
+    client, calls = _client_with_fake_post(status_code=503)
+
+    async def run():
+        return await asyncio.gather(*(
+            client.search_places(query="Coalescing Error", lat=-34.6, lng=-58.4, radius=1000)
+            for _ in range(3)
+        ))
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(r["error"] == "API Error 503" for r in results)
+
+    asyncio.run(client.search_places(query="Coalescing Error", lat=-34.6, lng=-58.4, radius=1000))
+    assert len(calls) == 2
+
+
+def test_cancelling_every_waiter_cancels_shared_request():
+    client, calls = _client_with_fake_post(delay=1)
+
+    async def run():
+        task = asyncio.create_task(client.search_places(query="Coalescing Cancel"))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        await asyncio.sleep(0.01)
+        return client._in_flight_requests
+
+    assert asyncio.run(run()) == {}
+    assert client.budget_ledger.reserved == 0
+
+
+def test_request_after_cancellation_starts_a_new_call():
+    client, calls = _client_with_fake_post(delay=0.05)
+
+    async def run():
+        task = asyncio.create_task(client.search_places(query="Coalescing Reintento"))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        await asyncio.sleep(0)  # El único interesado se va y cancela la request compartida
+        # Llega antes de que la request cancelada termine de desarmarse: no debe heredar la cancelación
+        return await client.search_places(query="Coalescing Reintento")
+
+    assert asyncio.run(run()) == {"places": [{"id": "p1"}]}
+    assert len(calls) == 2
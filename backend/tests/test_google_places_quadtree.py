@@ -0,0 +1,155 @@
+import asyncio
+import itertools
+import random
+from unittest.mock import patch
+
+import pytest
+
+from backend.google_places_client import GooglePlacesClient
+from backend.places_tile_store import PlacesTileStore, root_tiles_for_bbox, tile_bbox, tile_children
+
+BBOX = {"south": -34.70, "west": -58.53, "north": -34.53, "east": -58.33}
+
+
+@pytest.fixture(autouse=True)
+def tile_store(tmp_path):
+    store = PlacesTileStore(path=str(tmp_path / "tiles.sqlite3"))
+    with patch("backend.google_places_client._TILE_STORE", store):
+        yield store
+    store.close()
+
+
+def _fake_places(n, counter, bbox):
+    # Lugares distribuidos dentro del área consultada (o del bbox pedido si no hay bias)
+    area = bbox or BBOX
+    return [
+        {
+            "id": f"place-{next(counter)}",
+            "displayName": {"text": "Empresa"},
+            "location": {
+                "latitude": random.uniform(max(area["south"], BBOX["south"]), min(area["north"], BBOX["north"])),
+                "longitude": random.uniform(max(area["west"], BBOX["west"]), min(area["east"], BBOX["east"])),
+            }
+        }
+        for _ in range(n)
+    ]
+
+
+def test_tile_children_split_parent_in_quadrants():
+    parent = tile_bbox("0110")
+    children = [tile_bbox(c) for c in tile_children("0110")]
+    mid_lat = (parent["south"] + parent["north"]) / 2
+    mid_lng = (parent["west"] + parent["east"]) / 2
+
+    assert children[0] == {"south": parent["south"], "west": parent["west"], "north": mid_lat, "east": mid_lng}
+    assert children[3] == {"south": mid_lat, "west": mid_lng, "north": parent["north"], "east": parent["east"]}
+
+
+def test_root_tiles_cover_bbox():
+    roots = root_tiles_for_bbox(BBOX)
+    assert 1 <= len(roots) <= 4
+    boxes = [tile_bbox(t) for t in roots]
+    assert min(b["south"] for b in boxes) <= BBOX["south"]
+    assert max(b["north"] for b in boxes) >= BBOX["north"]
+    assert min(b["west"] for b in boxes) <= BBOX["west"]
+    assert max(b["east"] for b in boxes) >= BBOX["east"]
+
+
+def test_quadtree_explores_subquadrants_concurrently():
+    client = GooglePlacesClient(api_key="test")
+    counter = itertools.count()
+    in_flight = 0
+    max_in_flight = 0
+
+    async def fake_search_places(**kwargs):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return {"places": _fake_places(20, counter, kwargs.get("bbox"))}
+
+    client.search_places = fake_search_places
+    results = asyncio.run(client.search_all_places(
+        query="colegios", rubro_nombre="Colegios", rubro_key="colegios",
+        bbox=BBOX, max_total_results=10_000, max_depth=2
+    ))
+
+    assert len(results) > 20
+    assert max_in_flight > 1
+
+
+def test_quadtree_stops_and_cancels_when_full():
+    client = GooglePlacesClient(api_key="test")
+    counter = itertools.count()
+    calls = 0
+
+    async def fake_search_places(**kwargs):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"places": _fake_places(20, counter, kwargs.get("bbox"))}
+
+    client.search_places = fake_search_places
+    results = asyncio.run(client.search_all_places(
+        query="colegios", rubro_nombre="Colegios", rubro_key="colegios",
+        bbox=BBOX, max_total_results=50, max_depth=3
+    ))
+
+    assert len(results) == 50
+    # Sin corte temprano serían decenas de llamadas por cada tile raíz
+    assert calls < 40
+
+
+def test_overlapping_search_reuses_stored_tiles(tile_store):
+    client = GooglePlacesClient(api_key="test")
+    counter = itertools.count()
+    calls = 0
+
+    shifted = {"south": -34.69, "west": -58.52, "north": -34.54, "east": -58.34}
+
+    async def fake_search_places(**kwargs):
+        nonlocal calls
+        calls += 1
+        # El bbox completo satura (obliga a bajar a los tiles raíz); cada tile tiene pocos lugares
+        n = 20 if kwargs.get("bbox") in (BBOX, shifted) else 5
+        return {"places": _fake_places(n, counter, kwargs.get("bbox"))}
+
+    client.search_places = fake_search_places
+    kwargs = dict(query="Colegios", rubro_nombre="Colegios", rubro_key="colegios", max_total_results=1000)
+
+    first = asyncio.run(client.search_all_places(bbox=BBOX, **kwargs))
+    calls_first = calls
+    second = asyncio.run(client.search_all_places(bbox=shifted, **{**kwargs, "query": "  colegios "}))
+
+    assert calls_first > 0
+    assert calls == calls_first  # todos los tiles ya estaban en el store
+    assert second and {r["google_id"] for r in second} <= {r["google_id"] for r in first}
+    assert tile_store.stats()["hits"] > 0
+
+
+def test_sparse_first_search_makes_a_single_call():
+    client = GooglePlacesClient(api_key="test")
+    counter = itertools.count()
+    areas = []
+
+    async def fake_search_places(**kwargs):
+        areas.append(kwargs.get("bbox"))
+        return {"places": _fake_places(5, counter, kwargs.get("bbox"))}
+
+    client.search_places = fake_search_places
+    results = asyncio.run(client.search_all_places(
+        query="colegios", rubro_nombre="Colegios", rubro_key="colegios", bbox=BBOX, max_total_results=100
+    ))
+
+    assert len(root_tiles_for_bbox(BBOX)) > 1
+    assert areas == [BBOX] and len(results) == 5
+
+
+def test_put_purges_stale_tiles_periodically(tile_store):
+    tile_store.put("0110", "colegios", "basic", [], False)
+    tile_store._conn.execute("UPDATE places_tiles SET fetched_at = fetched_at - ?", (tile_store.ttl_seconds + 1,))
+    tile_store._last_purge = 0.0
+    tile_store.put("0111", "colegios", "basic", [], False)
+    tiles = [row[0] for row in tile_store._conn.execute("SELECT tile FROM places_tiles")]
+    assert tiles == ["0111"]
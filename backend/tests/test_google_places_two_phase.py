@@ -0,0 +1,91 @@
+import asyncio
+from unittest.mock import MagicMock
+
+from backend.google_places_client import GooglePlacesClient
+
+
+def test_fetch_contact_details_only_for_survivors():
+    client = GooglePlacesClient(api_key="test")
+    client.telemetry = MagicMock()
+    requested = []
+
+    async def fake_get(url, headers, user_id=None):
+        requested.append(url.rsplit("/", 1)[-1])
+        assert "websiteUri" in headers["X-Goog-FieldMask"]
+        response = MagicMock()
+        response.status_code = 200
+        response.json.return_value = {"websiteUri": "https://empresa.com.ar", "nationalPhoneNumber": "011 4444-5555"}
+        return response, True
+
+    client._get = fake_get
+    leads = [
+        {"google_id": "two-phase-a", "website": "", "telefono": ""},
+        {"google_id": "two-phase-b", "website": "https://ya.com", "telefono": "123"},
+    ]
+
+    result = asyncio.run(client.fetch_contact_details(leads))
+
+    assert requested == ["two-phase-a"]
+    assert result[0]["website"] == "https://empresa.com.ar"
+    assert result[0]["telefono"] == "011 4444-5555"
+    assert round(client.budget_ledger.spent, 3) == round(client.COST_PER_DETAILS_CALL, 3)
+
+
+def test_discovery_phase_uses_basic_field_mask():
+    client = GooglePlacesClient(api_key="test")
+    seen = []
+
+    async def fake_search_places(**kwargs):
+        seen.append(kwargs["use_advanced"])
+        return {"places": []}
+
+    client.search_places = fake_search_places
+    asyncio.run(client.search_all_places(
+        query="two phase", rubro_nombre="X", rubro_key="x", lat=-34.6, lng=-58.4, radius=1000, use_advanced=False
+    ))
+
+    assert seen == [False]
+
+
+def test_basic_score_and_two_phase_backfill_fetch_website_first(monkeypatch, tmp_path):
+    from backend.api.routes import leads
+    from backend.enrichment_queue import EnrichmentQueue
+
+    conocido = {"google_id": "a", "rating": 4.3, "user_ratings_total": 500}
+    nuevo = {"google_id": "b", "rating": 5.0, "user_ratings_total": 2}
+    assert leads.puntaje_basico(conocido) > leads.puntaje_basico(nuevo)
+
+    cola = EnrichmentQueue(path=str(tmp_path / "cola.sqlite3"))
+    detalles = []
+
+    async def fake_details(candidatos, user_id=None):
+        detalles.extend(c["google_id"] for c in candidatos)
+        for c in candidatos:
+            c["website"] = f"https://{c['google_id']}.com.ar"
+        return candidatos
+
+    monkeypatch.setattr(leads, "enrichment_queue", cola)
+    monkeypatch.setattr(leads, "BACKFILL_DETAILS_MAX", 2)
+    monkeypatch.setattr(leads.google_client, "two_phase_enabled", True)
+    monkeypatch.setattr(leads.google_client, "fetch_contact_details", fake_details)
+
+    candidatos = [{"google_id": f"lugar{i}", "website": "", "email": "", "telefono": ""} for i in range(3)]
+    assert asyncio.run(leads.encolar_backfill(candidatos)) == 2
+    assert detalles == ["lugar0", "lugar1"]
+
+
+def test_details_exception_is_recorded_and_not_charged():
+    client = GooglePlacesClient(api_key="test")
+    client.telemetry = MagicMock()
+
+    async def fake_get(url, headers, user_id=None):
+        raise RuntimeError("conexión reseteada")
+
+    client._get = fake_get
+    result = asyncio.run(client.get_place_details("two-phase-error", user_id="u1"))
+
+    assert result == {"error": "conexión reseteada"}
+    assert client.budget_ledger.spent == 0 and client.budget_ledger.reserved == 0
+    call = client.telemetry.record_call.call_args.kwargs
+    assert call["endpoint"] == "places:details" and call["status_code"] == 500
+    assert call["metadata"]["exception"] == "conexión reseteada"
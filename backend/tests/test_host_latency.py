@@ -0,0 +1,29 @@
+from backend.host_latency import HostLatency, sufijo_de
+
+
+def test_sufijo_agrupa_por_ccTLD_y_hosting():
+    assert sufijo_de("tienda.empresa.com.ar") == "com.ar"
+    assert sufijo_de("ferreteria.wixsite.com") == "wixsite.com"
+
+
+def test_timeouts_se_adaptan_al_host_y_caen_al_sufijo():
+    latencias = HostLatency(min_samples=5, factor=3, min_timeout=2, connect_max=5)
+    for _ in range(20):
+        latencias.registrar("https://rapido.com.ar/", 0.1)
+    for segundos in (3.0, 3.5, 4.0, 4.5, 5.0):
+        latencias.registrar("https://www.lento.com.mx/", segundos)
+
+    assert latencias.timeouts("https://rapido.com.ar/contacto", 10) == (5, 2)
+    # Host sin muestras propias: la lectura usa las de su sufijo (com.ar); la conexión nunca se acorta
+    assert latencias.timeouts("https://otro.com.ar/", 10) == (5, 2)
+    connect, read = latencias.timeouts("https://www.lento.com.mx/", 10)
+    assert read == 10 and connect == 5  # p95 * 3 supera el tope: conserva el timeout por defecto
+    assert latencias.timeouts("https://nuevo.cl/", 10) == (5, 10)
+
+
+def test_umbral_de_cobertura_es_el_p90():
+    latencias = HostLatency(min_samples=5)
+    assert latencias.umbral_hedge("https://x.com.ar/", 3.0) == 3.0
+    for segundos in [0.1] * 9 + [5.0]:
+        latencias.registrar("https://x.com.ar/", segundos)
+    assert latencias.umbral_hedge("https://x.com.ar/", 3.0) < 0.2
@@ -0,0 +1,55 @@
+import asyncio
+import threading
+import time
+
+from backend.parse_pool import PoolParseo
+from backend.scraper import analizar_home, analizar_subpagina
+
+HOME = """
+<html><head><title>Ferretería Sur</title></head><body>
+  <a href="/contacto">Contacto</a>
+  <a href="https://instagram.com/ferreteriasur">IG</a>
+  <footer>ventas@ferreteriasur.com.ar</footer>
+</body></html>
+"""
+
+
+def _dormir(segundos: float) -> dict:
+    time.sleep(segundos)
+    return {"ok": True}
+
+
+def test_pool_returns_same_result_as_inline():
+    pool = PoolParseo(procesos=1, max_pendientes=2)
+    try:
+        en_pool = pool.ejecutar(analizar_home, "https://ferreteriasur.com.ar", HOME, "")
+        assert pool.stats()["parsed_in_pool"] == 1
+    finally:
+        pool.shutdown()
+
+    assert en_pool == analizar_home("https://ferreteriasur.com.ar", HOME, "")
+    assert en_pool["emails"] == ["ventas@ferreteriasur.com.ar"]
+    assert en_pool["subpaginas"] == ["https://ferreteriasur.com.ar/contacto"]
+
+
+def test_disabled_pool_parses_inline():
+    pool = PoolParseo(procesos=0)
+    datos = asyncio.run(pool.ejecutar_async(analizar_subpagina, "", '<a href="tel:+541144445555">Llamar</a>'))
+    assert datos["telefonos"] == ["+541144445555"]
+    stats = pool.stats()
+    assert (stats["parsed_in_pool"], stats["parsed_inline"], stats["processes"]) == (0, 1, 0)
+
+
+def test_full_queue_applies_backpressure():
+    pool = PoolParseo(procesos=1, max_pendientes=1)
+    try:
+        pool.ejecutar(_dormir, 0)  # Arranca el proceso hijo antes de medir
+        threads = [threading.Thread(target=pool.ejecutar, args=(_dormir, 0.3)) for _ in range(2)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert pool.stats()["backpressure_waits"] == 1
+        assert pool.stats()["parsed_in_pool"] == 3
+    finally:
+        pool.shutdown()
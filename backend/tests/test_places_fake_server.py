@@ -0,0 +1,98 @@
+import asyncio
+from unittest.mock import MagicMock
+
+import httpx
+from fastapi.testclient import TestClient
+
+from backend.google_places_client import GooglePlacesClient
+from backend.places_fake_server import Cassette, SyntheticPlaces, create_app
+
+BBOX = {"rectangle": {"low": {"latitude": -34.62, "longitude": -58.42}, "high": {"latitude": -34.58, "longitude": -58.38}}}
+
+
+def test_synthetic_search_paginates_and_applies_field_mask():
+    client = TestClient(create_app(places=SyntheticPlaces(density=50, zones=[]), latency_ms=0))
+    headers = {"X-Goog-FieldMask": "places.id,places.location"}
+
+    ids = []
+    payload = {"textQuery": "ferreterias", "maxResultCount": 20, "locationBias": BBOX}
+    for _ in range(3):
+        body = client.post("/v1/places:searchText", json=payload, headers=headers).json()
+        ids += [p["id"] for p in body["places"]]
+        assert all(set(p) == {"id", "location"} for p in body["places"])
+        if "nextPageToken" not in body:
+            break
+        payload = dict(payload, pageToken=body["nextPageToken"])
+
+    assert len(ids) == 60 and len(set(ids)) == 60
+    assert "nextPageToken" not in body
+
+    bad = client.post("/v1/places:searchText", json={"textQuery": "otra", "pageToken": body.get("nextPageToken", "x")})
+    assert bad.status_code == 400
+
+
+def test_details_match_search_results():
+    places = SyntheticPlaces(density=20, zones=[])
+    found = places.search("contadores", BBOX)
+    assert found == places.search("contadores", BBOX)  # Determinista
+    assert places.details(found[0]["id"]) == found[0]
+
+
+def test_replay_serves_recorded_responses(tmp_path):
+    cassette = Cassette(str(tmp_path / "cassette.jsonl"))
+    payload = {"textQuery": "gimnasios"}
+    cassette.put(Cassette.key("POST", "/v1/places:searchText", payload, "places.id"), 200, {"places": [{"id": "real-1"}]})
+
+    client = TestClient(create_app(mode="replay", cassette=Cassette(cassette.path), latency_ms=0))
+    ok = client.post("/v1/places:searchText", json=payload, headers={"X-Goog-FieldMask": "places.id"})
+    miss = client.post("/v1/places:searchText", json={"textQuery": "otra"}, headers={"X-Goog-FieldMask": "places.id"})
+
+    assert ok.json() == {"places": [{"id": "real-1"}]}
+    assert miss.status_code == 404
+
+
+def test_places_client_can_target_fake_server():
+    app = create_app(places=SyntheticPlaces(density=20, zones=[]), latency_ms=0)
+    client = GooglePlacesClient(api_key="test", base_url="http://fake-places/v1")
+    client.telemetry = MagicMock()
+
+    async def run():
+        client._get_http_client()
+        client._http_client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app))
+        try:
+            return await client.search_places(query="Fake Server Ferreterias", bbox={"south": -34.62, "west": -58.42, "north": -34.58, "east": -58.38})
+        finally:
+            await client._http_client.aclose()
+
+    result = asyncio.run(run())
+    assert len(result["places"]) == 20
+    assert result["places"][0]["id"].startswith("fake_")
+    assert app.state.stats["search_calls"] == 1
+
+
+def test_transport_stats_count_each_attempt(monkeypatch):
+    from backend import google_places_client as gpc
+    monkeypatch.setattr(gpc, "PLACES_RETRY_BASE_SECONDS", 0.001)
+    client = GooglePlacesClient(api_key="test")
+    respuestas = [503, 200]
+
+    class _FakeHttp:
+        is_closed = False
+
+        async def request(self, method, url, headers=None, json=None, extensions=None):
+            status = respuestas.pop(0)
+            if status == 503:  # Sólo el primer intento abre conexión; el reintento la reutiliza
+                await extensions["trace"]("connection.connect_tcp.started", {})
+            return httpx.Response(status, json={})
+
+    async def run():
+        client._get_http_client()
+        client._http_client = _FakeHttp()
+        return await client._send("POST", "http://fake-places/v1/places:searchText", {})
+
+    _, reused = asyncio.run(run())
+    stats = client.get_transport_stats()
+    assert reused
+    assert stats["requests"] == 2 and stats["retries"] == 1
+    assert stats["new_connections"] == 1 and stats["reused_connections"] == 1
+    assert stats["reuse_ratio"] == 0.5
@@ -0,0 +1,34 @@
+import threading
+import time
+
+from backend.politeness import DomainPolitenessScheduler
+
+
+def test_same_domain_requests_are_spaced():
+    scheduler = DomainPolitenessScheduler(min_delay=0.5)
+    waits = [scheduler.reserve("https://empresa.com.ar/page") for _ in range(3)]
+    assert waits[0] == 0
+    assert 0.4 < waits[1] <= 0.5
+    assert 0.9 < waits[2] <= 1.0
+
+
+def test_other_domains_do_not_wait_behind_a_slow_one():
+    scheduler = DomainPolitenessScheduler(min_delay=0.3)
+    scheduler.set_crawl_delay("lento.com.ar", 2)
+    scheduler.reserve("https://lento.com.ar/")
+
+    threading.Thread(target=scheduler.wait_sync, args=("https://lento.com.ar/otra",), daemon=True).start()
+    time.sleep(0.05)  # El thread anterior está durmiendo su turno
+
+    start = time.monotonic()
+    assert scheduler.wait_sync("https://rapido.com.ar/") == 0
+    assert time.monotonic() - start < 0.1
+
+
+def test_crawl_delay_is_honoured_and_capped():
+    scheduler = DomainPolitenessScheduler(min_delay=0.1, max_crawl_delay=5)
+    scheduler.set_crawl_delay("https://robots.com.ar/robots.txt", 60)
+    assert scheduler.delay_for("robots.com.ar") == 5
+
+    scheduler.reserve("https://robots.com.ar/")
+    assert 4.9 < scheduler.reserve("https://robots.com.ar/contacto") <= 5
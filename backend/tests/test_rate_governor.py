@@ -0,0 +1,68 @@
+import asyncio
+
+from backend.rate_governor import RateGovernor
+
+
+def test_queued_requests_are_served_round_robin_per_user():
+    governor = RateGovernor(rate=200, burst=1, min_rate=1)
+    order = []
+
+    async def worker(user):
+        await governor.acquire(user)
+        order.append(user)
+
+    async def run():
+        await governor.acquire("warmup")  # Vaciar la ráfaga inicial
+        tasks = [asyncio.create_task(worker("heavy")) for _ in range(6)]
+        tasks += [asyncio.create_task(worker("light")) for _ in range(2)]
+        await asyncio.gather(*tasks)
+
+    asyncio.run(run())
+    # El usuario con pocos pedidos no espera a que termine la búsqueda exhaustiva del otro
+    assert order.index("light") <= 1
+    assert order[:4].count("light") == 2
+    assert governor.queue_depth() == 0
+
+
+def test_aimd_halves_on_throttle_and_recovers_additively():
+    governor = RateGovernor(rate=10, burst=5, min_rate=2)
+
+    governor.on_throttle()
+    assert governor.rate == 5
+    governor.on_throttle()  # Dentro del cooldown: una ráfaga de 429 cuenta una vez
+    assert governor.rate == 5
+    assert governor.stats()["throttles"] == 2
+
+    for _ in range(100):
+        governor.on_success()
+    assert governor.rate == 10
+
+
+def test_wait_time_is_reported():
+    governor = RateGovernor(rate=50, burst=1, min_rate=1)
+
+    async def run():
+        return [await governor.acquire("u") for _ in range(3)]
+
+    waits = asyncio.run(run())
+    assert waits[0] < 0.01
+    assert waits[-1] > 0.01
+    stats = governor.stats()
+    assert stats["acquired"] == 3
+    assert stats["max_wait_ms"] > 10
+
+
+def test_backlog_keeps_a_single_pending_timer():
+    governor = RateGovernor(rate=100, burst=1, min_rate=1)
+    agendados = []
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        call_later = loop.call_later
+        loop.call_later = lambda *a: agendados.append(a) or call_later(*a)
+        await governor.acquire("warmup")
+        await asyncio.gather(*(governor.acquire(f"u{i % 3}") for i in range(10)))
+
+    asyncio.run(run())
+    # Un reparto agendado por token entregado, no uno extra por cada acquire() encolado
+    assert len(agendados) <= 10
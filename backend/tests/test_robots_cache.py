@@ -0,0 +1,67 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.robots_cache import RobotsCache
+
+ROBOTS = "User-agent: *\nDisallow: /privado"
+
+
+def test_ttl_and_negative_entries():
+    cache = RobotsCache(ttl_seconds=60, negative_ttl_seconds=0.05)
+    pedidos = []
+
+    def fetcher(robots_url):
+        pedidos.append(robots_url)
+        return (503, "") if "caido" in robots_url else (200, ROBOTS)
+
+    assert not cache.permite_sync("https://empresa.com/privado/x", fetcher)
+    assert cache.permite_sync("https://empresa.com/contacto", fetcher)
+    assert cache.permite_sync("https://caido.com/", fetcher)
+    assert cache.stats()["negative_entries"] == 1
+
+    time.sleep(0.06)
+    cache.permite_sync("https://caido.com/", fetcher)
+    cache.permite_sync("https://empresa.com/", fetcher)
+    assert pedidos == ["https://empresa.com/robots.txt", "https://caido.com/robots.txt", "https://caido.com/robots.txt"]
+
+
+def test_single_flight_between_threads():
+    cache = RobotsCache()
+    llamadas = []
+    liberar = threading.Event()
+
+    def fetcher(robots_url):
+        llamadas.append(robots_url)
+        liberar.wait(2)
+        return 200, ROBOTS
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        futures = [pool.submit(cache.permite_sync, "https://empresa.com/privado", fetcher) for _ in range(8)]
+        time.sleep(0.05)
+        liberar.set()
+        resultados = [f.result() for f in futures]
+
+    assert resultados == [False] * 8
+    assert len(llamadas) == 1
+    assert cache.stats()["coalesced"] == 7
+
+
+def test_async_prefetch_coalesces_with_checks():
+    cache = RobotsCache()
+    llamadas = []
+
+    async def fetcher(robots_url):
+        llamadas.append(robots_url)
+        await asyncio.sleep(0.05)
+        return 404, ""
+
+    async def run():
+        prefetch = asyncio.create_task(cache.prefetch(["a.com", "https://b.com/x", "https://a.com/y"], fetcher))
+        await asyncio.sleep(0)
+        permitido = await cache.permite("https://a.com/contacto", fetcher)
+        return permitido, await prefetch
+
+    assert asyncio.run(run()) == (True, 2)
+    assert sorted(llamadas) == ["https://a.com/robots.txt", "https://b.com/robots.txt"]
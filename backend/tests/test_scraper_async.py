@@ -0,0 +1,263 @@
+import asyncio
+import contextlib
+
+import httpx
+import pytest
+
+from backend.dead_hosts import dead_hosts
+from backend import scraper_async
+from backend.enrichment_queue import EnrichmentQueue
+from backend.politeness import domain_scheduler
+from backend.robots_cache import robots_cache
+from backend.scraping_cache import ScrapingCache
+from backend.scraper_async import AsyncScraperEngine, enriquecer_empresas_async, enriquecer_empresas_async_lista
+
+PAGES = {
+    "https://lento.com.ar/": '<html><body><a href="mailto:ventas@lento.com.ar">Mail</a> Tel: 011 4444-5555</body></html>',
+    "https://rapido.com.ar/": '<html><title>Rápido</title><body><a href="/contacto">Contacto</a></body></html>',
+    "https://rapido.com.ar/contacto": '<html><body>info@rapido.com.ar - 011 4321-1234</body></html>',
+    "https://bloqueado.com.ar/": '<html><body>contacto@bloqueado.com.ar</body></html>',
+}
+ROBOTS = {"bloqueado.com.ar": "User-agent: *\nDisallow: /"}
+
+
+@pytest.fixture(autouse=True)
+def cola_diferida(monkeypatch, tmp_path):
+    monkeypatch.setattr(domain_scheduler, "min_delay", 0)
+    robots_cache.clear()
+    dead_hosts.clear()
+    cola = EnrichmentQueue(path=str(tmp_path / "cola.sqlite3"))
+    monkeypatch.setattr(scraper_async, "enrichment_queue", cola)
+    return cola
+
+
+def _engine(delays=None, active=None, cache=None):
+    delays = delays or {}
+
+    async def handler(request: httpx.Request):
+        url = str(request.url)
+        host = request.url.host
+        if active is not None:
+            active[host] = active.get(host, 0) + 1
+            active["max"] = max(active.get("max", 0), active[host])
+        try:
+            await asyncio.sleep(delays.get(host, 0))
+            if request.url.path == "/robots.txt":
+                if host in ROBOTS:
+                    return httpx.Response(200, text=ROBOTS[host])
+                return httpx.Response(404)
+            if url in PAGES:
+                return httpx.Response(200, html=PAGES[url])
+            return httpx.Response(404)
+        finally:
+            if active is not None:
+                active[host] -= 1
+
+    return AsyncScraperEngine(max_per_host=2, transport=httpx.MockTransport(handler), cache=cache)
+
+
+def test_scrapes_home_and_contact_subpage():
+    engine = _engine()
+    empresa = {"nombre": "Rápido", "website": "https://rapido.com.ar/"}
+
+    result = asyncio.run(enriquecer_empresas_async_lista([empresa, {"nombre": "Sin web"}], engine=engine))
+
+    assert result[0]["email"] == "info@rapido.com.ar"
+    assert result[0]["website_title"] == "Rápido"
+    assert result[1] == {"nombre": "Sin web"}
+
+
+def test_respects_robots_txt():
+    engine = _engine()
+    result = asyncio.run(enriquecer_empresas_async_lista([{"website": "https://bloqueado.com.ar/"}], engine=engine))
+    assert not result[0].get("email")
+    assert engine.stats()["robots_blocked"] == 1
+
+
+def test_generator_yields_in_completion_order():
+    engine = _engine(delays={"lento.com.ar": 0.2})
+    empresas = [
+        {"nombre": "Lento", "website": "https://lento.com.ar/"},
+        {"nombre": "Rápido", "website": "https://rapido.com.ar/"},
+    ]
+
+    async def run():
+        return [e["nombre"] async for e in enriquecer_empresas_async(empresas, engine=engine)]
+
+    assert asyncio.run(run()) == ["Rápido", "Lento"]
+
+
+def test_closing_generator_cancels_pending_fetches(cola_diferida):
+    engine = _engine(delays={"lento.com.ar": 5})
+    empresas = [
+        {"nombre": "Rápido", "website": "https://rapido.com.ar/"},
+        {"nombre": "Lento", "website": "https://lento.com.ar/"},
+    ]
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        async with contextlib.aclosing(enriquecer_empresas_async(empresas, engine=engine)) as gen:
+            async for _ in gen:
+                break
+        return loop.time() - start
+
+    assert asyncio.run(run()) < 2
+    assert cola_diferida.stats()["by_status"] == {"pending": 1}  # El lento pasa a la cola diferida
+
+
+def test_per_host_connection_limit():
+    active = {}
+    engine = _engine(delays={"rapido.com.ar": 0.05}, active=active)
+    empresas = [{"nombre": f"R{i}", "website": "https://rapido.com.ar/"} for i in range(6)]
+
+    asyncio.run(enriquecer_empresas_async_lista(empresas, engine=engine))
+    assert active["max"] <= 2
+
+
+def test_timeout_per_empresa_returns_original(cola_diferida):
+    engine = _engine(delays={"lento.com.ar": 5})
+    empresa = {"nombre": "Lento", "website": "https://lento.com.ar/"}
+
+    result = asyncio.run(enriquecer_empresas_async_lista([empresa], engine=engine, timeout_por_empresa=0.1))
+    assert not result[0].get("email")
+    assert cola_diferida.reclamar()[0] == "lento.com.ar"
+
+
+def test_cache_hit_skips_network(tmp_path):
+    cache = ScrapingCache(path=str(tmp_path / "cache.sqlite3"))
+    engine = _engine(cache=cache)
+    asyncio.run(enriquecer_empresas_async_lista([{"website": "https://rapido.com.ar/"}], engine=engine))
+    fetches = engine.stats()["fetches"]
+
+    result = asyncio.run(enriquecer_empresas_async_lista([{"website": "http://www.rapido.com.ar/otra"}], engine=engine))
+    assert result[0]["email"] == "info@rapido.com.ar"
+    assert engine.stats()["fetches"] == fetches
+    assert engine.stats()["cache_hits"] == 1
+
+
+def test_subpages_run_concurrently_and_stop_when_contacts_complete():
+    paginas = {
+        "https://escuela.edu.ar/": '<html><body><a href="/nosotros">Nosotros</a><a href="/historia">Historia</a>'
+                                   '<a href="/contacto">Contacto</a></body></html>',
+        "https://escuela.edu.ar/contacto": '<html><body>secretaria@escuela.edu.ar 011 4555-6666</body></html>',
+    }
+    pedidas = []
+
+    async def handler(request: httpx.Request):
+        pedidas.append(request.url.path)
+        if request.url.path in ("/nosotros", "/historia"):
+            await asyncio.sleep(5)
+        url = str(request.url)
+        return httpx.Response(200, html=paginas[url]) if url in paginas else httpx.Response(404)
+
+    engine = AsyncScraperEngine(max_per_host=4, transport=httpx.MockTransport(handler), cache=None)
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        resultado = await engine.scrapear("https://escuela.edu.ar/")
+        return resultado, loop.time() - start
+
+    resultado, elapsed = asyncio.run(run())
+    assert resultado["emails"] == ["secretaria@escuela.edu.ar"]
+    assert elapsed < 2
+    assert pedidas.index("/contacto") < pedidas.index("/nosotros")
+    assert engine.stats()["subpage_early_exits"] == 1
+
+
+def test_streaming_fetch_skips_non_html_and_caps_bytes():
+    async def handler(request: httpx.Request):
+        if request.url.path == "/catalogo.pdf":
+            return httpx.Response(200, headers={"content-type": "application/pdf"}, content=b"%PDF" * 1000)
+        return httpx.Response(200, html="<html><body>" + "x" * 50_000 + "</body></html>")
+
+    engine = AsyncScraperEngine(transport=httpx.MockTransport(handler), cache=None)
+
+    async def run():
+        pdf = await engine.fetch_pagina("https://empresa.com.ar/catalogo.pdf")
+        grande = await engine.fetch_pagina("https://empresa.com.ar/", max_bytes=1000)
+        return pdf, grande
+
+    pdf, grande = asyncio.run(run())
+    assert pdf["status_code"] == 200 and pdf["html"] is None
+    assert grande["truncado"] and len(grande["html"]) == 1000
+    assert engine.stats()["non_html_skipped"] == 1
+    assert engine.stats()["truncated"] == 1
+
+
+def test_expired_entry_revalidates_with_etag_and_reuses_extraction(tmp_path, monkeypatch):
+    condicionales = []
+
+    async def handler(request: httpx.Request):
+        if request.url.path == "/robots.txt":
+            return httpx.Response(404)
+        condicionales.append(request.headers.get("if-none-match"))
+        if request.headers.get("if-none-match") == '"v1"':
+            return httpx.Response(304)
+        html = PAGES["https://lento.com.ar/"]
+        return httpx.Response(200, html=html, headers={"ETag": '"v1"'})
+
+    cache = ScrapingCache(path=str(tmp_path / "c.sqlite3"))
+    engine = AsyncScraperEngine(transport=httpx.MockTransport(handler), cache=cache)
+
+    async def run():
+        primera = await engine.enriquecer({"website": "https://lento.com.ar/"})
+        cache._conn.execute("UPDATE scraping_cache SET last_scraped_at = '2000-01-01T00:00:00+00:00'")
+        monkeypatch.setattr(scraper_async, "analizar_home", None)  # Un 304 no debe volver a parsear
+        segunda = await engine.enriquecer({"website": "https://lento.com.ar/"})
+        await engine.aclose()
+        return primera, segunda
+
+    primera, segunda = asyncio.run(run())
+    assert condicionales == [None, '"v1"']
+    assert segunda["email"] == primera["email"] == "ventas@lento.com.ar"
+    assert cache.stats()["pages_not_modified"] == 1
+
+
+def test_hedged_request_to_www_variant_wins_when_apex_is_slow(monkeypatch):
+    monkeypatch.setattr(scraper_async, "SCRAPER_HEDGE_AFTER_SECONDS", 0.05)
+
+    async def handler(request: httpx.Request):
+        if request.url.path == "/robots.txt":
+            return httpx.Response(404)
+        if request.url.host == "lento.com.ar":
+            await asyncio.sleep(2)
+        return httpx.Response(200, html=PAGES["https://lento.com.ar/"])
+
+    engine = AsyncScraperEngine(transport=httpx.MockTransport(handler), cache=None)
+
+    async def run():
+        inicio = asyncio.get_running_loop().time()
+        resultado = await engine.scrapear("https://lento.com.ar/")
+        await engine.aclose()
+        return resultado, asyncio.get_running_loop().time() - inicio
+
+    resultado, duracion = asyncio.run(run())
+    assert resultado["emails"] == ["ventas@lento.com.ar"]
+    assert duracion < 1.5
+    assert engine.stats()["hedges"] == engine.stats()["hedges_won"] == 1
+
+
+def test_dns_waiters_survive_owner_cancellation():
+    async def escenario():
+        backend = scraper_async._CachingDNSBackend(inner=None)
+        loop = asyncio.get_running_loop()
+        llamadas = []
+
+        async def getaddrinfo(host, port, type=None):
+            llamadas.append(host)
+            await asyncio.sleep(0.05)
+            return [(None, None, None, None, ("10.0.0.1", port))]
+
+        loop.getaddrinfo = getaddrinfo
+        duena = asyncio.create_task(backend._resolve("cadena.com.ar", 443))
+        await asyncio.sleep(0)
+        espera = asyncio.create_task(backend._resolve("cadena.com.ar", 443))
+        await asyncio.sleep(0.01)
+        duena.cancel()  # p. ej. el hedge perdedor o el wait_for del lead
+        return await espera, duena.cancelled(), llamadas
+
+    direcciones, cancelada, llamadas = asyncio.run(escenario())
+    assert direcciones == ["10.0.0.1"]
+    assert cancelada and llamadas == ["cadena.com.ar", "cadena.com.ar"]
@@ -0,0 +1,26 @@
+import pytest
+
+from backend.scraper_benchmark import MODOS, CorpusSintetico, armar_reporte, comparar, ejecutar_benchmark
+
+
+def test_corpus_is_deterministic_and_covers_site_kinds():
+    corpus = CorpusSintetico(sitios=80, seed=3)
+    assert [e["website"] for e in corpus.empresas] == [e["website"] for e in CorpusSintetico(sitios=80, seed=3).empresas]
+    tipos = {e["_tipo"] for e in corpus.empresas}
+    assert {"home_mailto", "subpagina", "whatsapp", "jsonld", "sin_contacto", "lento", "caido"} <= tipos
+
+
+@pytest.mark.parametrize("modo", MODOS)
+def test_benchmark_runs_offline_and_reports_metrics(modo):
+    corpus = CorpusSintetico(sitios=12, seed=1, latency_ms=1, slow_fraction=0, dead_fraction=0.1)
+    resultados = ejecutar_benchmark(corpus, workers=4, timeout_por_empresa=5, parse_processes=0, modo=modo)
+
+    assert resultados["leads"] == 12
+    assert resultados["pages_served"] >= 10
+    assert resultados["lead_p95_seconds"] >= resultados["lead_p50_seconds"] > 0
+    assert resultados["por_tipo"]["home_mailto"]["con_email"] == resultados["por_tipo"]["home_mailto"]["leads"]
+    assert resultados["por_tipo"]["caido"]["con_email"] == 0
+
+    reporte = armar_reporte(corpus, resultados, mode=modo, workers=4)
+    assert reporte["config"]["sites"] == 12
+    assert comparar(reporte, reporte)["leads_per_sec"]["ratio"] == 1.0
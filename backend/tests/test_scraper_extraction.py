@@ -0,0 +1,174 @@
+import hashlib
+import time
+from unittest.mock import MagicMock, patch
+
+from backend import scraper
+from backend.scraper import (
+    DecodificadorHTML, es_contenido_html, extraer_datos_pagina, extraer_emails_b2b, parsear_html,
+    seleccionar_paginas_adicionales
+)
+from backend.social_scraper import enriquecer_con_redes_sociales
+
+HTML = """
+<html><head><title> Ferretería Central </title><meta name="description" content="Herramientas">
+<script>var email = "tracking@analytics.com";</script></head>
+<body>
+  <nav><a href="/contacto">Contacto</a><a href="/nosotros">Nosotros</a><a href="https://otro.com/contacto">Ext</a></nav>
+  <main><p>Atención: ventas [at] ferreteriacentral.com.ar</p>
+  <a href="tel:+54 11 4444-5555">Llamar</a>
+  <a href="https://wa.me/5491155556666">WhatsApp</a></main>
+  <footer>info@ferreteriacentral.com.ar <a href="https://instagram.com/ferrecentral">IG</a>
+  <a href="https://www.linkedin.com/company/ferrecentral">in</a></footer>
+</body></html>
+"""
+
+
+def test_single_pass_returns_every_field():
+    datos = extraer_datos_pagina("https://ferreteriacentral.com.ar/", parsear_html(HTML))
+
+    assert datos["website_title"] == "Ferretería Central"
+    assert datos["website_description"] == "Herramientas"
+    assert set(datos["emails"]) == {"ventas@ferreteriacentral.com.ar", "info@ferreteriacentral.com.ar"}
+    assert "+54 11 4444-5555" in datos["telefonos"] and "5491155556666" in datos["telefonos"]
+    assert datos["instagram"] == "https://instagram.com/ferrecentral"
+    assert datos["linkedin"] == "https://www.linkedin.com/company/ferrecentral"
+    assert datos["subpaginas"] == ["https://ferreteriacentral.com.ar/contacto", "https://ferreteriacentral.com.ar/nosotros"]
+    # El contenido excluye scripts y la navegación, pero los contactos del footer sí se detectan
+    assert "tracking@" not in datos["website_content"] and "Nosotros" not in datos["website_content"]
+
+
+def test_legacy_email_extractor_filters_and_prioritizes():
+    soup = parsear_html('<a href="mailto:noreply@empresa.com">x</a><a href="mailto:gerente@empresa.com?subject=hola">y</a>')
+    emails = extraer_emails_b2b(soup, "Escribinos a contacto (at) empresa.com")
+    assert emails == ["contacto@empresa.com", "gerente@empresa.com"]
+
+
+def test_subpaginas_ordenadas_por_relevancia():
+    html = ('<html><body><a href="/nosotros">Quiénes somos</a><a href="/empresa/sucursales">Sucursales</a>'
+            '<a href="/contacto">Escribinos</a></body></html>')
+    subpaginas = seleccionar_paginas_adicionales("https://empresa.com.ar/", parsear_html(html))
+    assert subpaginas[0] == "https://empresa.com.ar/contacto"
+    assert subpaginas[-1] == "https://empresa.com.ar/nosotros"
+
+
+def test_seleccion_de_subpaginas_no_modifica_el_soup_ni_reextrae():
+    soup = parsear_html(HTML)
+    antes = str(soup)
+    with patch.object(scraper, "extraer_datos_pagina", side_effect=AssertionError("no debe re-extraer")):
+        subpaginas = seleccionar_paginas_adicionales("https://ferreteriacentral.com.ar/", soup)
+
+    assert str(soup) == antes
+    assert subpaginas == extraer_datos_pagina("https://ferreteriacentral.com.ar/", soup)["subpaginas"]
+
+
+def test_escaneo_de_subpaginas_corta_al_completar_contactos():
+    paginas = {
+        "https://a.com/contacto": "<html><body>ventas@a.com 011 4444-5555</body></html>",
+        "https://a.com/nosotros": "<html><body>otro@a.com</body></html>",
+    }
+    session = MagicMock(cache=None)
+    session.descargar_pagina.side_effect = lambda url, timeout=None, validadores=None, deadline=None, cancelado=None: {"html": paginas[url], "truncado": False}
+
+    with patch.object(scraper, "SUBPAGE_CONCURRENCY", 1):
+        datos = scraper._escanear_subpaginas(list(paginas), session)
+
+    assert datos["emails"] == ["ventas@a.com"]
+    assert len(datos["telefonos"]) == 1
+
+
+def test_escaneo_cancela_las_descargas_en_curso():
+    cancelaciones = []
+
+    def descargar_pagina(url, timeout=None, validadores=None, deadline=None, cancelado=None):
+        if url.endswith("/contacto"):
+            return {"html": "<html><body>ventas@a.com 011 4444-5555</body></html>", "truncado": False}
+        # Descarga lenta en curso: se entera del corte por el flag, sin esperar su timeout
+        cancelaciones.append(cancelado.wait(2))
+        return None
+
+    session = MagicMock(cache=None)
+    session.descargar_pagina.side_effect = descargar_pagina
+
+    inicio = time.monotonic()
+    with patch.object(scraper, "SUBPAGE_CONCURRENCY", 2):
+        datos = scraper._escanear_subpaginas(["https://a.com/lenta", "https://a.com/contacto"], session)
+    time.sleep(0.05)
+
+    assert datos["emails"] == ["ventas@a.com"]
+    assert time.monotonic() - inicio < 1
+    assert cancelaciones == [True]
+
+
+def test_decodificador_respeta_presupuesto_y_multibyte():
+    cuerpo = "<html><body>Teléfono: ñandú</body></html>".encode("utf-8")
+    decodificador = DecodificadorHTML("text/html; charset=utf-8", max_bytes=len(cuerpo))
+    for i in range(len(cuerpo)):  # Bloques de un byte: los caracteres multibyte llegan partidos
+        assert decodificador.agregar(cuerpo[i:i + 1])
+    assert decodificador.resultado() == {"html": cuerpo.decode("utf-8"), "truncado": False, "bytes": len(cuerpo),
+                                         "hash": hashlib.blake2b(cuerpo, digest_size=16).hexdigest()}
+
+    corto = DecodificadorHTML(None, max_bytes=30)
+    assert not corto.agregar('<meta charset="latin-1"><p>Año</p>'.encode("latin-1"))
+    pagina = corto.resultado()
+    assert pagina["truncado"] and pagina["bytes"] == 30
+    assert pagina["html"] == '<meta charset="latin-1"><p>Año'
+
+
+def test_content_type_html():
+    assert es_contenido_html("text/html; charset=ISO-8859-1")
+    assert es_contenido_html(None)
+    assert not es_contenido_html("application/pdf")
+    assert not es_contenido_html("image/jpeg")
+
+
+def test_redes_sociales_en_la_misma_pasada():
+    html = """<html><head>
+    <script type="application/ld+json">{"@graph": [{"@type": "Organization",
+      "sameAs": ["https://www.facebook.com/FerreCentralOficial", "https://www.youtube.com/@ferrecentral"]}]}</script>
+    <meta property="og:see_also" content="https://www.tiktok.com/@ferrecentral?lang=es"></head>
+    <body><a href="https://www.facebook.com/sharer/sharer.php?u=x">Compartir</a>
+    <a href="https://facebook.com/tr?id=1">px</a><a href="https://facebook.com/otra">FB</a>
+    <a href="https://x.com/ferrecentral">X</a><a href="https://inbox.com/x">no</a></body></html>"""
+
+    datos = extraer_datos_pagina("https://ferreteriacentral.com.ar/", parsear_html(html))
+
+    assert datos["facebook"] == "https://www.facebook.com/FerreCentralOficial"  # JSON-LD gana sobre enlaces
+    assert datos["youtube"] == "https://www.youtube.com/@ferrecentral"
+    assert datos["tiktok"] == "https://www.tiktok.com/@ferrecentral"
+    assert datos["twitter"] == "https://x.com/ferrecentral"
+    assert datos["instagram"] == "" and datos["linkedin"] == ""
+
+
+def test_enriquecer_redes_con_soup_no_descarga():
+    soup = parsear_html('<a href="https://instagram.com/empresa/">IG</a>')
+    with patch("backend.scraper.ScraperSession.get_soup", side_effect=AssertionError("sin red")):
+        redes = enriquecer_con_redes_sociales("empresa.com.ar", soup=soup)
+    assert redes == {"instagram": "https://instagram.com/empresa"}
+
+
+def test_datos_estructurados_evitan_regex_y_subpaginas():
+    html = """<html><head><script type="application/ld+json">{"@context": "https://schema.org", "@graph": [
+      {"@type": "LocalBusiness", "sameAs": "https://www.instagram.com/ferrecentral",
+       "contactPoint": [{"@type": "ContactPoint", "email": "mailto:ventas@ferreteriacentral.com.ar",
+                         "telephone": "+54 11 4444-5555"}]}]}</script></head>
+    <body><a href="/contacto">Contacto</a><p>otro@ferreteriacentral.com.ar</p></body></html>"""
+
+    datos = extraer_datos_pagina("https://ferreteriacentral.com.ar/", parsear_html(html))
+
+    assert datos["emails"] == ["ventas@ferreteriacentral.com.ar"]  # El texto no se escaneó
+    assert datos["telefonos"] == ["+54 11 4444-5555"]
+    assert datos["instagram"] == "https://www.instagram.com/ferrecentral"
+    assert datos["subpaginas"] == []
+    assert "otro@" in datos["website_content"]
+
+
+def test_microdata_incompleta_sigue_por_el_texto():
+    html = """<html><body><div itemscope itemtype="https://schema.org/Organization">
+      <span itemprop="telephone">011 4444-5555</span></div>
+      <a href="/contacto">Contacto</a><footer>info@empresa.com.ar</footer></body></html>"""
+
+    datos = extraer_datos_pagina("https://empresa.com.ar/", parsear_html(html))
+
+    assert datos["telefonos"][0] == "011 4444-5555"
+    assert datos["emails"] == ["info@empresa.com.ar"]
+    assert datos["subpaginas"] == ["https://empresa.com.ar/contacto"]
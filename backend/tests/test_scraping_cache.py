@@ -0,0 +1,109 @@
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+from backend import scraper_parallel
+from backend.scraping_cache import ScrapingCache, clave_cache, encabezados_condicionales, normalizar_dominio
+
+
+def test_normalizar_dominio_registrable():
+    assert normalizar_dominio("https://WWW.Sucursal.Empresa.com.ar:443/contacto") == "empresa.com.ar"
+    assert normalizar_dominio("empresa.com") == "empresa.com"
+    assert normalizar_dominio("http://shop.example.co.uk/x") == "example.co.uk"
+    assert normalizar_dominio("https://ferreteria.negocio.site/") == "ferreteria.negocio.site"
+    assert normalizar_dominio("") is None
+
+
+def test_plataformas_por_ruta_no_comparten_entrada(tmp_path):
+    assert clave_cache("https://sites.google.com/view/ferreteria/contacto") == "sites.google.com/view/ferreteria"
+    assert clave_cache("https://www.facebook.com/Panaderia.Sur") == "facebook.com/panaderia.sur"
+    assert clave_cache("https://www.linkedin.com/company/acme/about") == "linkedin.com/company/acme"
+    assert clave_cache("https://linktr.ee/") is None  # La raíz de la plataforma no es un negocio
+    assert clave_cache("https://WWW.Empresa.com.ar/x") == "empresa.com.ar"
+
+    cache = ScrapingCache(path=str(tmp_path / "c.sqlite3"))
+    cache.put("https://linktr.ee/panaderiasur", {"email": "hola@panaderiasur.com"})
+    assert cache.get("https://linktr.ee/otranegocio") is None
+    assert cache.get("linktr.ee/PanaderiaSur")["data"]["email"] == "hola@panaderiasur.com"
+    assert not cache.put("https://linktr.ee", {"email": "x@y.com"})
+
+
+def test_negative_entries_expire_sooner(tmp_path):
+    cache = ScrapingCache(path=str(tmp_path / "c.sqlite3"), ttl_hours=168, negative_ttl_hours=1)
+    cache.put("https://caido.com.ar", {}, status="failed")
+    cache.put("https://ok.com.ar", {"email": "info@ok.com.ar"})
+    assert cache.get("caido.com.ar")["status"] == "failed"
+
+    hace_dos_horas = (datetime.now(timezone.utc) - timedelta(hours=2)).isoformat()
+    cache._conn.execute("UPDATE scraping_cache SET last_scraped_at = ?", (hace_dos_horas,))
+    assert cache.get("caido.com.ar") is None
+    assert cache.get("ok.com.ar")["data"]["email"] == "info@ok.com.ar"
+    assert cache.purge_expired() == 1
+
+
+def test_eviction_drops_least_recently_used(tmp_path):
+    cache = ScrapingCache(path=str(tmp_path / "c.sqlite3"), max_entries=10)
+    for i in range(10):
+        cache.put(f"https://sitio{i}.com", {"email": f"a@sitio{i}.com"})
+    cache.get("sitio0.com")  # Uso reciente: sobrevive al desalojo
+    cache.put("https://sitio10.com", {"email": "a@sitio10.com"})
+
+    assert cache.stats()["evictions"] >= 2
+    assert cache.get("sitio0.com") is not None
+    assert cache.get("sitio1.com") is None
+
+
+def test_remote_tier_fills_local_on_miss(tmp_path):
+    remote = {"empresa.com.ar": {"status": "success", "data": {"email": "ventas@empresa.com.ar"},
+                                 "last_scraped_at": datetime.now(timezone.utc).isoformat()}}
+    cache = ScrapingCache(path=str(tmp_path / "c.sqlite3"), remote_get=remote.get)
+
+    assert cache.get("https://empresa.com.ar")["data"]["email"] == "ventas@empresa.com.ar"
+    remote.clear()
+    assert cache.get("https://empresa.com.ar") is not None
+    assert cache.stats()["remote_hits"] == 1
+
+
+def test_enriquecer_individual_uses_cache_before_network(tmp_path):
+    cache = ScrapingCache(path=str(tmp_path / "c.sqlite3"))
+    cache.put("https://empresa.com.ar", {"email": "info@empresa.com.ar", "linkedin": "https://linkedin.com/company/x"})
+    cache.put("https://bloqueado.com.ar", {}, status="blocked")
+
+    with patch.object(scraper_parallel, "scraping_cache", cache), \
+         patch.object(scraper_parallel, "scrapear_empresa_b2b", side_effect=AssertionError("sin red")):
+        hit = scraper_parallel._enriquecer_empresa_individual({"website": "www.empresa.com.ar", "telefono": "123"})
+        negativo = scraper_parallel._enriquecer_empresa_individual({"website": "https://bloqueado.com.ar"})
+
+    assert hit["email"] == "info@empresa.com.ar"
+    assert hit["telefono"] == "123"
+    assert not negativo.get("email")
+
+
+def test_page_validators_reuse_on_same_hash(tmp_path):
+    cache = ScrapingCache(path=str(tmp_path / "c.sqlite3"))
+    url = "https://empresa.com.ar/contacto"
+    cache.put_pagina(url, {"hash": "abc", "etag": None, "last_modified": "Mon, 05 Oct 2026 10:00:00 GMT"},
+                     {"emails": ["info@empresa.com.ar"], "telefonos": [], "truncado": False})
+
+    previa = cache.get_pagina(url)
+    assert encabezados_condicionales(previa) == {"If-Modified-Since": "Mon, 05 Oct 2026 10:00:00 GMT"}
+    assert cache.reutilizar_pagina(previa, {"html": "...", "hash": "abc"})["emails"] == ["info@empresa.com.ar"]
+    assert cache.reutilizar_pagina(previa, {"html": "...", "hash": "otro"}) is None
+    assert cache.stats()["pages_unchanged"] == 1
+
+
+def test_enriquecer_individual_sin_tiempo_difiere_sin_cache_negativa(tmp_path):
+    cache = ScrapingCache(path=str(tmp_path / "c.sqlite3"))
+    session = scraper_parallel.ScraperSession()
+    session.check_robots = lambda url: True
+    session.session.get = lambda *a, **k: (_ for _ in ()).throw(AssertionError("sin tiempo no hay request"))
+    encoladas = []
+
+    with patch.object(scraper_parallel, "scraping_cache", cache), \
+         patch.object(scraper_parallel, "_programar_enriquecimiento_diferido",
+                      side_effect=lambda empresas, prioridad: encoladas.append((empresas, prioridad))):
+        empresa = {"nombre": "Lenta", "website": "https://lenta.com.ar"}
+        resultado = scraper_parallel._enriquecer_empresa_individual(empresa, session=session, timeout_por_empresa=1e-9)
+
+    assert resultado == empresa
+    assert encoladas == [([empresa], scraper_parallel.PRIORIDAD_INTERACTIVA)]
+    assert cache.get("lenta.com.ar") is None
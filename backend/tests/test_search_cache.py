@@ -0,0 +1,64 @@
+import time
+from unittest.mock import patch
+
+from backend.search_cache import TTLLRUCache, build_search_cache_key
+
+
+def test_lru_eviction_by_entries():
+    cache = TTLLRUCache(max_entries=2, ttl_seconds=60)
+    cache.set("a", {"v": 1})
+    cache.set("b", {"v": 2})
+    assert cache.get("a") == {"v": 1}  # "a" pasa a ser el más reciente
+    cache.set("c", {"v": 3})
+
+    assert cache.get("b") is None
+    assert cache.get("a") == {"v": 1}
+    assert cache.get("c") == {"v": 3}
+    assert cache.stats()["evictions"] == 1
+
+
+def test_eviction_by_bytes():
+    cache = TTLLRUCache(max_entries=100, max_bytes=60, ttl_seconds=60)
+    cache.set("a", "x" * 20)
+    cache.set("b", "y" * 20)
+    cache.set("c", "z" * 20)
+
+    stats = cache.stats()
+    assert stats["bytes"] <= 60
+    assert cache.get("a") is None
+    assert cache.get("c") == "z" * 20
+
+
+def test_ttl_expiration_counts_as_miss():
+    cache = TTLLRUCache(ttl_seconds=10)
+    with patch("backend.search_cache.time.time", return_value=1000):
+        cache.set("k", [1, 2, 3])
+    with patch("backend.search_cache.time.time", return_value=1005):
+        assert cache.get("k") == [1, 2, 3]
+    with patch("backend.search_cache.time.time", return_value=1011):
+        assert cache.get("k") is None
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["expirations"] == 1
+    assert stats["entries"] == 0
+
+
+def test_cache_key_normalizes_and_includes_bbox():
+    bbox_a = {"south": -34.6, "west": -58.5, "north": -34.5, "east": -58.4}
+    bbox_b = {"south": -34.7, "west": -58.5, "north": -34.6, "east": -58.4}
+
+    k1 = build_search_cache_key("  Colegios   Privados", bbox=bbox_a, field_mask="m")
+    k2 = build_search_cache_key("colegios privados", bbox=bbox_a, field_mask="m")
+    k3 = build_search_cache_key("colegios privados", bbox=bbox_b, field_mask="m")
+
+    assert k1 == k2
+    assert k1 != k3
+
+
+def test_cache_key_quantizes_coordinates():
+    k1 = build_search_cache_key("q", lat=-34.603722, lng=-58.381592, radius=1000.2)
+    k2 = build_search_cache_key("q", lat=-34.603749, lng=-58.381551, radius=1000)
+    assert k1 == k2
+    assert k1 != build_search_cache_key("q", lat=-34.603722, lng=-58.381592, radius=1000, field_mask="otra")
@@ -0,0 +1,102 @@
+import asyncio
+
+from backend.telemetry_sink import ApiTelemetrySink
+
+
+class _FakeDB:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.usage_calls = []
+        self.log_batches = []
+
+    def usage_writer(self, **kwargs):
+        if self.fail:
+            return False
+        self.usage_calls.append(kwargs)
+        return True
+
+    def logs_writer(self, rows):
+        if self.fail:
+            return False
+        self.log_batches.append(rows)
+        return True
+
+
+def test_usage_is_aggregated_per_month_provider_sku():
+    db = _FakeDB()
+    sink = ApiTelemetrySink(usage_writer=db.usage_writer, logs_writer=db.logs_writer)
+    for _ in range(10):
+        sink.record_usage(provider="google", sku="pro", cost_usd=0.032)
+    sink.record_usage(provider="google", sku="basic", cost_usd=0.017)
+    for i in range(7):
+        sink.record_call(provider="google", endpoint="places:searchText", cost_usd=0.032, metadata={"i": i})
+
+    sink.flush_sync()
+
+    assert len(db.usage_calls) == 2
+    pro = next(c for c in db.usage_calls if c["sku"] == "pro")
+    assert pro["calls"] == 10
+    assert round(pro["cost_usd"], 3) == 0.32
+    assert len(db.log_batches) == 1 and len(db.log_batches[0]) == 7
+
+
+def test_failed_flush_is_requeued():
+    db = _FakeDB(fail=True)
+    sink = ApiTelemetrySink(usage_writer=db.usage_writer, logs_writer=db.logs_writer)
+    sink.record_usage(provider="google", sku="pro", cost_usd=0.032)
+    sink.record_call(provider="google", endpoint="places:searchText", cost_usd=0.032)
+
+    sink.flush_sync()
+    stats = sink.stats()
+    assert stats["pending_logs"] == 1
+    assert stats["pending_usage_keys"] == 1
+
+    db.fail = False
+    sink.flush_sync()
+    assert db.usage_calls[0]["calls"] == 1
+    assert sink.stats()["pending_logs"] == 0
+
+
+def test_uncertain_usage_write_is_not_retried():
+    escrituras = []
+
+    def usage_writer(**kwargs):
+        escrituras.append(kwargs)
+        return None  # Error transitorio del RPC: pudo haberse aplicado
+
+    sink = ApiTelemetrySink(usage_writer=usage_writer, logs_writer=lambda rows: True)
+    sink.record_usage(provider="google", sku="pro", cost_usd=0.032)
+    sink.flush_sync()
+    sink.flush_sync()
+
+    assert len(escrituras) == 1
+    assert sink.stats()["pending_usage_keys"] == 0
+    assert sink.stats()["flush_failures"] == 1
+
+
+def test_bounded_queue_drops_oldest():
+    db = _FakeDB()
+    sink = ApiTelemetrySink(usage_writer=db.usage_writer, logs_writer=db.logs_writer, batch_size=5, max_queue=5)
+    for i in range(8):
+        sink.record_call(provider="google", endpoint="places:searchText", cost_usd=0, metadata={"i": i})
+
+    assert sink.stats()["dropped"] == 3
+    sink.flush_sync()
+    assert [r["metadata"]["i"] for r in db.log_batches[0]] == [3, 4, 5, 6, 7]
+
+
+def test_background_flusher_writes_on_batch_threshold():
+    db = _FakeDB()
+    sink = ApiTelemetrySink(usage_writer=db.usage_writer, logs_writer=db.logs_writer, flush_interval=60, batch_size=3)
+
+    async def run():
+        for _ in range(3):
+            sink.record_call(provider="google", endpoint="places:searchText", cost_usd=0)
+        for _ in range(50):
+            if db.log_batches:
+                break
+            await asyncio.sleep(0.01)
+        await sink.aclose()
+
+    asyncio.run(run())
+    assert sum(len(b) for b in db.log_batches) == 3
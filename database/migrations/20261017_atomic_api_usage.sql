@@ -0,0 +1,33 @@
+-- Migration: Atomic API usage increments
+-- Date: 2026-10-17
+
+-- 1. Unique key required for upserts by (month, provider, sku)
+CREATE UNIQUE INDEX IF NOT EXISTS api_usage_stats_month_provider_sku_key
+    ON public.api_usage_stats (month, provider, sku);
+
+-- 2. Aggregated increment (used by the backend telemetry sink)
+-- Adds p_calls / p_cost_usd in a single statement so concurrent increments never lose counts
+CREATE OR REPLACE FUNCTION public.increment_api_usage_stats(
+    p_month date,
+    p_provider text,
+    p_sku text,
+    p_calls int,
+    p_cost_usd numeric
+)
+RETURNS void
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public, pg_temp
+AS $$
+BEGIN
+    INSERT INTO public.api_usage_stats (month, provider, sku, calls_count, estimated_cost_usd, last_update)
+    VALUES (p_month, p_provider, p_sku, p_calls, p_cost_usd, NOW())
+    ON CONFLICT (month, provider, sku) DO UPDATE
+    SET calls_count = public.api_usage_stats.calls_count + EXCLUDED.calls_count,
+        estimated_cost_usd = public.api_usage_stats.estimated_cost_usd + EXCLUDED.estimated_cost_usd,
+        last_update = NOW();
+END;
+$$;
+
+REVOKE ALL ON FUNCTION public.increment_api_usage_stats(date, text, text, int, numeric) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION public.increment_api_usage_stats(date, text, text, int, numeric) TO service_role;
@@ -0,0 +1,19 @@
+-- Migration: Shared scraping cache
+-- Date: 2026-10-17
+
+-- Results of website scraping keyed by registrable domain (e.g. empresa.com.ar).
+-- status = 'success' | 'failed' | 'blocked' (negative entries expire sooner, TTLs are enforced by the backend)
+CREATE TABLE IF NOT EXISTS public.scraping_cache (
+    domain text PRIMARY KEY,
+    status text NOT NULL DEFAULT 'success' CHECK (status IN ('success', 'failed', 'blocked')),
+    data jsonb NOT NULL DEFAULT '{}'::jsonb,
+    http_status int,
+    last_scraped_at timestamptz NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS scraping_cache_last_scraped_at_idx
+    ON public.scraping_cache (last_scraped_at);
+
+-- Only the backend (service_role) reads and writes the cache
+ALTER TABLE public.scraping_cache ENABLE ROW LEVEL SECURITY;
+REVOKE ALL ON public.scraping_cache FROM anon, authenticated;